@@ -0,0 +1,126 @@
+# benchmarks/login_throughput.py - Login throughput and event-loop lag under a login burst
+#
+# Times serial authenticate() (a sync worker waits on one login at a
+# time) against a burst of concurrent async_login requests on the bounded
+# hashing pool, in a scratch database:
+#
+#   python benchmarks/login_throughput.py --logins 200 --concurrency 64
+#
+# Reports logins per second (total and per hashing worker), how many
+# requests were shed with 503, and the worst event-loop stall during the
+# burst, which stays near zero because hashing never runs on the loop.
+
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'case_prioritization.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.test import RequestFactory, override_settings
+
+from cases.models import User
+from cases.views import async_login
+from synthetic import create_users, scratch_database
+
+PASSWORD = 'benchmark-password'
+
+
+async def measure_loop_lag(stop, interval=0.005):
+    """Worst delay of a timer that should fire every `interval` seconds"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def login_burst(usernames, concurrency):
+    factory = RequestFactory()
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = []
+    
+    async def login(username):
+        async with semaphore:
+            request = factory.post('/api/auth/login/', data=json.dumps({'username': username, 'password': PASSWORD}),
+                                   content_type='application/json')
+            statuses.append((await async_login(request)).status_code)
+    
+    stop = asyncio.Event()
+    lag = asyncio.ensure_future(measure_loop_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*[login(username) for username in usernames])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return statuses, elapsed, await lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login throughput with the bounded hashing pool')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=64, help='Login requests in flight at once')
+    parser.add_argument('--workers', type=int, default=None, help='Hashing threads (default PASSWORD_HASHING_WORKERS)')
+    parser.add_argument('--queue-limit', type=int, default=None,
+                        help='Queued or running hashes before 503 (default PASSWORD_HASHING_QUEUE_LIMIT)')
+    parser.add_argument('--sync-logins', type=int, default=20, help='Serial authenticate() calls for the baseline')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+    
+    workers = args.workers or settings.PASSWORD_HASHING_WORKERS
+    queue_limit = args.queue_limit if args.queue_limit is not None else workers * 4
+    override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        PASSWORD_HASHING_WORKERS=workers,
+        PASSWORD_HASHING_QUEUE_LIMIT=queue_limit,
+    ).enable()
+    
+    with scratch_database():
+        rng = random.Random(args.seed)
+        user_ids = create_users('client', args.users, rng, prefix='login')
+        # One real hash shared by everyone: each login still runs the full check
+        User.objects.filter(pk__in=user_ids).update(password=make_password(PASSWORD))
+        usernames = list(User.objects.filter(pk__in=user_ids).values_list('username', flat=True))
+        
+        started = time.perf_counter()
+        for n in range(args.sync_logins):
+            assert authenticate(username=usernames[n % len(usernames)], password=PASSWORD) is not None
+        sync_rate = args.sync_logins / (time.perf_counter() - started)
+        
+        burst = [rng.choice(usernames) for _ in range(args.logins)]
+        statuses, elapsed, lag = asyncio.run(login_burst(burst, args.concurrency))
+    
+    succeeded = statuses.count(200)
+    results = {
+        'cpu_count': os.cpu_count(),
+        'hashing_workers': workers,
+        'queue_limit': queue_limit,
+        'sync_logins_per_second': sync_rate,
+        'async_logins_per_second': succeeded / elapsed,
+        'async_logins_per_second_per_worker': succeeded / elapsed / min(workers, os.cpu_count() or 1),
+        'succeeded': succeeded,
+        'shed_503': statuses.count(503),
+        'other_status': len(statuses) - succeeded - statuses.count(503),
+        'max_event_loop_lag_ms': lag * 1000,
+    }
+    for name, value in results.items():
+        print(f"{name:<36} {value:>10.2f}" if isinstance(value, float) else f"{name:<36} {value:>10}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
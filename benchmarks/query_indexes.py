@@ -0,0 +1,122 @@
+# benchmarks/query_indexes.py - EXPLAIN plans and timings for the prioritization queries
+#
+# Loads a seeded synthetic dataset into a scratch database (the test database
+# for the configured DATABASES / DATABASE_URL), then runs each query shape
+# with the Case.Meta indexes dropped and again with them in place.
+#
+#   python benchmarks/query_indexes.py --rows 1000000
+#   DATABASE_URL=postgres://... python benchmarks/query_indexes.py --json indexes.json
+
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'case_prioritization.settings')
+
+import django
+django.setup()
+
+from datetime import timedelta
+from django.db import connection
+from django.utils import timezone
+
+from cases.models import Case
+from cases.utils.prioritization import CasePriorityManager
+from synthetic import generate_cases, scratch_database
+
+
+def query_shapes(lawyer_id, client_id):
+    """The CasePriorityManager / identify_urgent_actions queries, first page only"""
+    manager = CasePriorityManager()
+    now = timezone.now()
+    return {
+        'lawyer_prioritized': Case.objects.filter(assigned_lawyer_id=lawyer_id)[:50],
+        'client_prioritized': Case.objects.filter(client_id=client_id)[:50],
+        'all_prioritized': Case.objects.all()[:50],
+        'urgent': manager.get_urgent_cases()[:50],
+        'overdue': manager.get_overdue_cases()[:50],
+        'stale_activity': Case.objects.filter(
+            last_activity__lt=now - timedelta(days=14),
+            status__in=['filed', 'investigation']
+        ).exclude(status='closed').order_by('-urgency_score')[:5],
+    }
+
+
+def analyze():
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def measure(queries, repeat):
+    results = {}
+    for name, queryset in queries.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = {
+            'median_ms': round(statistics.median(timings), 3),
+            'plan': queryset.explain(),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--keepdb', action='store_true', help='Keep (and reuse) the scratch database')
+    args = parser.parse_args()
+    
+    with scratch_database(keepdb=args.keepdb):
+        if not Case.objects.filter(case_number__startswith=f'B{args.seed}-').exists():
+            print(f"Generating {args.rows} cases (seed {args.seed})...")
+            start = time.perf_counter()
+            generate_cases(args.rows, seed=args.seed)
+            print(f"✓ Generated in {time.perf_counter() - start:.1f}s")
+        
+        first_case = Case.objects.exclude(assigned_lawyer=None).order_by('case_number').first()
+        queries = query_shapes(first_case.assigned_lawyer_id, first_case.client_id)
+        indexes = Case._meta.indexes
+        
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(Case, index)
+        analyze()
+        before = measure(queries, args.repeat)
+        
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(Case, index)
+        analyze()
+        after = measure(queries, args.repeat)
+        
+        print(f"\n{'query':<20} {'before ms':>12} {'after ms':>12} {'speedup':>9}")
+        for name in queries:
+            speedup = before[name]['median_ms'] / max(after[name]['median_ms'], 0.001)
+            print(f"{name:<20} {before[name]['median_ms']:>12.3f} {after[name]['median_ms']:>12.3f} {speedup:>8.1f}x")
+        
+        for name in queries:
+            print(f"\n== {name}\n-- before\n{before[name]['plan']}\n-- after\n{after[name]['plan']}")
+        
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({
+                    'vendor': connection.vendor,
+                    'rows': args.rows,
+                    'seed': args.seed,
+                    'before': before,
+                    'after': after,
+                }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+# benchmarks/run.py - Reproducible benchmarks for prioritization and the case API
+#
+# Generates a seeded synthetic dataset (see synthetic.py) in a scratch test
+# database, times each registered benchmark and writes JSON that can be
+# compared across commits:
+#
+#   python benchmarks/run.py --scale 10k --output base.json
+#   git checkout my-branch
+#   python benchmarks/run.py --scale 10k --output head.json
+#   python benchmarks/run.py --compare base.json head.json
+
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'case_prioritization.settings')
+
+import django
+django.setup()
+
+from django.db import connection
+from django.db.models import Count
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+import numpy as np
+
+from cases.models import User, Case
+from cases.views import CaseViewSet
+from cases.utils.prioritization import (
+    CasePriorityCalculator, CasePriorityManager, PRIORITY_UPDATE_CHUNK_SIZE,
+    mark_cases_dirty, schedule_priority_updates
+)
+from synthetic import SCALES, generate_dataset, scratch_database
+
+BENCHMARKS = {}
+
+# Cases used by the per-case and bulk-write benchmarks
+SAMPLE_SIZE = 1000
+BULK_SAMPLE_SIZE = 10_000
+
+
+def benchmark(name, repeat=None):
+    """Register fn(ctx, timer); only the code inside `with timer:` is measured"""
+    def register(fn):
+        BENCHMARKS[name] = (fn, repeat)
+        return fn
+    return register
+
+
+class Timer:
+    def __init__(self):
+        self.elapsed = []
+        self.ops = 1
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.elapsed.append((time.perf_counter() - self.started) * 1000)
+
+
+@benchmark('scoring.calculate_case_priority')
+def calculate_case_priority(ctx, timer):
+    calculator = CasePriorityCalculator()
+    timer.ops = len(ctx['sample'])
+    with timer:
+        for case in ctx['sample']:
+            calculator.calculate_case_priority(case)
+
+
+@benchmark('scoring.calculate_batch_priorities')
+def calculate_batch_priorities(ctx, timer):
+    calculator = CasePriorityCalculator()
+    columns = ctx['bulk_columns']
+    timer.ops = len(columns[0])
+    with timer:
+        calculator.calculate_batch_priorities(*columns)
+
+
+@benchmark('bulk_update_priorities.loop', repeat=3)
+def bulk_update_loop(ctx, timer):
+    cases = Case.objects.filter(pk__in=ctx['sample_ids'][:500])
+    timer.ops = 500
+    with timer:
+        CasePriorityManager().bulk_update_priorities(cases)
+
+
+@benchmark('bulk_update_priorities.chunked', repeat=3)
+def bulk_update_chunked(ctx, timer):
+    cases = Case.objects.filter(pk__in=ctx['bulk_ids'])
+    cases.update(urgency_score=0, priority_dirty=True)
+    timer.ops = len(ctx['bulk_ids'])
+    with timer:
+        CasePriorityManager().bulk_update_priorities(cases, chunk_size=PRIORITY_UPDATE_CHUNK_SIZE)
+
+
+@benchmark('schedule_priority_updates.incremental', repeat=3)
+def schedule_incremental(ctx, timer):
+    # About 1% of the active cases edited since the last run
+    active = Case.objects.exclude(status='closed')
+    timer.ops = mark_cases_dirty(active.filter(pk__in=ctx['bulk_ids'][:max(ctx['cases'] // 100, 1)]))
+    with timer:
+        schedule_priority_updates()
+
+
+@benchmark('schedule_priority_updates.database', repeat=3)
+def schedule_database(ctx, timer):
+    timer.ops = ctx['cases']
+    with timer:
+        schedule_priority_updates(strategy='database')
+
+
+@benchmark('get_priority_statistics.lawyer')
+def statistics_lawyer(ctx, timer):
+    manager = CasePriorityManager()
+    with timer:
+        manager.get_priority_statistics(ctx['lawyer'])
+
+
+@benchmark('get_priority_statistics.all', repeat=3)
+def statistics_all(ctx, timer):
+    manager = CasePriorityManager()
+    with timer:
+        manager.get_priority_statistics()
+
+
+def api_get(user, actions, path, pk=None, **params):
+    request = APIRequestFactory().get(path, params)
+    force_authenticate(request, user=user)
+    response = CaseViewSet.as_view(actions)(request, **({'pk': pk} if pk else {}))
+    response.render()
+    assert response.status_code == 200, response.data
+    return response
+
+
+@benchmark('api.cases.list.lawyer')
+def api_list(ctx, timer):
+    with timer:
+        api_get(ctx['lawyer'], {'get': 'list'}, '/api/cases/')
+
+
+@benchmark('api.cases.retrieve.lawyer')
+def api_retrieve(ctx, timer):
+    with timer:
+        api_get(ctx['lawyer'], {'get': 'retrieve'}, '/api/cases/', pk=ctx['lawyer_case_id'])
+
+
+@benchmark('api.cases.prioritized_cases.lawyer')
+def api_prioritized(ctx, timer):
+    with timer:
+        api_get(ctx['lawyer'], {'get': 'prioritized_cases'}, '/api/cases/prioritized_cases/')
+
+
+@benchmark('api.cases.dashboard_stats.lawyer')
+def api_dashboard_lawyer(ctx, timer):
+    with timer:
+        api_get(ctx['lawyer'], {'get': 'dashboard_stats'}, '/api/cases/dashboard_stats/')
+
+
+@benchmark('api.cases.dashboard_stats.client')
+def api_dashboard_client(ctx, timer):
+    with timer:
+        api_get(ctx['client'], {'get': 'dashboard_stats'}, '/api/cases/dashboard_stats/')
+
+
+def build_context(cases):
+    """Users and case samples shared by the benchmarks"""
+    def busiest(field):
+        user_id = (
+            Case.objects.exclude(**{field: None}).values(field)
+            .annotate(total=Count('pk')).order_by('-total', field).values_list(field, flat=True)[0]
+        )
+        return User.objects.get(pk=user_id)
+    
+    lawyer = busiest('assigned_lawyer')
+    sample_ids = list(Case.objects.exclude(status='closed').order_by('pk').values_list('pk', flat=True)[:BULK_SAMPLE_SIZE])
+    bulk_rows = list(Case.objects.filter(pk__in=sample_ids).values_list(*CasePriorityCalculator.BATCH_FIELDS))
+    return {
+        'cases': cases,
+        'lawyer': lawyer,
+        'client': busiest('client'),
+        'lawyer_case_id': Case.objects.filter(assigned_lawyer=lawyer).order_by('pk').values_list('pk', flat=True)[0],
+        'sample_ids': sample_ids[:SAMPLE_SIZE],
+        'sample': list(Case.objects.filter(pk__in=sample_ids[:SAMPLE_SIZE]).order_by('pk')),
+        'bulk_ids': sample_ids,
+        'bulk_columns': [list(column) for column in zip(*bulk_rows)],
+    }
+
+
+def environment():
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'database': connection.vendor,
+        'database_version': '.'.join(map(str, connection.Database.sqlite_version_info))
+        if connection.vendor == 'sqlite' else str(connection.pg_version if connection.vendor == 'postgresql' else ''),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'platform': platform.platform(),
+    }
+
+
+def run(args):
+    selected = {
+        name: entry for name, entry in BENCHMARKS.items()
+        if not args.only or any(name.startswith(prefix) for prefix in args.only)
+    }
+    cases = SCALES[args.scale]
+    results = {}
+    
+    with scratch_database(keepdb=args.keepdb):
+        dataset = None
+        if not Case.objects.exists():
+            print(f"Generating {args.scale} dataset (seed {args.seed})...")
+            started = time.perf_counter()
+            dataset = generate_dataset(cases, seed=args.seed)
+            dataset['seconds'] = round(time.perf_counter() - started, 1)
+            print(f"✓ Generated in {dataset['seconds']}s")
+        
+        ctx = build_context(cases)
+        for name, (fn, repeat) in selected.items():
+            timer = Timer()
+            fn(ctx, timer)  # warm-up, not recorded
+            timer.elapsed = []
+            for _ in range(repeat or args.repeat):
+                fn(ctx, timer)
+            median = statistics.median(timer.elapsed)
+            results[name] = {
+                'runs': len(timer.elapsed),
+                'ops': timer.ops,
+                'min_ms': round(min(timer.elapsed), 3),
+                'median_ms': round(median, 3),
+                'mean_ms': round(statistics.fmean(timer.elapsed), 3),
+                'max_ms': round(max(timer.elapsed), 3),
+                'per_op_us': round(median * 1000 / max(timer.ops, 1), 3),
+            }
+            print(f"{name:<42} {median:>12.3f} ms  ({results[name]['per_op_us']} us/op)")
+        
+        report = {
+            'scale': args.scale,
+            'seed': args.seed,
+            'dataset': dataset,
+            'environment': environment(),
+            'results': results,
+        }
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"✓ Results written to {args.output}")
+
+
+def compare(base_path, head_path, threshold):
+    """Print median changes between two result files; returns True if any regressed"""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(head_path) as f:
+        head = json.load(f)
+    
+    for key in ('scale', 'seed'):
+        if base[key] != head[key]:
+            print(f"⚠ {key} differs: {base[key]} vs {head[key]}")
+    for key in ('database', 'cpus', 'platform'):
+        if base['environment'].get(key) != head['environment'].get(key):
+            print(f"⚠ {key} differs: {base['environment'].get(key)} vs {head['environment'].get(key)}")
+    
+    print(f"base {base['environment'].get('commit')}  head {head['environment'].get('commit')}\n")
+    print(f"{'benchmark':<42} {'base ms':>12} {'head ms':>12} {'change':>9}")
+    regressed = False
+    for name in sorted(set(base['results']) | set(head['results'])):
+        if name not in base['results'] or name not in head['results']:
+            print(f"{name:<42} {'(only in ' + ('head' if name in head['results'] else 'base') + ')':>35}")
+            continue
+        before = base['results'][name]['median_ms']
+        after = head['results'][name]['median_ms']
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ' !' if change > threshold else ''
+        regressed = regressed or bool(flag)
+        print(f"{name:<42} {before:>12.3f} {after:>12.3f} {change:>+8.1f}%{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prioritization and case API benchmarks')
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per benchmark (heavy ones use fewer)')
+    parser.add_argument('--only', nargs='*', help='Run benchmarks whose names start with these prefixes')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    parser.add_argument('--keepdb', action='store_true', help='Keep (and reuse) the scratch database')
+    parser.add_argument('--in-process-backends', action='store_true',
+                        help='Use locmem cache, the in-memory channel layer and the memory priority index instead of Redis')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'), help='Compare two result files')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Regression threshold in percent')
+    args = parser.parse_args()
+    
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    
+    if args.in_process_backends:
+        override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+            PRIORITY_INDEX_BACKEND='memory',
+        ).enable()
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
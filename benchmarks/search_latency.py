@@ -0,0 +1,142 @@
+# benchmarks/search_latency.py - ?search= latency: full-text index against SearchFilter's LIKE
+#
+# Loads seeded cases with generated titles and descriptions into a scratch
+# database (the test database for the configured DATABASES / DATABASE_URL),
+# times the rebuild_case_search backfill, then times the first page of
+# GET /api/cases/?search= for a few query shapes, as an admin (every case)
+# and as the busiest lawyer, through the full-text index and through
+# DRF's SearchFilter:
+#
+#   python benchmarks/search_latency.py --scale 1M --keepdb
+#   DATABASE_URL=postgres://... python benchmarks/search_latency.py --output search.json
+
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'case_prioritization.settings')
+
+import django
+django.setup()
+
+from django.db import connection
+from django.db.models import Count
+from django.test import override_settings
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from cases.models import Case, User
+from cases.utils.search import get_case_search
+from cases.views import CaseViewSet
+from synthetic import CASE_WORDS, SCALES, generate_cases, scratch_database
+
+
+class LikeSearchCaseViewSet(CaseViewSet):
+    """CaseViewSet as it searched before the index: LIKE '%term%' on every search field"""
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+
+
+def query_shapes(seed):
+    # A party of the first generated case, so the name has matches at any scale
+    name = Case.objects.order_by('case_number').values_list('title', flat=True)[0].split(' v. ')[0]
+    return {
+        'party_name': name,
+        'party_name_prefix': name[:5],
+        'party_name_and_word': f'{name} {CASE_WORDS[10]}',
+        'case_number': f'B{seed}-{123:08d}',
+        'uncommon_word': CASE_WORDS[-1],
+        # In nearly every case: ranking has to score them all
+        'common_word': CASE_WORDS[0],
+    }
+
+
+def first_page(view, user, search):
+    request = APIRequestFactory().get('/api/cases/', {'search': search})
+    force_authenticate(request, user=user)
+    response = view(request)
+    response.render()
+    assert response.status_code == 200, response.data
+    return response
+
+
+def measure(view, user, search, repeat):
+    first_page(view, user, search)  # warm-up, not recorded
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        first_page(view, user, search)
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='?search= latency with and without the full-text index')
+    parser.add_argument('--scale', choices=SCALES, default='1M')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Backfill batch size')
+    parser.add_argument('--keepdb', action='store_true', help='Keep (and reuse) the scratch database')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+    
+    # The index lives in the database; nothing here needs Redis
+    override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+        PRIORITY_INDEX_BACKEND='memory',
+    ).enable()
+    
+    search = get_case_search()
+    if search is None:
+        sys.exit(f'{connection.vendor} has no full-text case index')
+    
+    results = {'vendor': connection.vendor, 'cases': SCALES[args.scale], 'seed': args.seed}
+    with scratch_database(keepdb=args.keepdb):
+        if not Case.objects.filter(case_number__startswith=f'B{args.seed}-').exists():
+            print(f"Generating {args.scale} cases with text (seed {args.seed})...")
+            started = time.perf_counter()
+            generate_cases(SCALES[args.scale], seed=args.seed, text=True)
+            print(f"✓ Generated in {time.perf_counter() - started:.1f}s")
+        
+        # bulk_create bypasses the case signals, as an existing table would
+        started = time.perf_counter()
+        indexed = search.rebuild(chunk_size=args.chunk_size)
+        results['backfill_seconds'] = round(time.perf_counter() - started, 1)
+        results['backfill_cases_per_second'] = round(indexed / max(results['backfill_seconds'], 0.001))
+        print(f"✓ Indexed {indexed} cases in {results['backfill_seconds']}s")
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        
+        admin, _ = User.objects.get_or_create(username='search_admin', defaults={'user_type': 'admin'})
+        lawyer = User.objects.get(pk=(
+            Case.objects.exclude(assigned_lawyer=None).values('assigned_lawyer')
+            .annotate(total=Count('pk')).order_by('-total', 'assigned_lawyer').values_list('assigned_lawyer', flat=True)[0]
+        ))
+        index_view = CaseViewSet.as_view({'get': 'list'})
+        like_view = LikeSearchCaseViewSet.as_view({'get': 'list'})
+        
+        results['queries'] = {}
+        print(f"\n{'query':<28} {'matches':>9} {'index ms':>10} {'LIKE ms':>10} {'speedup':>9}")
+        for name, text in query_shapes(args.seed).items():
+            matches = search.search(Case.objects.all(), text.split()).count()
+            for role, user in (('admin', admin), ('lawyer', lawyer)):
+                index_ms = measure(index_view, user, text, args.repeat)
+                like_ms = measure(like_view, user, text, args.repeat)
+                key = f'{name}.{role}'
+                results['queries'][key] = {
+                    'search': text, 'matches': matches, 'index_ms': index_ms, 'like_ms': like_ms,
+                }
+                print(f"{key:<28} {matches:>9} {index_ms:>10.3f} {like_ms:>10.3f} {like_ms / max(index_ms, 0.001):>8.1f}x")
+    
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
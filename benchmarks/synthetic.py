@@ -0,0 +1,229 @@
+# benchmarks/synthetic.py - Seeded synthetic data and scratch databases for benchmarks
+
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+import random
+import uuid
+
+from cases.models import User, LawyerProfile, Case, CaseActivity, Notification
+
+# Named dataset sizes (number of cases)
+SCALES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000}
+
+STATUS_WEIGHTS = {
+    'filed': 25, 'investigation': 25, 'hearing': 15, 'trial': 10, 'on_hold': 5, 'closed': 20
+}
+CASE_TYPES = [case_type for case_type, _ in Case.CASE_TYPES]
+ACTIVITY_TYPES = [activity_type for activity_type, _ in CaseActivity.ACTIVITY_TYPES]
+NOTIFICATION_TYPES = [notification_type for notification_type, _ in Notification.NOTIFICATION_TYPES]
+
+# Case text vocabulary, drawn with Zipf-like weights (earlier words are more common)
+CASE_WORDS = '''
+    case court claim contract party filing motion hearing evidence witness agreement payment
+    property damages breach notice appeal settlement counsel defendant plaintiff liability
+    lease tenant landlord custody employment termination insurance negligence injury estate
+    probate trust guardian partnership invoice supplier warranty trademark copyright patent
+    arbitration mediation subpoena deposition affidavit injunction zoning easement mortgage
+    foreclosure bankruptcy creditor garnishment indemnity fiduciary annulment alimony visitation
+'''.split()
+CASE_WORD_WEIGHTS = [1 / rank for rank in range(1, len(CASE_WORDS) + 1)]
+# Party names for titles ("Name v. Name"): 6000 distinct, each in a few hundred cases per million
+NAME_SYLLABLES = ['al', 'ber', 'cor', 'dan', 'el', 'fen', 'gar', 'hol', 'is', 'jor', 'kel', 'lan',
+                  'mor', 'nor', 'os', 'per', 'quin', 'ros', 'sel', 'tor']
+NAME_ENDINGS = ['son', 'ley', 'wood', 'field', 'man', 'ton', 'er', 'ez', 'ski', 'well', 'ford', 'by', 'more', 'ham', 'ridge']
+PARTY_NAMES = [(a + b + c).capitalize() for a in NAME_SYLLABLES for b in NAME_SYLLABLES for c in NAME_ENDINGS]
+
+
+@contextmanager
+def scratch_database(keepdb=False):
+    """
+    Run inside the test database of the configured DATABASES (or
+    DATABASE_URL), so benchmarks never touch real data. SQLite test databases
+    default to memory; benchmarks keep theirs on disk instead.
+    Also applies the test environment (DEBUG off, so queries aren't logged,
+    and 'testserver' allowed for APIRequestFactory).
+    """
+    if connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = str(Path(__file__).resolve().parent / 'benchmark.sqlite3')
+    setup_test_environment(debug=False)
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(connection.settings_dict['NAME'], verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep generated values for auto_now / auto_now_add fields"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def create_users(user_type, count, rng, prefix='bench', batch_size=5000):
+    """Bulk create users sharing one unusable password; returns their IDs"""
+    password = make_password(None)
+    users = [
+        User(
+            id=uuid.UUID(int=rng.getrandbits(128)),
+            username=f'{prefix}_{user_type}_{n}',
+            user_type=user_type,
+            password=password,
+        )
+        for n in range(count)
+    ]
+    User.objects.bulk_create(users, batch_size=batch_size)
+    
+    if user_type == 'lawyer':
+        LawyerProfile.objects.bulk_create([
+            LawyerProfile(
+                user=user,
+                license_number=f'{prefix.upper()}-LIC-{n:06d}',
+                specializations=rng.sample(CASE_TYPES, 2),
+                experience_years=rng.randint(1, 30),
+                bar_association='Synthetic Bar',
+                availability_status=rng.choice(['available', 'busy', 'offline']),
+            )
+            for n, user in enumerate(users)
+        ], batch_size=batch_size)
+    return [user.id for user in users]
+
+
+def case_text(rng, words):
+    return ' '.join(rng.choices(CASE_WORDS, CASE_WORD_WEIGHTS, k=words)).capitalize()
+
+
+def case_title(rng):
+    return f'{rng.choice(PARTY_NAMES)} v. {rng.choice(PARTY_NAMES)}: {case_text(rng, rng.randint(2, 4)).lower()}'
+
+
+def generate_cases(count, seed=0, batch_size=5000, now=None, text=False):
+    """
+    Bulk create `count` cases (plus one lawyer per 5000 and one client per 50)
+    with a deterministic mix of statuses, deadlines, priorities and
+    assignments; the same seed always produces the same rows.
+    With text, titles name two PARTY_NAMES and descriptions are drawn from
+    CASE_WORDS (by a separate generator, so the other columns match a run
+    without it).
+    Returns (lawyer_ids, client_ids).
+    """
+    rng = random.Random(seed)
+    text_rng = random.Random(f'{seed}-text')
+    now = now or timezone.now()
+    lawyers = create_users('lawyer', max(count // 5000, 10), rng, prefix=f'bench{seed}')
+    clients = create_users('client', max(count // 50, 10), rng, prefix=f'bench{seed}')
+    statuses, weights = zip(*STATUS_WEIGHTS.items())
+    
+    with explicit_timestamps(Case):
+        for start in range(0, count, batch_size):
+            cases = []
+            for n in range(start, min(start + batch_size, count)):
+                filing_date = now - timedelta(hours=rng.randint(0, 365 * 24))
+                cases.append(Case(
+                    id=uuid.UUID(int=rng.getrandbits(128)),
+                    case_number=f'B{seed}-{n:08d}',
+                    title=case_title(text_rng) if text else f'Benchmark case {n}',
+                    description=case_text(text_rng, text_rng.randint(20, 60)) if text else 'Synthetic benchmark case',
+                    case_type=rng.choice(CASE_TYPES),
+                    client_id=rng.choice(clients),
+                    assigned_lawyer_id=rng.choice(lawyers) if rng.random() < 0.85 else None,
+                    priority_level=rng.randint(1, 5),
+                    status=rng.choices(statuses, weights)[0],
+                    filing_date=filing_date,
+                    deadline=now + timedelta(hours=rng.randint(-60 * 24, 240 * 24)) if rng.random() < 0.9 else None,
+                    client_importance=rng.randint(1, 5),
+                    urgency_score=round(rng.uniform(0, 100), 2),
+                    priority_dirty=False,
+                    created_at=filing_date,
+                    updated_at=now - timedelta(hours=rng.randint(0, 60 * 24)),
+                    last_activity=now - timedelta(hours=rng.randint(0, 60 * 24)),
+                ))
+            Case.objects.bulk_create(cases, batch_size=batch_size)
+    return lawyers, clients
+
+
+def generate_activities(per_case, seed=0, batch_size=5000, now=None):
+    """Bulk create about `per_case` activities per case over the last 60 days"""
+    rng = random.Random(f'{seed}-activities')
+    now = now or timezone.now()
+    created = 0
+    
+    with explicit_timestamps(CaseActivity):
+        activities = []
+        for case_id, lawyer_id, client_id in Case.objects.order_by('pk').values_list(
+            'pk', 'assigned_lawyer_id', 'client_id'
+        ).iterator(chunk_size=batch_size):
+            for _ in range(rng.randint(0, per_case * 2)):
+                activities.append(CaseActivity(
+                    id=uuid.UUID(int=rng.getrandbits(128)),
+                    case_id=case_id,
+                    activity_type=rng.choice(ACTIVITY_TYPES),
+                    description='Synthetic activity',
+                    performed_by_id=lawyer_id or client_id,
+                    timestamp=now - timedelta(minutes=rng.randint(0, 60 * 24 * 60)),
+                ))
+            if len(activities) >= batch_size:
+                CaseActivity.objects.bulk_create(activities, batch_size=batch_size)
+                created += len(activities)
+                activities = []
+        CaseActivity.objects.bulk_create(activities, batch_size=batch_size)
+    return created + len(activities)
+
+
+def generate_notifications(per_case, seed=0, batch_size=5000, now=None):
+    """Bulk create about `per_case` notifications per case for its client and lawyer"""
+    rng = random.Random(f'{seed}-notifications')
+    now = now or timezone.now()
+    created = 0
+    
+    with explicit_timestamps(Notification):
+        notifications = []
+        for case_id, lawyer_id, client_id in Case.objects.order_by('pk').values_list(
+            'pk', 'assigned_lawyer_id', 'client_id'
+        ).iterator(chunk_size=batch_size):
+            for _ in range(rng.randint(0, per_case * 2)):
+                notifications.append(Notification(
+                    id=uuid.UUID(int=rng.getrandbits(128)),
+                    recipient_id=lawyer_id if lawyer_id and rng.random() < 0.5 else client_id,
+                    notification_type=rng.choice(NOTIFICATION_TYPES),
+                    title='Synthetic notification',
+                    message='Synthetic notification',
+                    is_read=rng.random() < 0.7,
+                    related_case_id=case_id,
+                    created_at=now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+                ))
+            if len(notifications) >= batch_size:
+                Notification.objects.bulk_create(notifications, batch_size=batch_size)
+                created += len(notifications)
+                notifications = []
+        Notification.objects.bulk_create(notifications, batch_size=batch_size)
+    return created + len(notifications)
+
+
+def generate_dataset(cases, seed=0, activities_per_case=2, notifications_per_case=1):
+    """Users, lawyer profiles, cases, activities and notifications for one seed"""
+    now = timezone.now()
+    lawyers, clients = generate_cases(cases, seed=seed, now=now)
+    return {
+        'lawyers': len(lawyers),
+        'clients': len(clients),
+        'cases': cases,
+        'activities': generate_activities(activities_per_case, seed=seed, now=now),
+        'notifications': generate_notifications(notifications_per_case, seed=seed, now=now),
+    }
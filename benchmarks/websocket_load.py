@@ -0,0 +1,146 @@
+# benchmarks/websocket_load.py - Idle WebSocket connection and fan-out load test
+#
+# Opens many token-authenticated connections to the ASGI application in this
+# process (no server or Redis: the in-memory channel layer and a scratch
+# database), leaves them idle, then fans case updates out to them:
+#
+#   python benchmarks/websocket_load.py --connections 20000 --users 2000
+#
+# Reports connect throughput, memory per idle connection and fan-out
+# delivery time, as text or JSON (--output). The in-memory layer scans every
+# channel for expired messages on each send, so fan-out figures understate
+# what the Redis layer does; the connection memory figures carry over.
+
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'case_prioritization.settings')
+
+import django
+django.setup()
+
+from django.test import override_settings
+
+override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer', 'CONFIG': {'capacity': 1000}}},
+    PRIORITY_INDEX_BACKEND='memory',
+).enable()
+
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from rest_framework.authtoken.models import Token
+import numpy as np
+
+from case_prioritization.asgi import application
+from synthetic import create_users, scratch_database
+
+
+class Connection(ApplicationCommunicator):
+    """One WebSocket client of the ASGI application"""
+    
+    def __init__(self, path, token):
+        super().__init__(application, {
+            'type': 'websocket', 'path': path, 'query_string': f'token={token}'.encode(),
+            'headers': [], 'subprotocols': [],
+        })
+    
+    async def connect(self):
+        await self.send_input({'type': 'websocket.connect'})
+        message = await self.receive_output(30)
+        if message['type'] != 'websocket.accept':
+            raise RuntimeError(f'Connection rejected: {message}')
+    
+    async def receive_json(self):
+        return json.loads((await self.receive_output(30))['text'])
+    
+    async def disconnect(self):
+        await self.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await self.wait(30)
+
+
+def rss_mb():
+    """Current resident set size (peak on platforms without /proc)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run_load(args, tokens):
+    channel_layer = get_channel_layer()
+    results = {'connections': args.connections, 'users': len(tokens)}
+    
+    rss_before = rss_mb()
+    connections = []
+    started = time.perf_counter()
+    # Connect in batches, like clients arriving together after a deploy
+    for start in range(0, args.connections, args.batch):
+        batch = [
+            Connection('/ws/updates/', tokens[i % len(tokens)][1])
+            for i in range(start, min(start + args.batch, args.connections))
+        ]
+        await asyncio.gather(*[connection.connect() for connection in batch])
+        connections.extend(batch)
+    elapsed = time.perf_counter() - started
+    results['connect_per_second'] = args.connections / elapsed
+    
+    # Let the handshakes settle, then measure what idle connections cost
+    await asyncio.sleep(args.idle)
+    results['rss_mb'] = rss_mb()
+    results['kb_per_idle_connection'] = (results['rss_mb'] - rss_before) * 1024 / args.connections
+    
+    # Fan one update out to every user, then wait for every connection to get it
+    latencies = []
+    for round_number in range(args.rounds):
+        started = time.perf_counter()
+        for user_id, _ in tokens:
+            await channel_layer.group_send(f'user_{user_id}', {
+                'type': 'case_update', 'update_type': 'priority_updated', 'case_id': str(round_number),
+                'seq': round_number + 1, 'changes': {'urgency_score': 50.0 + round_number},
+            })
+        await asyncio.gather(*[connection.receive_json() for connection in connections])
+        latencies.append(time.perf_counter() - started)
+    results['fanout_seconds_median'] = float(np.median(latencies))
+    results['messages_per_second'] = args.connections / results['fanout_seconds_median']
+    
+    started = time.perf_counter()
+    await asyncio.gather(*[connection.disconnect() for connection in connections])
+    results['disconnect_seconds'] = time.perf_counter() - started
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Idle WebSocket connection and fan-out load test')
+    parser.add_argument('--connections', type=int, default=10_000)
+    parser.add_argument('--users', type=int, default=1000, help='Connections are spread across this many users')
+    parser.add_argument('--batch', type=int, default=1000, help='Connections opened concurrently')
+    parser.add_argument('--rounds', type=int, default=3, help='Fan-out rounds to time')
+    parser.add_argument('--idle', type=float, default=1.0, help='Seconds to sit idle before measuring memory')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+    
+    with scratch_database():
+        user_ids = create_users('client', args.users, random.Random(args.seed), prefix='ws')
+        tokens = [(user_id, Token.generate_key()) for user_id in user_ids]
+        Token.objects.bulk_create([Token(user_id=user_id, key=key) for user_id, key in tokens])
+        results = asyncio.run(run_load(args, tokens))
+    
+    for name, value in results.items():
+        print(f"{name:<26} {value:>12.2f}" if isinstance(value, float) else f"{name:<26} {value:>12}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,8 @@
 ASGI config for case_prioritization project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; WebSocket connections are authenticated with their DRF
+token and routed to the consumers in cases/routing.py.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +15,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'case_prioritization.settings')
 
-application = get_asgi_application()
+# Set up Django before importing anything that touches models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from cases.middleware import TokenAuthMiddlewareStack  # noqa: E402
+from cases.routing import websocket_urlpatterns  # noqa: E402
+
+# No origin check: connections authenticate with a token rather than
+# cookies, so another site can't open one on a user's behalf
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': TokenAuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
+})
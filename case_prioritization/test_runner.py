@@ -0,0 +1,26 @@
+"""
+Test runner for Legal Nexus: the suite runs against in-process cache,
+channel layer and priority index backends, so it doesn't need a Redis server.
+"""
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+TEST_SERVICE_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    'PRIORITY_INDEX_BACKEND': 'memory',
+}
+
+
+class LocalServicesTestRunner(DiscoverRunner):
+    """DiscoverRunner with TEST_SERVICE_SETTINGS applied for the whole run"""
+    
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.service_settings = override_settings(**TEST_SERVICE_SETTINGS)
+        self.service_settings.enable()
+    
+    def teardown_test_environment(self, **kwargs):
+        self.service_settings.disable()
+        super().teardown_test_environment(**kwargs)
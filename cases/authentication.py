@@ -0,0 +1,173 @@
+# authentication.py - DRF token authentication with cached token lookups
+
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+import copy
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_PREFIX = 'auth_token:'
+# The frontend sends "Bearer <key>"; DRF's own clients "Token <key>"
+TOKEN_KEYWORDS = ('Token', 'Bearer')
+
+
+class LocalTokenCache:
+    """
+    Bounded in-process LRU of token key -> (user, token, expiry). Entries
+    live for TOKEN_AUTH_LOCAL_CACHE_TIMEOUT seconds, which bounds how long
+    another process's logout or user change can go unnoticed here.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.keys_by_user = {}
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                self._discard(key)
+                return None
+            self.entries.move_to_end(key)
+        # Requests get their own instances to modify
+        user, token = copy.copy(entry[0]), copy.copy(entry[1])
+        token.user = user
+        return user, token
+    
+    def set(self, key, user, token):
+        with self.lock:
+            self._discard(key)
+            self.entries[key] = (user, token, time.monotonic() + settings.TOKEN_AUTH_LOCAL_CACHE_TIMEOUT)
+            self.keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self.entries) > settings.TOKEN_AUTH_LOCAL_CACHE_SIZE:
+                self._discard(next(iter(self.entries)))
+    
+    def discard(self, key):
+        with self.lock:
+            self._discard(key)
+    
+    def discard_user(self, user_id):
+        with self.lock:
+            for key in list(self.keys_by_user.get(user_id, ())):
+                self._discard(key)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_user.clear()
+    
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            user_keys = self.keys_by_user.get(entry[0].pk)
+            if user_keys is not None:
+                user_keys.discard(key)
+                if not user_keys:
+                    del self.keys_by_user[entry[0].pk]
+
+
+local_tokens = LocalTokenCache()
+
+
+def cached_fields(instance, exclude=()):
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields if field.attname not in exclude
+    }
+
+
+def from_cached_fields(model, values):
+    # from_db leaves the fields that weren't cached deferred, so a save()
+    # of a cached user writes only what it loaded and never blanks them
+    return model.from_db(router.db_for_read(model), list(values), list(values.values()))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps token -> user lookups in an in-process
+    LRU backed by the shared cache (TOKEN_AUTH_CACHE_TIMEOUT seconds), so an
+    authenticated request normally costs no query. Cached users carry
+    every field except the password hash, which stays deferred. Deleting
+    or saving a token, and saving its user, drop the entries (see signals).
+    Accepts both "Token <key>" and "Bearer <key>" headers.
+    """
+    
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() not in [keyword.lower().encode() for keyword in TOKEN_KEYWORDS]:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header. Token string should not contain spaces.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                'Invalid token header. Token string should not contain invalid characters.'
+            )
+        return self.authenticate_credentials(key)
+    
+    def authenticate_credentials(self, key):
+        cached = local_tokens.get(key)
+        if cached is not None:
+            return cached
+        
+        cached = self.get_shared(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            self.set_shared(key, user, token)
+            cached = (user, token)
+        if not cached[0].is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        local_tokens.set(key, *cached)
+        return cached
+    
+    def get_shared(self, key):
+        try:
+            values = cache.get(f'{TOKEN_CACHE_PREFIX}{key}')
+        except Exception as e:
+            logger.error(f"Error reading cached token: {str(e)}")
+            return None
+        if values is None:
+            return None
+        user = from_cached_fields(get_user_model(), values['user'])
+        token = from_cached_fields(Token, values['token'])
+        token.user = user
+        return user, token
+    
+    def set_shared(self, key, user, token):
+        values = {'user': cached_fields(user, exclude={'password'}), 'token': cached_fields(token)}
+        try:
+            cache.set(f'{TOKEN_CACHE_PREFIX}{key}', values, settings.TOKEN_AUTH_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error caching token: {str(e)}")
+
+
+def invalidate_token(key):
+    """Forget a token in this process and the shared cache"""
+    local_tokens.discard(key)
+    try:
+        cache.delete(f'{TOKEN_CACHE_PREFIX}{key}')
+    except Exception as e:
+        logger.error(f"Error invalidating cached token: {str(e)}")
+
+
+def invalidate_user_tokens(user_id):
+    """Forget every cached token of a user (after the user changed)"""
+    local_tokens.discard_user(user_id)
+    keys = list(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+    try:
+        cache.delete_many([f'{TOKEN_CACHE_PREFIX}{key}' for key in keys])
+    except Exception as e:
+        logger.error(f"Error invalidating cached tokens: {str(e)}")
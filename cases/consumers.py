@@ -0,0 +1,192 @@
+# consumers.py - WebSocket consumers for case updates and notifications
+
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from django.conf import settings
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .utils.priority_feed import MAX_WINDOW, REFRESH_GROUP, PriorityFeed, feed_group_for
+from .utils.scoping import can_see_case
+import asyncio
+import uuid
+
+# Close codes sent before the handshake is accepted show up as a 403
+INVALID_REQUEST = 4400
+UNAUTHORIZED = 4401
+FORBIDDEN = 4403
+
+
+# Following a case needs the same access as reading it over the API
+can_access_case = database_sync_to_async(can_see_case)
+
+
+class GroupConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Authenticated connection that tracks the groups it joins and leaves
+    them on disconnect. Keeps no per-connection state beyond that and does
+    no work while idle, so a process can hold many connections.
+    """
+    
+    async def connect(self):
+        self.user = self.scope.get('user')
+        self.joined = set()
+        if self.user is None or not self.user.is_authenticated:
+            await self.close(code=UNAUTHORIZED)
+            return
+        await self.join_groups()
+    
+    async def join_groups(self):
+        raise NotImplementedError
+    
+    async def join(self, group):
+        await self.channel_layer.group_add(group, self.channel_name)
+        self.joined.add(group)
+    
+    async def leave(self, group):
+        await self.channel_layer.group_discard(group, self.channel_name)
+        self.joined.discard(group)
+    
+    async def disconnect(self, code):
+        for group in list(self.joined):
+            await self.leave(group)
+
+
+class CaseUpdatesConsumer(GroupConsumer):
+    """
+    Relays the case_update and notifications messages sent to the groups a
+    connection has joined. The first update of a case on a connection sends
+    the whole case (case_data); later ones send only the fields that changed
+    since this connection's last message about it (changes), with seq
+    counting that case's messages on this connection. The baseline is what
+    this client was sent, so diffs hold whichever process broadcast the
+    update, and a case that falls out of the MAX_CASE_BASELINES most recent
+    starts again from a full message. An update that changes nothing this
+    client hasn't seen, such as the copy that also arrives through a second
+    group (user_<id> and case_<id>), is dropped.
+    """
+    MAX_CASE_BASELINES = 200
+    
+    async def connect(self):
+        # case_id -> (seq, case_data) last sent to this client, least recent first
+        self.baselines = OrderedDict()
+        await super().connect()
+    
+    async def case_update(self, event):
+        case_id = event['case_id']
+        case_data = event['case_data']
+        seq, previous = self.baselines.pop(case_id, (0, None))
+        message = {key: value for key, value in event.items() if key != 'case_data'}
+        if previous is None:
+            message['case_data'] = case_data
+        else:
+            changes = {field: value for field, value in case_data.items() if previous.get(field) != value}
+            if not changes:
+                self.baselines[case_id] = (seq, previous)
+                return
+            message['changes'] = changes
+        message['seq'] = seq + 1
+        self.baselines[case_id] = (seq + 1, case_data)
+        while len(self.baselines) > self.MAX_CASE_BASELINES:
+            self.baselines.popitem(last=False)
+        await self.send_json(message)
+    
+    async def notifications(self, event):
+        await self.send_json({'type': 'notifications', 'notifications': event['notifications']})
+
+
+class UserUpdatesConsumer(CaseUpdatesConsumer):
+    """
+    ws/updates/ - the user's notifications and updates to their cases
+    (user_<id>), plus individual cases followed with
+        {"action": "subscribe", "case_id": "<uuid>"}
+        {"action": "unsubscribe", "case_id": "<uuid>"}
+    """
+    MAX_CASE_SUBSCRIPTIONS = 100
+    
+    async def join_groups(self):
+        await self.join(f'user_{self.user.pk}')
+        await self.accept()
+    
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action') if isinstance(content, dict) else None
+        if action not in ('subscribe', 'unsubscribe'):
+            await self.send_json({'type': 'error', 'error': 'Unknown action'})
+            return
+        try:
+            case_id = str(uuid.UUID(str(content.get('case_id'))))
+        except ValueError:
+            await self.send_json({'type': 'error', 'error': 'Invalid case_id'})
+            return
+        
+        group = f'case_{case_id}'
+        if action == 'unsubscribe':
+            await self.leave(group)
+            await self.send_json({'type': 'unsubscribed', 'case_id': case_id})
+            return
+        
+        if group not in self.joined:
+            subscriptions = sum(1 for joined in self.joined if joined.startswith('case_'))
+            if subscriptions >= self.MAX_CASE_SUBSCRIPTIONS:
+                await self.send_json({'type': 'error', 'error': 'Too many subscriptions'})
+                return
+            if not await can_access_case(self.user, case_id):
+                await self.send_json({'type': 'error', 'error': 'Case not found'})
+                return
+            await self.join(group)
+        await self.send_json({'type': 'subscribed', 'case_id': case_id})
+
+
+class CaseConsumer(CaseUpdatesConsumer):
+    """ws/cases/<case_id>/ - updates to a single case"""
+    
+    async def join_groups(self):
+        case_id = str(self.scope['url_route']['kwargs']['case_id'])
+        if not await can_access_case(self.user, case_id):
+            await self.close(code=FORBIDDEN)
+            return
+        await self.join(f'case_{case_id}')
+        await self.accept()
+
+
+class PriorityFeedConsumer(GroupConsumer):
+    """
+    ws/priorities/?page=1&page_size=25 - rank and score changes in one window
+    of the user's prioritized cases (see PriorityFeed). Sends a snapshot,
+    then deltas whenever rescoring moves the window; reconnect with
+    &resume=<resume_token>&version=<last applied version> to catch up.
+    """
+    
+    async def join_groups(self):
+        query = parse_qs(self.scope.get('query_string', b'').decode('latin1'))
+        try:
+            page = max(int(query.get('page', ['1'])[0]), 1)
+            page_size = int(query.get('page_size', ['25'])[0])
+            version = int(query['version'][0]) if 'version' in query else None
+        except ValueError:
+            await self.close(code=INVALID_REQUEST)
+            return
+        page_size = min(max(page_size, 1), MAX_WINDOW)
+        
+        self.feed = PriorityFeed(self.user, offset=(page - 1) * page_size, limit=page_size)
+        self.refresh_task = None
+        await self.join(feed_group_for(self.user))
+        await self.join(REFRESH_GROUP)
+        await self.accept()
+        await self.send_json(await database_sync_to_async(self.feed.start)(query.get('resume', [None])[0], version))
+    
+    async def priority_changes(self, event):
+        if self.refresh_task is None and (event.get('refresh') or self.feed.is_relevant(event['cases'])):
+            self.refresh_task = asyncio.ensure_future(self.refresh_soon())
+    
+    async def refresh_soon(self):
+        # Rescoring arrives in chunks; wait for the burst before recomputing
+        await asyncio.sleep(settings.PRIORITY_FEED_DEBOUNCE)
+        self.refresh_task = None
+        message = await database_sync_to_async(self.feed.refresh)()
+        if message is not None:
+            await self.send_json(message)
+    
+    async def disconnect(self, code):
+        if getattr(self, 'refresh_task', None) is not None:
+            self.refresh_task.cancel()
+        await super().disconnect(code)
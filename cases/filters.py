@@ -0,0 +1,20 @@
+# filters.py - Filter backends for Legal Nexus API
+
+from rest_framework.filters import SearchFilter
+from .utils.search import get_case_search
+
+
+class CaseSearchFilter(SearchFilter):
+    """
+    ?search= through the full-text index (see utils/search.py): every word
+    must match a search field, as a prefix, and results carry a search_rank
+    that keyset pagination lists best first. Databases without an index
+    fall back to SearchFilter's LIKE over the view's search_fields.
+    """
+    
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        search = get_case_search()
+        if not terms or search is None:
+            return super().filter_queryset(request, queryset, view)
+        return search.search(queryset, terms, user=request.user)
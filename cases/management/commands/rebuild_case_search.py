@@ -0,0 +1,24 @@
+# management/commands/rebuild_case_search.py - Backfill or rebuild the full-text case search index
+
+from django.core.management.base import BaseCommand, CommandError
+from cases.utils.search import get_case_search
+
+
+class Command(BaseCommand):
+    help = (
+        'Index every case for ?search= (SQLite FTS5 table or PostgreSQL search_vector). '
+        'The migration indexes existing cases; run this after loaddata or bulk writes that bypass the case signals.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Cases indexed per statement batch (per transaction on PostgreSQL)'
+        )
+    
+    def handle(self, *args, **options):
+        search = get_case_search()
+        if search is None:
+            raise CommandError('This database has no full-text case index; searches use LIKE')
+        indexed = search.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} cases for search'))
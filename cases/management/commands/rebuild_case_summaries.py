@@ -0,0 +1,12 @@
+# management/commands/rebuild_case_summaries.py - Recompute the per-lawyer and per-client case summaries
+
+from django.core.management.base import BaseCommand
+from cases.utils.summaries import rebuild_case_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute every lawyer and client case summary from the cases table'
+    
+    def handle(self, *args, **options):
+        written = rebuild_case_summaries()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} case summaries'))
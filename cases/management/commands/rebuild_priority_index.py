@@ -0,0 +1,33 @@
+# management/commands/rebuild_priority_index.py - Repopulate or verify the priority index
+
+from django.core.management.base import BaseCommand, CommandError
+from cases.utils.ranking import get_priority_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the top-K priority index from the cases table, or check it for drift'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Compare the index with the database instead of rebuilding it'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Cases read per query while rebuilding'
+        )
+    
+    def handle(self, *args, **options):
+        index = get_priority_index()
+        
+        if options['check']:
+            problems = index.check()
+            for key, case_id, problem in problems[:50]:
+                self.stderr.write(f'{key} {case_id}: {problem}')
+            if problems:
+                raise CommandError(f'Priority index has {len(problems)} inconsistent entries')
+            self.stdout.write(self.style.SUCCESS('Priority index is consistent'))
+            return
+        
+        indexed = index.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} cases'))
@@ -0,0 +1,48 @@
+# middleware.py - ASGI middleware for the WebSocket routes
+
+from urllib.parse import parse_qs
+from django.contrib.auth.models import AnonymousUser
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from rest_framework.exceptions import AuthenticationFailed
+from .authentication import TOKEN_KEYWORDS, CachedTokenAuthentication
+
+
+def token_from_scope(scope):
+    """
+    The DRF token key of a WebSocket handshake: ?token=<key> (browsers can't
+    set headers on a WebSocket) or an 'Authorization: Token <key>' header
+    """
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    if query.get('token'):
+        return query['token'][0]
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            parts = value.split()
+            if len(parts) == 2 and parts[0].lower() in [keyword.lower().encode() for keyword in TOKEN_KEYWORDS]:
+                return parts[1].decode('latin1')
+    return None
+
+
+@database_sync_to_async
+def get_token_user(key):
+    """The active user owning this token, or AnonymousUser"""
+    if not key:
+        return AnonymousUser()
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return AnonymousUser()
+    return user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """Sets scope['user'] from the connection's DRF token (AnonymousUser without a valid one)"""
+    
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope, user=await get_token_user(token_from_scope(scope)))
+        return await super().__call__(scope, receive, send)
+
+
+def TokenAuthMiddlewareStack(inner):
+    return TokenAuthMiddleware(inner)
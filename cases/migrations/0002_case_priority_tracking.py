@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='case',
+            name='priority_dirty',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.AddField(
+            model_name='case',
+            name='priority_recheck_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0002_case_priority_tracking'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['assigned_lawyer', 'priority_level', '-urgency_score', 'deadline'], name='case_lawyer_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['client', 'priority_level', '-urgency_score', 'deadline'], name='case_client_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['priority_level', '-urgency_score', 'deadline'], name='case_priority_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(condition=models.Q(('status', 'closed'), _negated=True), fields=['-urgency_score'], name='case_active_urgency_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(condition=models.Q(('status', 'closed'), _negated=True), fields=['deadline'], name='case_active_deadline_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0003_case_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='case',
+            name='case_lawyer_priority_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='case',
+            name='case_client_priority_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='case',
+            name='case_priority_order_idx',
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['assigned_lawyer', 'priority_level', '-urgency_score', 'deadline', 'id'], name='case_lawyer_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['client', 'priority_level', '-urgency_score', 'deadline', 'id'], name='case_client_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['priority_level', '-urgency_score', 'deadline', 'id'], name='case_priority_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caseactivity',
+            index=models.Index(fields=['case', '-timestamp', '-id'], name='activity_case_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created_at', '-id'], name='notification_inbox_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0004_keyset_pagination_indexes'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='LawyerCaseSummary',
+            fields=[
+                ('lawyer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='case_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_cases', models.IntegerField(default=0)),
+                ('closed_cases', models.IntegerField(default=0)),
+                ('avg_closed_case_age', models.DurationField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
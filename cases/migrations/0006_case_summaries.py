@@ -0,0 +1,153 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def clear_lawyer_summaries(apps, schema_editor):
+    # The old rows lack the new counters; summaries are rebuilt when next read
+    apps.get_model('cases', 'LawyerCaseSummary').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0005_lawyer_case_summary'),
+    ]
+    
+    operations = [
+        migrations.RunPython(clear_lawyer_summaries, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ClientCaseSummary',
+            fields=[
+                ('total_cases', models.IntegerField(default=0)),
+                ('status_filed', models.IntegerField(default=0)),
+                ('status_investigation', models.IntegerField(default=0)),
+                ('status_hearing', models.IntegerField(default=0)),
+                ('status_trial', models.IntegerField(default=0)),
+                ('status_closed', models.IntegerField(default=0)),
+                ('status_on_hold', models.IntegerField(default=0)),
+                ('priority_1', models.IntegerField(default=0)),
+                ('priority_2', models.IntegerField(default=0)),
+                ('priority_3', models.IntegerField(default=0)),
+                ('priority_4', models.IntegerField(default=0)),
+                ('priority_5', models.IntegerField(default=0)),
+                ('urgency_total', models.FloatField(default=0.0)),
+                ('urgent_cases', models.IntegerField(default=0)),
+                ('closed_created_total', models.FloatField(default=0.0)),
+                ('overdue_cases', models.IntegerField(default=0)),
+                ('due_this_week', models.IntegerField(default=0)),
+                ('recent_activity', models.IntegerField(default=0)),
+                ('counts_valid_until', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField()),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='client_case_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RemoveField(
+            model_name='lawyercasesummary',
+            name='avg_closed_case_age',
+        ),
+        migrations.RemoveField(
+            model_name='lawyercasesummary',
+            name='closed_cases',
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='closed_created_total',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='counts_valid_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='due_this_week',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='overdue_cases',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='priority_1',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='priority_2',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='priority_3',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='priority_4',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='priority_5',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='recent_activity',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='status_closed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='status_filed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='status_hearing',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='status_investigation',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='status_on_hold',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='status_trial',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='urgency_total',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='lawyercasesummary',
+            name='urgent_cases',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='lawyercasesummary',
+            name='lawyer',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='lawyer_case_summary', serialize=False, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
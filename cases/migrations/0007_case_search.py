@@ -0,0 +1,89 @@
+from django.db import migrations
+
+# Words are indexed unstemmed: searches match them by prefix, and a stemmed
+# prefix ("bereler" -> "berel*") would match far more than was typed
+
+# SQLite: an FTS5 table the case signals keep in step, with each case's
+# parties as tokens for scoped searches, and each case's integer key for
+# the FTS rowid (see utils/search.py). Existing cases are indexed here.
+SQLITE_INSTALL = [
+    """
+    CREATE TABLE cases_case_search_key (
+        id integer NOT NULL PRIMARY KEY, case_id char(32) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE cases_case_search USING fts5(
+        case_id UNINDEXED, title, description, case_number, parties, tokenize = 'unicode61'
+    )
+    """,
+    'INSERT INTO cases_case_search_key (case_id) SELECT id FROM cases_case',
+    """
+    INSERT INTO cases_case_search (rowid, case_id, title, description, case_number, parties)
+    SELECT search_key.id, cases_case.id,
+        coalesce(title, ''), coalesce(description, ''), coalesce(case_number, ''),
+        trim(coalesce('lawyer' || assigned_lawyer_id, '') || ' ' || coalesce('client' || client_id, ''))
+    FROM cases_case JOIN cases_case_search_key search_key ON search_key.case_id = cases_case.id
+    """,
+]
+SQLITE_UNINSTALL = [
+    'DROP TABLE IF EXISTS cases_case_search',
+    'DROP TABLE IF EXISTS cases_case_search_key',
+]
+
+# PostgreSQL: a weighted tsvector column set by a trigger, behind a GIN index.
+# Existing cases are indexed before the index is built, so it's built once.
+POSTGRES_INSTALL = [
+    'ALTER TABLE cases_case ADD COLUMN search_vector tsvector',
+    """
+    CREATE FUNCTION cases_case_search_vector(title text, description text, case_number text)
+    RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+        SELECT setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(case_number, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    $$
+    """,
+    """
+    CREATE FUNCTION cases_case_search_update() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector := cases_case_search_vector(NEW.title, NEW.description, NEW.case_number);
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER cases_case_search_update
+    BEFORE INSERT OR UPDATE OF title, description, case_number ON cases_case
+    FOR EACH ROW EXECUTE FUNCTION cases_case_search_update()
+    """,
+    'UPDATE cases_case SET search_vector = cases_case_search_vector(title, description, case_number)',
+    'CREATE INDEX case_search_idx ON cases_case USING gin (search_vector)',
+]
+POSTGRES_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS cases_case_search_update ON cases_case',
+    'DROP FUNCTION IF EXISTS cases_case_search_update()',
+    'DROP INDEX IF EXISTS case_search_idx',
+    'ALTER TABLE cases_case DROP COLUMN IF EXISTS search_vector',
+    'DROP FUNCTION IF EXISTS cases_case_search_vector(text, text, text)',
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0006_case_summaries'),
+    ]
+    
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}),
+            run_for_vendor({'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}),
+        ),
+    ]
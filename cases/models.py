@@ -5,6 +5,9 @@ from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
 
+from .utils.scoring import DEFAULT_SCORER, SCORING_OUTPUT_FIELDS
+from .utils.summaries import snapshot_case
+
 class User(AbstractUser):
     """Extended User model for both clients and lawyers"""
     USER_TYPES = [
@@ -111,6 +114,10 @@ class Case(models.Model):
     urgency_score = models.FloatField(default=0.0)  # Calculated field
     client_importance = models.IntegerField(default=3, validators=[MinValueValidator(1), MaxValueValidator(5)])
     
+    # Incremental rescoring (see utils/prioritization.py schedule_priority_updates)
+    priority_dirty = models.BooleanField(default=True, db_index=True)  # Edited since last scored
+    priority_recheck_at = models.DateTimeField(null=True, blank=True, db_index=True)  # Next band crossing
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -118,49 +125,111 @@ class Case(models.Model):
     
     class Meta:
         ordering = ['priority_level', '-urgency_score', 'deadline']
+        indexes = [
+            # Per-user prioritized lists (get_prioritized_cases) in Meta.ordering order
+            # (ending in id, the keyset pagination tiebreaker)
+            models.Index(fields=['assigned_lawyer', 'priority_level', '-urgency_score', 'deadline', 'id'],
+                         name='case_lawyer_priority_idx'),
+            models.Index(fields=['client', 'priority_level', '-urgency_score', 'deadline', 'id'],
+                         name='case_client_priority_idx'),
+            models.Index(fields=['priority_level', '-urgency_score', 'deadline', 'id'], name='case_priority_order_idx'),
+            # get_urgent_cases: active cases by score
+            models.Index(fields=['-urgency_score'], condition=~models.Q(status='closed'),
+                         name='case_active_urgency_idx'),
+            # get_overdue_cases / deadline reminders: active cases by deadline
+            models.Index(fields=['deadline'], condition=~models.Q(status='closed'),
+                         name='case_active_deadline_idx'),
+        ]
     
     def __str__(self):
         return f"Case #{self.case_number}: {self.title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Who the case belonged to when loaded, so signals can tell who lost it
+        instance._loaded_parties = (instance.__dict__.get('client_id'), instance.__dict__.get('assigned_lawyer_id'))
+        # and what the case summaries currently count it as (see utils/summaries.py)
+        instance._summary_snapshot = snapshot_case(instance)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """Mark the case for rescoring unless only scoring output is being saved"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.priority_dirty = True
+        elif not set(update_fields) <= set(SCORING_OUTPUT_FIELDS):
+            self.priority_dirty = True
+            kwargs['update_fields'] = {*update_fields, 'priority_dirty'}
+        super().save(*args, **kwargs)
+    
     def calculate_priority_score(self):
-        """Calculate dynamic priority score based on multiple factors"""
-        score = 0
-        
-        # Base priority weight
-        priority_weights = {1: 100, 2: 80, 3: 60, 4: 40, 5: 20}
-        score += priority_weights.get(self.priority_level, 60)
-        
-        # Deadline urgency
-        if self.deadline:
-            days_until_deadline = (self.deadline - timezone.now()).days
-            if days_until_deadline <= 0:
-                score += 50  # Overdue
-            elif days_until_deadline <= 1:
-                score += 40  # Due today/tomorrow
-            elif days_until_deadline <= 7:
-                score += 30  # Due this week
-            elif days_until_deadline <= 30:
-                score += 20  # Due this month
-        
-        # Client importance factor
-        score += self.client_importance * 5
-        
-        # Case type urgency
-        urgent_case_types = ['criminal', 'personal_injury']
-        if self.case_type in urgent_case_types:
-            score += 15
-        
-        # Last activity (cases not updated recently get lower priority)
-        days_since_activity = (timezone.now() - self.last_activity).days
-        if days_since_activity > 30:
-            score -= 10
-        elif days_since_activity > 7:
-            score -= 5
+        """
+        Calculate dynamic priority score (0-100) based on multiple factors
+        Uses the shared compiled scoring model, so the result matches
+        CasePriorityCalculator and the scheduled rescoring
+        """
+        now = timezone.now()
+        score, _ = DEFAULT_SCORER.score_case(self, now)
         
         self.urgency_score = score
-        self.save(update_fields=['urgency_score'])
+        self.priority_dirty = False
+        self.priority_recheck_at = DEFAULT_SCORER.next_recheck(self.deadline, self.last_activity, now)
+        self.save(update_fields=SCORING_OUTPUT_FIELDS)
         return score
 
+class CaseSummary(models.Model):
+    """
+    Denormalized counts over one user's cases, so dashboards and statistics
+    are a primary-key lookup. Kept current from Case signals and the
+    rescoring paths (see utils/summaries.py); rebuild_case_summaries
+    recomputes them from scratch.
+    """
+    total_cases = models.IntegerField(default=0)
+    
+    status_filed = models.IntegerField(default=0)
+    status_investigation = models.IntegerField(default=0)
+    status_hearing = models.IntegerField(default=0)
+    status_trial = models.IntegerField(default=0)
+    status_closed = models.IntegerField(default=0)
+    status_on_hold = models.IntegerField(default=0)
+    
+    priority_1 = models.IntegerField(default=0)
+    priority_2 = models.IntegerField(default=0)
+    priority_3 = models.IntegerField(default=0)
+    priority_4 = models.IntegerField(default=0)
+    priority_5 = models.IntegerField(default=0)
+    
+    urgency_total = models.FloatField(default=0.0)  # Sum of urgency_score
+    urgent_cases = models.IntegerField(default=0)
+    closed_created_total = models.FloatField(default=0.0)  # Sum of closed cases' created_at epoch seconds
+    
+    # Counts that change with the clock, exact until counts_valid_until (the
+    # next time a deadline or activity window boundary is crossed)
+    overdue_cases = models.IntegerField(default=0)
+    due_this_week = models.IntegerField(default=0)
+    recent_activity = models.IntegerField(default=0)
+    counts_valid_until = models.DateTimeField(null=True, blank=True)
+    
+    refreshed_at = models.DateTimeField()  # Last full recompute
+    
+    class Meta:
+        abstract = True
+
+class LawyerCaseSummary(CaseSummary):
+    """Summary of the cases assigned to a lawyer"""
+    lawyer = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='lawyer_case_summary')
+    
+    def __str__(self):
+        return f"Case summary for lawyer {self.lawyer.username}"
+
+class ClientCaseSummary(CaseSummary):
+    """Summary of a client's cases"""
+    client = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='client_case_summary')
+    
+    def __str__(self):
+        return f"Case summary for client {self.client.username}"
+
 class CaseDocument(models.Model):
     """Documents related to cases"""
     DOCUMENT_TYPES = [
@@ -207,6 +276,10 @@ class CaseActivity(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Newest-first keyset pages per case (ActivityKeysetPagination)
+            models.Index(fields=['case', '-timestamp', '-id'], name='activity_case_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.activity_type} - Case #{self.case.case_number}"
@@ -266,6 +339,10 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Newest-first keyset pages per recipient (NotificationKeysetPagination)
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notification_inbox_idx'),
+        ]
     
     def __str__(self):
         return f"Notification for {self.recipient.username}: {self.title}"
\ No newline at end of file
@@ -0,0 +1,237 @@
+# pagination.py - Pagination classes for Legal Nexus API
+
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from functools import partial
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+import json
+
+from .utils.search import SEARCH_RANK
+
+
+class CountedPaginator(DjangoPaginator):
+    """A Django Paginator that takes a row count the caller already has instead of running COUNT(*)"""
+    
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.__dict__['count'] = count
+
+
+class PrioritizedCasePagination(PageNumberPagination):
+    """Page-numbered results for the prioritized case list"""
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    
+    def paginate_queryset(self, queryset, request, view=None, count=None):
+        """Pass count when the view already aggregated it, saving the paginator's query"""
+        self.django_paginator_class = partial(CountedPaginator, count=count)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the full sort key instead of an OFFSET.
+    The cursor holds the sort key values of the row a page ended at, and the
+    next page is the rows strictly after it in (key1, key2, ..., id) order,
+    so page N costs the same as page 1. Rows inserted or rescored elsewhere
+    don't shift page boundaries the way they do with OFFSET.
+    
+    Nullable keys sort NULLS LAST (ascending) on every database. A view's
+    OrderingFilter (?ordering=) is honoured; otherwise full-text searches
+    list by search_rank first. The pk is always the final tiebreaker.
+    """
+    ordering = ('-pk',)
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.annotations = queryset.query.annotations
+        self.keys = self.get_keys(queryset, request, view)
+        
+        values, reverse = self.decode_cursor(request)
+        keys = [self.reverse_key(key) for key in self.keys] if reverse else self.keys
+        
+        queryset = self.load_keys(queryset).order_by(*[self.order_expression(key) for key in keys])
+        if values is not None:
+            queryset = queryset.filter(self.after(keys, values))
+        
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        
+        # Going forward there is a previous page whenever we started from a
+        # cursor; going back there is always a next page (the one we left)
+        self.has_next = has_more if not reverse else True
+        self.has_previous = (values is not None) if not reverse else has_more
+        self.page = rows
+        return rows
+    
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+    
+    def get_keys(self, queryset, request, view):
+        """(field, descending, nullable) for each sort key, ending with the pk"""
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter) and request.query_params.get(backend.ordering_param):
+                ordering = backend().get_ordering(request, queryset, view)
+        if ordering is None and SEARCH_RANK in queryset.query.annotations:
+            ordering = [f'-{SEARCH_RANK}', *self.ordering]
+        ordering = list(ordering or self.ordering)
+        
+        model = queryset.model
+        pk_name = model._meta.pk.name
+        keys = []
+        for name in ordering:
+            field_name = name.lstrip('-')
+            if field_name in queryset.query.annotations:
+                keys.append((field_name, name.startswith('-'), False))
+                continue
+            field_name = pk_name if field_name == 'pk' else field_name
+            field = model._meta.get_field(field_name)
+            keys.append((field.attname, name.startswith('-'), field.null))
+        if pk_name not in [key[0] for key in keys]:
+            keys.append((pk_name, keys[-1][1] if keys else False, False))
+        return keys
+    
+    def reverse_key(self, key):
+        field, descending, nullable = key
+        # Flipping the direction also flips where NULLs land (see order_expression)
+        return field, not descending, nullable
+    
+    def order_expression(self, key):
+        field, descending, nullable = key
+        if descending:
+            return F(field).desc(nulls_first=True) if nullable else F(field).desc()
+        return F(field).asc(nulls_last=True) if nullable else F(field).asc()
+    
+    def after(self, keys, values):
+        """Rows that sort strictly after `values`: (k1 > v1) OR (k1 = v1 AND k2 > v2) ..."""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (field, descending, nullable), value in zip(keys, values):
+            if value is None:
+                # NULLs sort last ascending / first descending
+                later = Q(**{f'{field}__isnull': False}) if descending else Q(pk__in=[])
+                same = Q(**{f'{field}__isnull': True})
+            else:
+                later = Q(**{f'{field}__lt' if descending else f'{field}__gt': value})
+                if nullable and not descending:
+                    later |= Q(**{f'{field}__isnull': True})
+                same = Q(**{field: value})
+            condition |= equal & later
+            equal &= same
+        
+        # A plain range on the leading key lets the index seek to the cursor
+        field, descending, nullable = keys[0]
+        if values[0] is not None and not nullable:
+            return Q(**{f'{field}__lte' if descending else f'{field}__gte': values[0]}) & condition
+        return condition
+    
+    def load_keys(self, queryset):
+        """Make sure an only() projection still loads the sort key columns"""
+        names, deferred = queryset.query.deferred_loading
+        if names and not deferred:
+            queryset = queryset.only(*names, *[field for field, _, _ in self.keys if field not in self.annotations])
+        return queryset
+    
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii'), altchars=b'-_', validate=True))
+            raw_values, reverse = cursor['v'], bool(cursor.get('r'))
+            if len(raw_values) != len(self.keys):
+                raise ValueError
+            values = [
+                None if value is None else self.model_field(field).to_python(value)
+                for (field, _, _), value in zip(self.keys, raw_values)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+    
+    def model_field(self, attname):
+        if attname in self.annotations:
+            return self.annotations[attname].output_field
+        return next(field for field in self.model._meta.concrete_fields if field.attname == attname)
+    
+    def encode_cursor(self, row, reverse):
+        values = []
+        for field, _, _ in self.keys:
+            value = getattr(row, field)
+            if value is None or field in self.annotations:
+                values.append(value)
+            else:
+                values.append(self.model_field(field).value_to_string(row))
+        cursor = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = b64encode(cursor.encode(), altchars=b'-_').decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+    
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+    
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+    
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+    
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class CaseKeysetPagination(KeysetPagination):
+    """Case lists in Meta.ordering (priority) order"""
+    ordering = ('priority_level', '-urgency_score', 'deadline', 'id')
+
+
+class NotificationKeysetPagination(KeysetPagination):
+    """Newest notifications first"""
+    ordering = ('-created_at', '-id')
+
+
+class ActivityKeysetPagination(KeysetPagination):
+    """Newest activities first"""
+    ordering = ('-timestamp', '-id')
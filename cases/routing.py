@@ -0,0 +1,10 @@
+# routing.py - WebSocket routes for Legal Nexus
+
+from django.urls import path
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/updates/', consumers.UserUpdatesConsumer.as_asgi()),
+    path('ws/cases/<uuid:case_id>/', consumers.CaseConsumer.as_asgi()),
+    path('ws/priorities/', consumers.PriorityFeedConsumer.as_asgi()),
+]
@@ -3,6 +3,8 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from .models import (
     User, LawyerProfile, Case, CaseDocument, 
@@ -34,8 +36,13 @@ class UserSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('confirm_password', None)
         password = validated_data.pop('password')
+        # Async registration hashes off the event loop and passes the result in
+        password_hash = validated_data.pop('password_hash', None)
         user = User.objects.create_user(**validated_data)
-        user.set_password(password)
+        if password_hash:
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save()
         
         # Create lawyer profile if user is a lawyer
@@ -92,6 +99,20 @@ class CaseDocumentSerializer(serializers.ModelSerializer):
         except:
             return None
 
+def time_since(timestamp):
+    diff = timezone.now() - timestamp
+    
+    if diff.days > 0:
+        return f"{diff.days} day{'s' if diff.days != 1 else ''} ago"
+    elif diff.seconds > 3600:
+        hours = diff.seconds // 3600
+        return f"{hours} hour{'s' if hours != 1 else ''} ago"
+    elif diff.seconds > 60:
+        minutes = diff.seconds // 60
+        return f"{minutes} minute{'s' if minutes != 1 else ''} ago"
+    else:
+        return "Just now"
+
 class CaseActivitySerializer(serializers.ModelSerializer):
     performed_by_name = serializers.CharField(source='performed_by.get_full_name', read_only=True)
     time_since = serializers.SerializerMethodField()
@@ -105,19 +126,7 @@ class CaseActivitySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'performed_by', 'timestamp']
     
     def get_time_since(self, obj):
-        now = timezone.now()
-        diff = now - obj.timestamp
-        
-        if diff.days > 0:
-            return f"{diff.days} day{'s' if diff.days != 1 else ''} ago"
-        elif diff.seconds > 3600:
-            hours = diff.seconds // 3600
-            return f"{hours} hour{'s' if hours != 1 else ''} ago"
-        elif diff.seconds > 60:
-            minutes = diff.seconds // 60
-            return f"{minutes} minute{'s' if minutes != 1 else ''} ago"
-        else:
-            return "Just now"
+        return time_since(obj.timestamp)
 
 class CaseNoteSerializer(serializers.ModelSerializer):
     author_name = serializers.CharField(source='author.get_full_name', read_only=True)
@@ -130,7 +139,43 @@ class CaseNoteSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'author', 'created_at', 'updated_at']
 
-class CaseSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Serialize only the fields named in ?fields=a,b,c (or a `fields` kwarg),
+    falling back to `default_fields` (None means all). Unrequested fields
+    are removed before serialization, so their SerializerMethodFields never
+    run. 'id' is always included; unknown names are ignored.
+    """
+    default_fields = None
+    
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        
+        if fields is None:
+            fields = self.get_requested_fields(self.context.get('request'))
+        if fields is not None:
+            for name in set(self.fields) - {'id', *fields}:
+                self.fields.pop(name)
+    
+    @classmethod
+    def get_requested_fields(cls, request):
+        # Only reads are projected; writes validate against the full field set
+        requested = None
+        if request is not None and request.method in ('GET', 'HEAD'):
+            requested = request.query_params.get('fields')
+        if requested:
+            return [name.strip() for name in requested.split(',') if name.strip()]
+        return cls.default_fields
+
+def related_count(model, case_field='case'):
+    """Correlated COUNT(*) of a model's rows per case, for annotate()"""
+    counts = model.objects.filter(**{case_field: OuterRef('pk')}).order_by().values(case_field).annotate(
+        total=Count('*')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+class CaseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     client_name = serializers.CharField(source='client.get_full_name', read_only=True)
     assigned_lawyer_name = serializers.CharField(source='assigned_lawyer.get_full_name', read_only=True)
     priority_display = serializers.CharField(source='get_priority_level_display', read_only=True)
@@ -148,7 +193,26 @@ class CaseSerializer(serializers.ModelSerializer):
     is_overdue = serializers.SerializerMethodField()
     
     # Recent activity
-    recent_activities = CaseActivitySerializer(source='activities', many=True, read_only=True)
+    recent_activities = serializers.SerializerMethodField()
+    
+    RECENT_ACTIVITY_LIMIT = 5
+    
+    # Columns each derived field reads, so setup_eager_loading can defer the rest
+    FIELD_COLUMNS = {
+        'client_name': ['client__first_name', 'client__last_name'],
+        'assigned_lawyer_name': ['assigned_lawyer', 'assigned_lawyer__first_name', 'assigned_lawyer__last_name'],
+        'priority_display': ['priority_level'],
+        'status_display': ['status'],
+        'case_type_display': ['case_type'],
+        'days_since_filing': ['filing_date'],
+        'days_until_deadline': ['deadline'],
+        'is_overdue': ['deadline'],
+    }
+    COUNTED_RELATIONS = {
+        'document_count': CaseDocument,
+        'activity_count': CaseActivity,
+        'note_count': CaseNote,
+    }
     
     class Meta:
         model = Case
@@ -166,15 +230,59 @@ class CaseSerializer(serializers.ModelSerializer):
             'updated_at', 'last_activity'
         ]
     
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        """
+        Load what serializing `fields` (default: all) reads and nothing else:
+        only() the needed columns, select_related() users whose names are
+        shown, annotate the related counts as subqueries and prefetch the
+        latest activities (a sliced Prefetch, windowed per case), so a page of
+        cases costs a fixed number of queries
+        """
+        fields = set(cls.Meta.fields if fields is None else fields) & set(cls.Meta.fields)
+        model_fields = {field.name for field in Case._meta.concrete_fields}
+        
+        columns = {'id', 'client'}
+        for name in fields:
+            if name in cls.FIELD_COLUMNS:
+                columns.update(cls.FIELD_COLUMNS[name])
+            elif name in model_fields:
+                columns.add(name)
+        related = [name for name in ('client', 'assigned_lawyer') if any(c.startswith(f'{name}__') for c in columns)]
+        queryset = queryset.select_related(*related).only(*columns)
+        
+        counts = {name: related_count(model) for name, model in cls.COUNTED_RELATIONS.items() if name in fields}
+        if counts:
+            queryset = queryset.annotate(**counts)
+        
+        if 'recent_activities' in fields:
+            recent = CaseActivity.objects.select_related('performed_by').order_by('-timestamp')
+            queryset = queryset.prefetch_related(
+                Prefetch('activities', queryset=recent[:cls.RECENT_ACTIVITY_LIMIT], to_attr='recent_activity_list')
+            )
+        return queryset
+    
     def get_document_count(self, obj):
+        if hasattr(obj, 'document_count'):
+            return obj.document_count
         return obj.documents.count()
     
     def get_activity_count(self, obj):
+        if hasattr(obj, 'activity_count'):
+            return obj.activity_count
         return obj.activities.count()
     
     def get_note_count(self, obj):
+        if hasattr(obj, 'note_count'):
+            return obj.note_count
         return obj.notes.count()
     
+    def get_recent_activities(self, obj):
+        activities = getattr(obj, 'recent_activity_list', None)
+        if activities is None:
+            activities = obj.activities.select_related('performed_by')[:self.RECENT_ACTIVITY_LIMIT]
+        return CaseActivitySerializer(activities, many=True, context=self.context).data
+    
     def get_days_since_filing(self, obj):
         return (timezone.now() - obj.filing_date).days
     
@@ -196,12 +304,8 @@ class CaseSerializer(serializers.ModelSerializer):
         if request and hasattr(request, 'user'):
             user = request.user
             
-            # Limit recent activities to last 5
-            if 'recent_activities' in data:
-                data['recent_activities'] = data['recent_activities'][:5]
-            
             # Hide confidential information from clients
-            if user.user_type == 'client' and user != instance.client:
+            if user.user_type == 'client' and user.pk != instance.client_id:
                 # Clients can only see their own cases
                 sensitive_fields = ['estimated_cost', 'amount_paid', 'urgency_score']
                 for field in sensitive_fields:
@@ -209,6 +313,18 @@ class CaseSerializer(serializers.ModelSerializer):
         
         return data
 
+class CaseListSerializer(CaseSerializer):
+    """
+    CaseSerializer for list pages: a compact default field set, with any
+    other CaseSerializer field available through ?fields=
+    """
+    default_fields = [
+        'id', 'case_number', 'title', 'case_type', 'case_type_display',
+        'client_name', 'assigned_lawyer_name', 'priority_level', 'priority_display',
+        'status', 'status_display', 'deadline', 'urgency_score', 'last_activity',
+        'days_until_deadline', 'is_overdue'
+    ]
+
 class CasePrioritySerializer(serializers.ModelSerializer):
     """Specialized serializer for priority-focused case display"""
     client_name = serializers.CharField(source='client.get_full_name', read_only=True)
@@ -298,4 +414,7 @@ class NotificationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
     
+    def get_time_since(self, obj):
+        return time_since(obj.created_at)
+    
     
\ No newline at end of file
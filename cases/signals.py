@@ -0,0 +1,156 @@
+# signals.py - Keep the priority index, priority feeds, search index, case summaries, cached stats, case scopes and cached tokens in step with writes
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import invalidate_token, invalidate_user_tokens
+from .models import Case, User
+from .utils.priority_feed import publish_priority_changes
+from .utils.ranking import get_priority_index
+from .utils.scoring import SCORING_OUTPUT_FIELDS
+from .utils.scoping import invalidate_case_scopes
+from .utils.search import INDEXED_FIELDS, index_cases, remove_cases
+from .utils.stats import invalidate_dashboard_stats
+from .utils.summaries import apply_case_change, recount_summaries, snapshot_case
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _update_index(case):
+    try:
+        get_priority_index().update_case(case)
+    except Exception as e:
+        logger.error(f"Error indexing case {case.id}: {str(e)}")
+
+
+def _remove_from_index(case_id):
+    try:
+        get_priority_index().remove_case(case_id)
+    except Exception as e:
+        logger.error(f"Error removing case {case_id} from index: {str(e)}")
+
+
+def case_parties(case):
+    """IDs of the users a case belongs to now and belonged to when loaded"""
+    return {case.client_id, case.assigned_lawyer_id, *getattr(case, '_loaded_parties', ())} - {None}
+
+
+@receiver(post_save, sender=Case)
+def index_case(sender, instance, raw=False, **kwargs):
+    """Refresh the case's index entries and tell its priority feeds once the save commits"""
+    if raw:
+        return
+    parties = case_parties(instance)
+    transaction.on_commit(lambda: (
+        _update_index(instance),
+        publish_priority_changes([(instance.id, instance.priority_level, instance.urgency_score, parties)]),
+    ))
+
+
+@receiver(post_delete, sender=Case)
+def unindex_case(sender, instance, **kwargs):
+    case_id = instance.id
+    change = (case_id, None, None, case_parties(instance))
+    transaction.on_commit(lambda: (_remove_from_index(case_id), publish_priority_changes([change])))
+
+
+@receiver(post_save, sender=Case)
+def index_case_text(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Replace the case's full-text entry in the transaction that saved it"""
+    # Fixtures are indexed by rebuild_case_search
+    if raw:
+        return
+    if update_fields and not {field.removesuffix('_id') for field in update_fields} & set(INDEXED_FIELDS):
+        return
+    index_cases([instance])
+
+
+@receiver(post_delete, sender=Case)
+def unindex_case_text(sender, instance, **kwargs):
+    remove_cases([instance.pk])
+
+
+@receiver(post_save, sender=Case)
+@receiver(post_delete, sender=Case)
+def invalidate_case_stats(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Drop the dashboard stats of the case's client and lawyers once the write commits"""
+    if raw:
+        return
+    # Rescoring alone doesn't change any dashboard count
+    if update_fields and set(update_fields) <= set(SCORING_OUTPUT_FIELDS):
+        return
+    user_ids = case_parties(instance)
+    transaction.on_commit(lambda: invalidate_dashboard_stats(*user_ids))
+
+
+@receiver(post_save, sender=Case)
+@receiver(post_delete, sender=Case)
+def invalidate_case_scope(sender, instance, raw=False, **kwargs):
+    """Reload the case IDs of the users who gained or lost the case once the write commits"""
+    if raw:
+        return
+    # Saving a loaded case without reassigning it leaves every scope as is
+    loaded = getattr(instance, '_loaded_parties', None)
+    if kwargs.get('created') is False and loaded == (instance.client_id, instance.assigned_lawyer_id):
+        return
+    user_ids = case_parties(instance)
+    transaction.on_commit(lambda: invalidate_case_scopes(*user_ids))
+
+
+def saved_summary_values(case, update_fields):
+    """The case's SUMMARY_FIELDS as just written, or None if the instance can't tell"""
+    loaded = getattr(case, '_summary_snapshot', None)
+    if update_fields is None or loaded is None:
+        return snapshot_case(case)
+    # Only the listed fields were written; the rest are still as loaded
+    return {
+        field: case.__dict__.get(field) if field in update_fields or field.removesuffix('_id') in update_fields
+        else value
+        for field, value in loaded.items()
+    }
+
+
+@receiver(post_save, sender=Case)
+def update_case_summaries(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Move the case's counts between summaries in the transaction that saved it"""
+    if raw:
+        return
+    old = None if created else getattr(instance, '_summary_snapshot', None)
+    new = saved_summary_values(instance, update_fields)
+    if new is None or (old is None and not created):
+        # Before or after state unknown (deferred fields, unsaved instance)
+        recount_summaries(case_parties(instance))
+    else:
+        apply_case_change(old, new)
+    instance._summary_snapshot = new
+
+
+@receiver(post_delete, sender=Case)
+def remove_from_case_summaries(sender, instance, **kwargs):
+    old = getattr(instance, '_summary_snapshot', None) or snapshot_case(instance)
+    if old is None:
+        recount_summaries(case_parties(instance))
+    else:
+        apply_case_change(old, None)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def uncache_token(sender, instance, **kwargs):
+    """Logout (token deleted) or a rotated token takes effect once committed"""
+    key = instance.key
+    transaction.on_commit(lambda: invalidate_token(key))
+
+
+@receiver(post_save, sender=User)
+def uncache_user_tokens(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Re-read the user (is_active, user_type, ...) on their next request"""
+    if raw or created:
+        return
+    # Logging in only stamps last_login, which nothing reads off request.user
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_user_tokens(user_id))
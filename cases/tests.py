@@ -1,3 +1,1660 @@
-from django.test import TestCase
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+import asyncio
+import json
+import random
+import threading
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models.signals import post_save
+from django.core.management.base import CommandError
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from rest_framework.authtoken.models import Token
+
+from .models import (
+    User, LawyerProfile, Case, CaseActivity, CaseDocument, CaseNote, ClientCaseSummary, LawyerCaseSummary, Notification
+)
+from .consumers import UserUpdatesConsumer
+from .serializers import CaseListSerializer
+from .authentication import CachedTokenAuthentication, local_tokens
+from .views import AuthViewSet, CaseActivityViewSet, CaseViewSet, NotificationViewSet, async_login, async_register
+from .utils.prioritization import (
+    CasePriorityCalculator, CasePriorityManager, identify_urgent_actions, parallel_update_priorities,
+    schedule_priority_updates, shard_bounds
+)
+from .utils.ranking import UNASSIGNED_SCOPE, client_scope, get_priority_index
+from .utils.scoring import DEFAULT_SCORING_MODEL, ScoringModel, from_epoch_microsecond
+from .utils.activity import ActivityLog
+from .utils.broadcast import CaseBroadcaster, get_case_broadcaster
+from .utils.hashing import HashingPoolBusy, PasswordHashingPool
+from .utils.notifications import NotificationDispatcher
+from .utils.priority_feed import PRIORITY_ORDERING, PriorityFeed, user_feed_group
+from .utils.scoping import CaseScope, can_see_case, get_case_scope, invalidate_case_scopes
+from .utils.search import get_case_search
+from .utils.stats import case_statistics
+from .utils.summaries import get_case_summary, rebuild_case_summaries, summary_lawyer_metrics, summary_statistics
+
+
+def create_case(client, number, **fields):
+    """Create a saved case with sensible defaults for tests"""
+    fields.setdefault('title', f'Case {number}')
+    fields.setdefault('description', 'Test case')
+    fields.setdefault('case_type', 'civil')
+    return Case.objects.create(client=client, case_number=f'T{number:06d}', **fields)
+
+
+class BatchPriorityCalculationTests(SimpleTestCase):
+    """calculate_batch_priorities must agree with calculate_case_priority"""
+    
+    def setUp(self):
+        self.calculator = CasePriorityCalculator()
+        self.calculator.current_time = timezone.now().replace(microsecond=123456)
+    
+    def build_cases(self, count=2000, seed=42):
+        rng = random.Random(seed)
+        now = self.calculator.current_time
+        # Exact band edges plus a spread of offsets on both sides of now
+        edges = [timedelta(0), timedelta(hours=24), timedelta(hours=24, microseconds=1),
+                 timedelta(microseconds=-1), timedelta(days=-5), timedelta(days=31),
+                 timedelta(days=200), timedelta(days=-1, microseconds=-1)]
+        
+        cases = []
+        for _ in range(count):
+            if rng.random() < 0.1:
+                deadline = None
+            elif rng.random() < 0.2:
+                deadline = now + rng.choice(edges)
+            else:
+                deadline = now + timedelta(minutes=rng.randint(-60 * 24 * 10, 60 * 24 * 300))
+            
+            cases.append(Case(
+                case_number=f"T{len(cases)}",
+                deadline=deadline,
+                priority_level=rng.choice([1, 2, 3, 4, 5, 7]),
+                client_importance=rng.choice([None, 0, 1, 2, 3, 4, 5]),
+                case_type=rng.choice([choice[0] for choice in Case.CASE_TYPES] + ['unknown']),
+                last_activity=now - timedelta(minutes=rng.randint(-60 * 24, 60 * 24 * 45)),
+                status=rng.choice([choice[0] for choice in Case.STATUS_CHOICES] + ['archived']),
+            ))
+        cases.append(Case(case_number='T-none', last_activity=None, deadline=None, client_importance=3))
+        return cases
+    
+    def test_batch_scores_match_per_case_scores(self):
+        cases = self.build_cases()
+        columns = [
+            [getattr(case, field) for case in cases]
+            for field in CasePriorityCalculator.BATCH_FIELDS
+        ]
+        
+        scores, factors = self.calculator.calculate_batch_priorities(*columns)
+        
+        for index, case in enumerate(cases):
+            expected_score, expected_factors = self.calculator.calculate_case_priority(case)
+            self.assertEqual(scores[index], expected_score, case)
+            for factor, value in expected_factors.items():
+                self.assertEqual(factors[factor][index], value, (case, factor))
+    
+    def test_batch_rechecks_match_per_case_rechecks(self):
+        cases = self.build_cases()
+        rechecks, has_recheck = self.calculator.calculate_batch_rechecks(
+            [case.deadline for case in cases], [case.last_activity for case in cases]
+        )
+        
+        for index, case in enumerate(cases):
+            expected = self.calculator.calculate_next_recheck(case)
+            if expected is None:
+                self.assertFalse(has_recheck[index], case)
+            else:
+                self.assertTrue(has_recheck[index], case)
+                self.assertEqual(from_epoch_microsecond(rechecks[index]), expected, case)
+    
+    def test_recheck_is_when_the_score_changes(self):
+        now = self.calculator.current_time
+        case = Case(case_number='T', deadline=now + timedelta(days=10, hours=5),
+                    last_activity=now - timedelta(days=20), client_importance=3)
+        recheck = self.calculator.calculate_next_recheck(case)
+        self.assertEqual(recheck, case.deadline - timedelta(days=10))
+        
+        before, _ = self.calculator.calculate_case_priority(case)
+        self.calculator.current_time = recheck
+        at_recheck, _ = self.calculator.calculate_case_priority(case)
+        self.calculator.current_time = recheck + timedelta(microseconds=1)
+        after, _ = self.calculator.calculate_case_priority(case)
+        self.assertEqual(before, at_recheck)
+        self.assertNotEqual(at_recheck, after)
+    
+    def test_empty_batch(self):
+        scores, factors = self.calculator.calculate_batch_priorities([], [], [], [], [], [])
+        self.assertEqual(len(scores), 0)
+        self.assertEqual(set(factors), set(CasePriorityCalculator.PRIORITY_WEIGHTS))
+
+
+class ScoringModelTests(TestCase):
+    """Every scoring path evaluates the same compiled ScoringModel"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.case = create_case(
+            self.client_user, 1, case_type='criminal', priority_level=2, status='hearing',
+            deadline=timezone.now() + timedelta(days=2, hours=3)
+        )
+    
+    def test_model_method_matches_calculator(self):
+        score = self.case.calculate_priority_score()
+        expected, _ = CasePriorityCalculator().calculate_case_priority(self.case)
+        self.assertAlmostEqual(score, expected)
+        self.assertLessEqual(score, 100)
+        
+        self.case.refresh_from_db()
+        self.assertEqual(self.case.urgency_score, score)
+        self.assertFalse(self.case.priority_dirty)
+        self.assertIsNotNone(self.case.priority_recheck_at)
+    
+    def test_custom_model_changes_every_path(self):
+        attributes = vars(DEFAULT_SCORING_MODEL).copy()
+        attributes['weights'] = dict(attributes['weights'], deadline_urgency=0, case_priority_level=70)
+        calculator = CasePriorityCalculator(ScoringModel(**attributes).compile())
+        
+        score, factors = calculator.calculate_case_priority(self.case)
+        self.assertEqual(score, (80 * 0.7 + 50 * 0.15 + 80 * 0.1 + 100 * 0.05) * 1.2)
+        
+        batch_scores, _ = calculator.calculate_batch_priorities(
+            *[[getattr(self.case, field)] for field in calculator.BATCH_FIELDS]
+        )
+        live_score = Case.objects.annotate(
+            live_score=calculator.priority_score_expression()
+        ).get(pk=self.case.pk).live_score
+        self.assertEqual(batch_scores[0], score)
+        self.assertAlmostEqual(live_score, score)
+    
+    def test_weights_must_cover_every_factor(self):
+        attributes = vars(DEFAULT_SCORING_MODEL).copy()
+        attributes['weights'] = {'deadline_urgency': 100}
+        with self.assertRaises(ValueError):
+            ScoringModel(**attributes)
+
+
+class ChunkedPriorityUpdateTests(TestCase):
+    """stream_update_priorities writes only changed rows, one bulk_update per chunk"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        now = timezone.now()
+        for number in range(25):
+            create_case(
+                self.client_user, number,
+                priority_level=number % 5 + 1,
+                status=['filed', 'hearing', 'trial', 'on_hold'][number % 4],
+                deadline=now + timedelta(days=number - 5),
+            )
+        self.manager = CasePriorityManager()
+    
+    def test_reports_scanned_changed_and_written(self):
+        stats = self.manager.stream_update_priorities(Case.objects.all(), chunk_size=10)
+        self.assertEqual(stats, {'scanned': 25, 'changed': 25, 'written': 25})
+        
+        for case in Case.objects.all():
+            expected, _ = self.manager.calculator.calculate_case_priority(case)
+            self.assertEqual(case.urgency_score, expected)
+        
+        # Second pass finds nothing to write
+        stats = self.manager.stream_update_priorities(Case.objects.all(), chunk_size=10)
+        self.assertEqual(stats, {'scanned': 25, 'changed': 0, 'written': 0})
+    
+    def test_only_changed_rows_are_written(self):
+        self.manager.stream_update_priorities(Case.objects.all())
+        Case.objects.filter(case_number__in=['T000001', 'T000002']).update(urgency_score=-1)
+        
+        stats = self.manager.stream_update_priorities(Case.objects.all(), chunk_size=10)
+        self.assertEqual(stats, {'scanned': 25, 'changed': 2, 'written': 2})
+    
+    def test_bulk_update_priorities_chunked_mode_returns_written_count(self):
+        active = Case.objects.exclude(status='on_hold')
+        self.assertEqual(self.manager.bulk_update_priorities(active, chunk_size=4), active.count())
+    
+    def test_bulk_update_priorities_loop_clears_dirty_flags(self):
+        Case.objects.update(priority_dirty=True)
+        self.manager.bulk_update_priorities(Case.objects.all())
+        self.assertFalse(Case.objects.filter(priority_dirty=True).exists())
+        # Nothing is left for the incremental pass to rewrite
+        stats = self.manager.stream_update_priorities(Case.objects.all(), chunk_size=10)
+        self.assertEqual(stats['written'], 0)
+
+
+class DatabasePriorityExpressionTests(TestCase):
+    """priority_score_expression must agree with calculate_case_priority on the configured backend"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.manager = CasePriorityManager()
+        now = self.manager.calculator.current_time
+        rng = random.Random(7)
+        
+        deadline_offsets = [
+            None, timedelta(0), timedelta(microseconds=-1), timedelta(hours=24),
+            timedelta(hours=24, microseconds=1), timedelta(days=-5), timedelta(days=-1, microseconds=-1),
+            timedelta(days=31), timedelta(days=200), timedelta(days=450),
+        ] + [timedelta(minutes=rng.randint(-60 * 24 * 10, 60 * 24 * 300)) for _ in range(60)]
+        activity_offsets = [timedelta(0), timedelta(days=1), timedelta(days=4), timedelta(days=31)] + [
+            timedelta(minutes=rng.randint(-60 * 24, 60 * 24 * 45)) for _ in range(66)
+        ]
+        statuses = [choice[0] for choice in Case.STATUS_CHOICES]
+        case_types = [choice[0] for choice in Case.CASE_TYPES]
+        
+        for number, (deadline_offset, activity_offset) in enumerate(zip(deadline_offsets, activity_offsets)):
+            case = create_case(
+                self.client_user, number,
+                deadline=None if deadline_offset is None else now + deadline_offset,
+                priority_level=number % 5 + 1,
+                client_importance=number % 5 + 1,
+                case_type=case_types[number % len(case_types)],
+                status=statuses[number % len(statuses)],
+            )
+            # last_activity is auto_now, so set it with a queryset update
+            Case.objects.filter(pk=case.pk).update(last_activity=now - activity_offset)
+    
+    def test_annotated_scores_match_per_case_scores(self):
+        calculator = self.manager.calculator
+        cases = Case.objects.annotate(live_score=calculator.priority_score_expression())
+        
+        for case in cases:
+            expected, _ = calculator.calculate_case_priority(case)
+            self.assertAlmostEqual(case.live_score, expected, places=9, msg=case.case_number)
+    
+    def test_update_in_database_matches_per_case_scores(self):
+        updated = self.manager.update_priorities_in_database(Case.objects.exclude(status='closed'))
+        self.assertEqual(updated, Case.objects.exclude(status='closed').count())
+        
+        for case in Case.objects.exclude(status='closed'):
+            expected, _ = self.manager.calculator.calculate_case_priority(case)
+            self.assertAlmostEqual(case.urgency_score, expected, places=9, msg=case.case_number)
+    
+    def test_prioritized_cases_sort_by_live_score(self):
+        admin = User.objects.create_user(username='admin', password='x', user_type='admin')
+        cases = list(self.manager.get_prioritized_cases(admin, live_score=True))
+        keys = [(case.priority_level, -case.live_urgency_score) for case in cases]
+        self.assertEqual(keys, sorted(keys))
+
+
+class IncrementalPriorityUpdateTests(TestCase):
+    """schedule_priority_updates only rescores dirty cases and passed recheck times"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        now = timezone.now()
+        self.cases = [
+            create_case(self.client_user, number, deadline=now + timedelta(days=number * 3))
+            for number in range(6)
+        ]
+    
+    def test_saves_mark_cases_dirty_and_rescoring_clears_them(self):
+        self.assertEqual(Case.objects.filter(priority_dirty=True).count(), 6)
+        self.assertEqual(schedule_priority_updates(), 6)
+        self.assertFalse(Case.objects.filter(priority_dirty=True).exists())
+        self.assertFalse(Case.objects.filter(priority_recheck_at__isnull=True).exists())
+        
+        # Nothing stale, nothing rescored
+        self.assertEqual(schedule_priority_updates(), 0)
+        
+        case = self.cases[2]
+        case.refresh_from_db()
+        case.priority_level = 1
+        case.save()
+        self.assertTrue(Case.objects.get(pk=case.pk).priority_dirty)
+        self.assertEqual(schedule_priority_updates(), 1)
+    
+    def test_score_only_saves_do_not_mark_dirty(self):
+        schedule_priority_updates()
+        case = Case.objects.get(pk=self.cases[0].pk)
+        CasePriorityManager().update_case_priority(case)
+        self.assertFalse(Case.objects.get(pk=case.pk).priority_dirty)
+    
+    def test_passed_recheck_time_is_rescored(self):
+        schedule_priority_updates()
+        Case.objects.filter(pk=self.cases[1].pk).update(
+            priority_recheck_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(schedule_priority_updates(), 1)
+    
+    def test_full_sweep_scans_every_active_case(self):
+        schedule_priority_updates()
+        Case.objects.filter(pk=self.cases[3].pk).update(urgency_score=-1)
+        self.assertEqual(schedule_priority_updates(), 0)
+        self.assertEqual(schedule_priority_updates(full_sweep=True), 1)
+
+
+class PrioritizedCasesEndpointTests(TestCase):
+    """GET prioritized_cases serves stored scores and paginates"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        now = timezone.now()
+        for number in range(5):
+            create_case(self.client_user, number, priority_level=number + 1,
+                        deadline=now + timedelta(days=number * 2 - 3))
+        self.view = CaseViewSet.as_view({'get': 'prioritized_cases'})
+        self.factory = APIRequestFactory()
+    
+    def get(self, **params):
+        request = self.factory.get('/api/cases/prioritized_cases/', params)
+        force_authenticate(request, user=self.client_user)
+        return self.view(request)
+    
+    def test_fresh_scores_are_served_without_writes(self):
+        schedule_priority_updates()
+        Case.objects.update(urgency_score=42)
+        
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['scores_fresh'])
+        self.assertEqual({case['urgency_score'] for case in response.data['cases']}, {42})
+        self.assertEqual(response.data['total_cases'], 5)
+        self.assertEqual(response.data['high_priority_count'], 2)
+        self.assertEqual(response.data['overdue_count'], 2)
+    
+    def test_stale_cases_are_flagged_and_refreshed_only_on_request(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.get()
+        self.assertFalse(response.data['scores_fresh'])
+        self.assertEqual(response.data['stale_count'], 5)
+        self.assertFalse(response.data['refresh_queued'])
+        self.assertEqual(callbacks, [])
+        
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.get(refresh='true')
+        self.assertTrue(response.data['refresh_queued'])
+        self.assertEqual(len(callbacks), 1)
+        # The GET itself writes nothing
+        self.assertEqual(Case.objects.filter(priority_dirty=True).count(), 5)
+    
+    def test_one_aggregate_query_besides_the_page(self):
+        schedule_priority_updates()
+        request = self.factory.get('/api/cases/prioritized_cases/')
+        force_authenticate(request, user=self.client_user)
+        # Totals (with the page count and staleness) and the page itself
+        with self.assertNumQueries(2):
+            response = self.view(request)
+        self.assertEqual(response.data['total_cases'], 5)
+    
+    def test_results_are_paginated(self):
+        response = self.get(page_size=2)
+        self.assertEqual(len(response.data['cases']), 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(response.data['total_cases'], 5)
+
+
+class PriorityIndexTests(TestCase):
+    """The sorted-set priority index follows case writes and answers top-K queries"""
+    
+    def setUp(self):
+        self.index = get_priority_index()
+        # Built while there are no cases; the signals fill it from here
+        self.index.rebuild()
+        self.manager = CasePriorityManager()
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.lawyer = User.objects.create_user(username='lawyer', password='x', user_type='lawyer')
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cases = [
+                create_case(self.client_user, number, priority_level=number % 5 + 1,
+                            deadline=now + timedelta(days=number * 4 - 10))
+                for number in range(8)
+            ]
+            schedule_priority_updates()
+    
+    def test_top_urgent_matches_database_order(self):
+        expected = list(
+            Case.objects.exclude(status='closed').filter(urgency_score__gte=50)
+            .order_by('-urgency_score', '-id').values_list('id', flat=True)[:3]
+        )
+        top = self.manager.get_top_urgent_cases(limit=3, urgency_threshold=50)
+        self.assertEqual([case.id for case in top], expected)
+    
+    def test_next_overdue_are_earliest_deadlines_in_the_past(self):
+        overdue = self.manager.get_next_overdue_cases(limit=10)
+        self.assertEqual([case.id for case in overdue], list(self.manager.get_overdue_cases().values_list('id', flat=True)))
+        self.assertEqual(len(overdue), 3)
+    
+    def test_unbuilt_index_falls_back_to_the_database(self):
+        self.index.backend.clear()
+        self.assertFalse(self.index.is_built())
+        # A case written since the clear is in the index alone, and nothing else is
+        with self.captureOnCommitCallbacks(execute=True):
+            create_case(self.client_user, 8, deadline=timezone.now() - timedelta(days=30))
+        
+        top = self.manager.get_top_urgent_cases(limit=3, urgency_threshold=0)
+        self.assertEqual([case.id for case in top],
+                         list(self.manager.get_urgent_cases(0).values_list('id', flat=True)[:3]))
+        overdue = self.manager.get_next_overdue_cases(limit=10)
+        self.assertEqual(len(overdue), 4)
+        
+        call_command('rebuild_priority_index', stdout=StringIO())
+        self.assertTrue(self.index.is_built())
+        self.assertEqual(len(self.manager.get_next_overdue_cases(limit=10)), 4)
+    
+    def test_index_follows_saves_and_deletes(self):
+        case = Case.objects.get(pk=self.cases[0].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            case.assigned_lawyer = self.lawyer
+            case.save()
+        unassigned = self.index.top_urgent(UNASSIGNED_SCOPE, limit=100)
+        self.assertNotIn(str(case.id), unassigned)
+        self.assertEqual(len(unassigned), 7)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            case.status = 'closed'
+            case.save()
+            self.cases[1].delete()
+        self.assertEqual(len(self.index.top_urgent(client_scope(self.client_user.id), limit=100)), 6)
+        self.assertEqual(self.index.check(), [])
+        
+        actions = identify_urgent_actions()
+        self.assertNotIn(case.id, [action['case_id'] for action in actions])
+    
+    def test_check_reports_drift_and_rebuild_repairs_it(self):
+        Case.objects.filter(pk=self.cases[3].pk).update(urgency_score=1)
+        self.assertTrue(self.index.check())
+        with self.assertRaises(CommandError):
+            call_command('rebuild_priority_index', check=True, stdout=StringIO(), stderr=StringIO())
+        
+        call_command('rebuild_priority_index', stdout=StringIO())
+        self.assertEqual(self.index.check(), [])
+
+
+class ParallelPriorityUpdateTests(TransactionTestCase):
+    """Sharded rescoring matches the single-process path"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        now = timezone.now()
+        for number in range(40):
+            create_case(self.client_user, number, priority_level=number % 5 + 1,
+                        case_type=random.Random(number).choice(['criminal', 'civil', 'family']),
+                        deadline=now + timedelta(days=number - 10))
+    
+    def test_shard_bounds_cover_the_key_space(self):
+        bounds = shard_bounds(4)
+        self.assertEqual(len(bounds), 4)
+        self.assertIsNone(bounds[0][0])
+        self.assertIsNone(bounds[-1][1])
+        for (_, high), (low, _) in zip(bounds, bounds[1:]):
+            self.assertEqual(high, low)
+    
+    def test_sharded_scores_match_sequential_scores(self):
+        now = timezone.now()
+        result = parallel_update_priorities(3, now=now)
+        self.assertEqual([shard['shard'] for shard in result['shards']], [0, 1, 2])
+        self.assertEqual(result['scanned'], 40)
+        self.assertEqual(result['written'], sum(shard['written'] for shard in result['shards']))
+        self.assertFalse(Case.objects.filter(priority_dirty=True).exists())
+        
+        sharded = dict(Case.objects.values_list('pk', 'urgency_score'))
+        manager = CasePriorityManager()
+        manager.calculator.current_time = now
+        manager.stream_update_priorities(Case.objects.all())
+        self.assertEqual(dict(Case.objects.values_list('pk', 'urgency_score')), sharded)
+    
+    def test_schedule_priority_updates_with_workers(self):
+        self.assertEqual(schedule_priority_updates(workers=2), 40)
+        self.assertEqual(schedule_priority_updates(workers=2), 0)
+
+
+class CaseListQueryTests(TestCase):
+    """Case list and retrieve cost a fixed number of queries per page"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username='client', password='x', user_type='client', first_name='Ann', last_name='Client'
+        )
+        self.lawyer = User.objects.create_user(
+            username='lawyer', password='x', user_type='lawyer', first_name='Lee', last_name='Lawyer'
+        )
+        self.factory = APIRequestFactory()
+    
+    def add_cases(self, start, count):
+        now = timezone.now()
+        for number in range(start, start + count):
+            case = create_case(self.client_user, number, assigned_lawyer=self.lawyer)
+            CaseDocument.objects.create(case=case, title='Brief', document_type='legal_brief',
+                                        file='case_documents/brief.pdf', uploaded_by=self.lawyer)
+            CaseNote.objects.create(case=case, author=self.lawyer, content='Note')
+            for minutes in range(7):
+                activity = CaseActivity.objects.create(case=case, activity_type='note_added',
+                                                       description=f'Activity {minutes}', performed_by=self.lawyer)
+                CaseActivity.objects.filter(pk=activity.pk).update(timestamp=now - timedelta(minutes=minutes))
+    
+    def get(self, actions, params=None, **kwargs):
+        request = self.factory.get('/api/cases/', params)
+        force_authenticate(request, user=self.lawyer)
+        response = CaseViewSet.as_view(actions)(request, **kwargs)
+        response.render()
+        return response
+    
+    def test_list_query_count_does_not_grow_with_cases(self):
+        params = {'fields': 'document_count,activity_count,note_count,assigned_lawyer_name,recent_activities'}
+        self.add_cases(0, 2)
+        # cases with annotated counts and joined users, then recent activities
+        with self.assertNumQueries(2):
+            self.get({'get': 'list'}, params)
+        
+        self.add_cases(2, 8)
+        with self.assertNumQueries(2):
+            response = self.get({'get': 'list'}, params)
+        
+        self.assertEqual(len(response.data['results']), 10)
+        case = response.data['results'][0]
+        self.assertEqual((case['document_count'], case['activity_count'], case['note_count']), (1, 7, 1))
+        self.assertEqual(case['assigned_lawyer_name'], 'Lee Lawyer')
+        self.assertEqual(
+            [activity['description'] for activity in case['recent_activities']],
+            [f'Activity {minutes}' for minutes in range(5)]
+        )
+    
+    def test_retrieve_uses_the_same_loading(self):
+        self.add_cases(0, 1)
+        case = Case.objects.get()
+        with self.assertNumQueries(2):
+            response = self.get({'get': 'retrieve'}, pk=case.pk)
+        self.assertEqual(len(response.data['recent_activities']), 5)
+        self.assertEqual(response.data['client_name'], 'Ann Client')
+
+    
+    def test_list_defaults_to_compact_fields(self):
+        self.add_cases(0, 3)
+        with self.assertNumQueries(1):
+            response = self.get({'get': 'list'})
+        case = response.data['results'][0]
+        self.assertEqual(set(case), set(CaseListSerializer.default_fields))
+        self.assertEqual(case['client_name'], 'Ann Client')
+        self.assertNotIn('description', case)
+    
+    def test_fields_param_projects_list_and_retrieve(self):
+        self.add_cases(0, 3)
+        with self.assertNumQueries(1):
+            response = self.get({'get': 'list'}, {'fields': 'title,is_overdue,bogus'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'is_overdue'})
+        
+        case = Case.objects.first()
+        with self.assertNumQueries(1):
+            response = self.get({'get': 'retrieve'}, {'fields': 'description,note_count'}, pk=case.pk)
+        self.assertEqual(response.data, {'id': str(case.pk), 'description': 'Test case', 'note_count': 1})
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages follow the full sort key and cost one query each"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        now = timezone.now()
+        rng = random.Random(7)
+        # Plenty of ties on priority and score, and some missing deadlines
+        for number in range(23):
+            create_case(self.client_user, number, priority_level=rng.randint(1, 2),
+                        deadline=rng.choice([None, now + timedelta(days=rng.randint(0, 3))]))
+        Case.objects.update(urgency_score=50)
+        self.factory = APIRequestFactory()
+    
+    def get(self, view, url='/api/cases/', **params):
+        request = self.factory.get(url, params)
+        force_authenticate(request, user=self.client_user)
+        response = view(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+    
+    def walk(self, view, **params):
+        pages = [self.get(view, **params)]
+        while pages[-1]['next']:
+            with self.assertNumQueries(1):
+                pages.append(self.get(view, pages[-1]['next']))
+        return pages
+    
+    def test_pages_cover_every_case_in_priority_order(self):
+        view = CaseViewSet.as_view({'get': 'list'})
+        pages = self.walk(view, page_size=5)
+        self.assertEqual([len(page['results']) for page in pages], [5, 5, 5, 5, 3])
+        
+        ids = [case['id'] for page in pages for case in page['results']]
+        now = timezone.now()
+        expected = sorted(
+            Case.objects.all(),
+            key=lambda case: (case.priority_level, -case.urgency_score, case.deadline is None,
+                              case.deadline or now, str(case.id))
+        )
+        self.assertEqual(ids, [str(case.id) for case in expected])
+        
+        # Walking back from the last page retraces the same pages
+        previous = self.get(view, pages[-1]['previous'])
+        self.assertEqual(previous['results'], pages[-2]['results'])
+    
+    def test_rescoring_does_not_shift_later_pages(self):
+        view = CaseViewSet.as_view({'get': 'list'})
+        first = self.get(view, page_size=5)
+        second_before = self.get(view, first['next'])
+        
+        # Rescoring rows that were already served must not move page two
+        Case.objects.filter(id__in=[case['id'] for case in first['results']]).update(urgency_score=99)
+        second_after = self.get(view, first['next'])
+        self.assertEqual(second_after['results'], second_before['results'])
+    
+    def test_ordering_param_and_invalid_cursor(self):
+        view = CaseViewSet.as_view({'get': 'list'})
+        pages = self.walk(view, page_size=4, ordering='-deadline')
+        deadlines = [case['deadline'] for page in pages for case in page['results']]
+        self.assertEqual(deadlines.count(None), Case.objects.filter(deadline__isnull=True).count())
+        self.assertEqual(deadlines[:deadlines.count(None)], [None] * deadlines.count(None))
+        
+        request = self.factory.get('/api/cases/', {'cursor': 'bm90LWEtY3Vyc29y'})
+        force_authenticate(request, user=self.client_user)
+        self.assertEqual(view(request).status_code, 404)
+    
+    def test_notifications_are_newest_first(self):
+        now = timezone.now()
+        for number in range(7):
+            notification = Notification.objects.create(
+                recipient=self.client_user, notification_type='system', title=f'N{number}', message='x'
+            )
+            # Two notifications per timestamp to exercise the id tiebreaker
+            Notification.objects.filter(pk=notification.pk).update(created_at=now - timedelta(minutes=number // 2))
+        
+        pages = self.walk(NotificationViewSet.as_view({'get': 'list'}), url='/api/notifications/', page_size=3)
+        titles = [item['title'] for page in pages for item in page['results']]
+        expected = Notification.objects.order_by('-created_at', '-id').values_list('title', flat=True)
+        self.assertEqual(titles, list(expected))
+
+
+class DashboardStatsTests(TestCase):
+    """dashboard_stats is one aggregate query, cached until the user's cases change"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.lawyer = User.objects.create_user(username='lawyer', password='x', user_type='lawyer')
+        self.other_lawyer = User.objects.create_user(username='other', password='x', user_type='lawyer')
+        now = timezone.now()
+        for number, (status, priority, deadline) in enumerate([
+            ('filed', 1, now - timedelta(days=1)),
+            ('hearing', 2, now + timedelta(days=3)),
+            ('trial', 2, now + timedelta(days=30)),
+            ('closed', 5, None),
+        ]):
+            create_case(self.client_user, number, status=status, priority_level=priority,
+                        deadline=deadline, assigned_lawyer=self.lawyer)
+        self.view = CaseViewSet.as_view({'get': 'dashboard_stats'})
+    
+    def get_stats(self, user):
+        request = APIRequestFactory().get('/api/cases/dashboard_stats/')
+        force_authenticate(request, user=user)
+        response = self.view(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+    
+    def test_counts_come_from_the_summary_then_the_cache(self):
+        rebuild_case_summaries()
+        with self.assertNumQueries(1):
+            stats = self.get_stats(self.client_user)
+        self.assertEqual(stats['total_cases'], 4)
+        self.assertEqual(stats['cases_by_status']['closed'], 1)
+        self.assertEqual(stats['cases_by_status']['investigation'], 0)
+        self.assertEqual(stats['cases_by_priority'], {
+            'priority_1': 1, 'priority_2': 2, 'priority_3': 0, 'priority_4': 0, 'priority_5': 1
+        })
+        self.assertEqual((stats['overdue_cases'], stats['due_this_week'], stats['recent_activity']), (1, 1, 4))
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_stats(self.client_user), stats)
+        
+        lawyer_stats = self.get_stats(self.lawyer)
+        self.assertEqual(lawyer_stats['assigned_cases'], 4)
+        self.assertEqual(lawyer_stats['completion_rate'], 25)
+    
+    def test_case_writes_invalidate_everyone_involved(self):
+        self.get_stats(self.client_user)
+        self.get_stats(self.lawyer)
+        self.get_stats(self.other_lawyer)
+        
+        # Reassignment must refresh both the old and the new lawyer
+        case = Case.objects.get(status='filed')
+        case.assigned_lawyer = self.other_lawyer
+        with self.captureOnCommitCallbacks(execute=True):
+            case.save()
+        self.assertEqual(self.get_stats(self.lawyer)['total_cases'], 3)
+        self.assertEqual(self.get_stats(self.other_lawyer)['total_cases'], 1)
+        self.assertEqual(self.get_stats(self.client_user)['total_cases'], 4)
+        
+        # Rescoring alone leaves the cache alone
+        with self.captureOnCommitCallbacks(execute=True):
+            case.calculate_priority_score()
+        with self.assertNumQueries(0):
+            self.get_stats(self.other_lawyer)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            case.delete()
+        self.assertEqual(self.get_stats(self.other_lawyer)['total_cases'], 0)
+        self.assertEqual(self.get_stats(self.client_user)['total_cases'], 3)
+    
+    def test_priority_statistics_in_one_query(self):
+        rebuild_case_summaries()
+        with self.assertNumQueries(1):
+            stats = CasePriorityManager().get_priority_statistics(self.client_user)
+        self.assertEqual(stats['critical_cases'], 1)
+        self.assertEqual(stats['high_priority_cases'], 2)
+        self.assertEqual(stats['cases_by_status'], {'filed': 1, 'hearing': 1, 'trial': 1, 'closed': 1})
+
+
+class CaseSummaryTests(TestCase):
+    """Summaries maintained from signals and rescoring match a recount of the cases"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.other_client = User.objects.create_user(username='other_client', password='x', user_type='client')
+        self.lawyer = User.objects.create_user(username='lawyer', password='x', user_type='lawyer')
+        self.other_lawyer = User.objects.create_user(username='other_lawyer', password='x', user_type='lawyer')
+        LawyerProfile.objects.create(user=self.lawyer, license_number='L1', experience_years=5, bar_association='Bar')
+        self.users = [self.client_user, self.other_client, self.lawyer, self.other_lawyer]
+        self.now = timezone.now()
+        for number, (status, deadline_days) in enumerate([
+            ('closed', None), ('closed', -3), ('trial', 2), ('filed', 30), ('hearing', 9), ('filed', -1)
+        ]):
+            create_case(self.client_user if number % 2 else self.other_client, number, status=status,
+                        priority_level=number % 5 + 1, assigned_lawyer=self.lawyer,
+                        deadline=self.now + timedelta(days=deadline_days) if deadline_days is not None else None)
+        rebuild_case_summaries()
+    
+    def assertSummariesMatchCases(self, now=None):
+        for user in self.users:
+            cases = Case.objects.filter(**{'assigned_lawyer' if user.user_type == 'lawyer' else 'client': user})
+            expected = case_statistics(cases, now)
+            actual = summary_statistics(get_case_summary(user, now))
+            self.assertAlmostEqual(actual.pop('average_urgency_score'), expected.pop('average_urgency_score'))
+            self.assertEqual(actual, expected, user.username)
+    
+    def test_incremental_updates_match_a_recount(self):
+        self.assertSummariesMatchCases()
+        
+        case = Case.objects.get(case_number='T000003')
+        case.status = 'closed'
+        case.assigned_lawyer = self.other_lawyer
+        case.client = self.client_user
+        case.deadline = self.now + timedelta(days=3)
+        case.save()
+        case.calculate_priority_score()
+        create_case(self.other_client, 50, priority_level=1, assigned_lawyer=self.other_lawyer,
+                    deadline=self.now - timedelta(days=1))
+        Case.objects.get(case_number='T000004').delete()
+        # Deferred fields and rescoring through bulk_update
+        deferred = Case.objects.only('id', 'priority_level').get(case_number='T000002')
+        deferred.priority_level = 5
+        deferred.save()
+        schedule_priority_updates(full_sweep=True)
+        
+        self.assertSummariesMatchCases()
+        self.assertEqual(LawyerProfile.objects.get(user=self.lawyer).total_cases, 4)
+    
+    def test_time_based_counts_are_recounted_when_a_boundary_passes(self):
+        summary = get_case_summary(self.client_user)
+        self.assertEqual(summary.recent_activity, 3)
+        # The client's next deadline boundary is 23 days out, so the first
+        # change is their oldest activity leaving the 7 day window
+        cases = Case.objects.filter(client=self.client_user)
+        self.assertEqual(summary.counts_valid_until, min(case.last_activity for case in cases) + timedelta(days=7))
+        
+        later = self.now + timedelta(days=8)
+        self.assertSummariesMatchCases(now=later)
+        summary = get_case_summary(self.client_user, later)
+        self.assertEqual(summary.recent_activity, 0)
+        self.assertEqual(summary.counts_valid_until, Case.objects.get(case_number='T000003').deadline - timedelta(days=7))
+    
+    def test_lawyer_metrics(self):
+        Case.objects.filter(status='closed').update(created_at=self.now - timedelta(days=4))
+        rebuild_case_summaries(now=self.now)
+        metrics = summary_lawyer_metrics(get_case_summary(self.lawyer, self.now), now=self.now + timedelta(days=2))
+        self.assertAlmostEqual(metrics['avg_case_duration'], 6)
+        self.assertAlmostEqual(metrics['completion_rate'], 100 / 3)
+        
+        idle = get_case_summary(self.other_lawyer)
+        self.assertEqual(summary_lawyer_metrics(idle), {'avg_case_duration': 0, 'completion_rate': 0})
+        self.assertTrue(LawyerCaseSummary.objects.filter(lawyer=self.other_lawyer).exists())
+        self.assertIsNone(get_case_summary(User.objects.create_user(username='admin', password='x', user_type='admin')))
+    
+    def test_avg_case_duration_counts_only_closed_cases(self):
+        def closed_case_days(now):
+            ages = [now - case.created_at for case in Case.objects.filter(assigned_lawyer=self.lawyer, status='closed')]
+            return sum(age.total_seconds() for age in ages) / 86400 / len(ages)
+        
+        # Open cases much older than the closed ones must not pull the average
+        Case.objects.filter(status='closed').update(created_at=self.now - timedelta(days=4))
+        Case.objects.exclude(status='closed').update(created_at=self.now - timedelta(days=400))
+        rebuild_case_summaries(now=self.now)
+        metrics = summary_lawyer_metrics(get_case_summary(self.lawyer, self.now), now=self.now)
+        self.assertAlmostEqual(metrics['avg_case_duration'], 4)
+        
+        # Closing and reopening cases moves them in and out of both the sum and the divisor
+        opened = Case.objects.get(case_number='T000003')
+        opened.status = 'closed'
+        opened.save()
+        reopened = Case.objects.get(case_number='T000000')
+        reopened.status = 'hearing'
+        reopened.save(update_fields=['status'])
+        metrics = summary_lawyer_metrics(get_case_summary(self.lawyer, self.now), now=self.now)
+        self.assertAlmostEqual(metrics['avg_case_duration'], closed_case_days(self.now), places=3)
+        self.assertAlmostEqual(metrics['avg_case_duration'], 202, places=3)
+    
+    def test_rebuild_command(self):
+        ClientCaseSummary.objects.update(total_cases=99)
+        out = StringIO()
+        call_command('rebuild_case_summaries', stdout=out)
+        self.assertIn('Rebuilt 3 case summaries', out.getvalue())
+        self.assertSummariesMatchCases()
+
+
+class NotificationDispatcherTests(TestCase):
+    """Notifications are bulk inserted and delivered after commit"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.lawyer = User.objects.create_user(username='lawyer', password='x', user_type='lawyer')
+        self.cases = [
+            create_case(self.client_user, number, assigned_lawyer=self.lawyer) for number in range(30)
+        ]
+        self.channel_layer = get_channel_layer()
+        self.channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(f'user_{self.client_user.pk}', self.channel)
+    
+    def test_recipients_are_deduplicated_and_delivered_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with NotificationDispatcher(exclude=self.lawyer) as notifications:
+                notifications.add([self.client_user, self.client_user.pk, self.lawyer, None],
+                                  'case_update', 'Title', 'Message', related_case=self.cases[0])
+                notifications.add(self.client_user, 'system', 'Second', 'Message')
+            self.assertEqual(list(Notification.objects.values_list('recipient', 'title').order_by('title')),
+                             [(self.client_user.pk, 'Second'), (self.client_user.pk, 'Title')])
+        
+        # Delivery is queued for commit rather than sent inline
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        message = async_to_sync(self.channel_layer.receive)(self.channel)
+        self.assertEqual(message['type'], 'notifications')
+        self.assertEqual({item['title'] for item in message['notifications']}, {'Title', 'Second'})
+        self.assertEqual(message['notifications'][0]['related_case'], str(self.cases[0].pk))
+    
+    def test_bulk_prioritize_sends_no_notifications(self):
+        request = APIRequestFactory().post('/api/cases/bulk_prioritize/', {
+            'case_ids': [str(case.pk) for case in self.cases], 'priority_level': 1
+        }, format='json')
+        force_authenticate(request, user=self.lawyer)
+        with CaptureQueriesContext(connection) as queries:
+            response = CaseViewSet.as_view({'post': 'bulk_prioritize'})(request)
+        self.assertEqual(response.status_code, 200)
+        
+        self.assertFalse([query for query in queries if 'INSERT INTO "cases_notification"' in query['sql']])
+        self.assertFalse(Notification.objects.exists())
+
+
+class BulkActivityLogTests(TestCase):
+    """Activities are buffered and bulk inserted in the transaction; bulk_prioritize writes in constant queries"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.lawyer = User.objects.create_user(username='lawyer', password='x', user_type='lawyer')
+        self.cases = [
+            create_case(self.client_user, number, assigned_lawyer=self.lawyer, priority_level=number % 5 + 1,
+                        deadline=timezone.now() + timedelta(days=number))
+            for number in range(40)
+        ]
+        rebuild_case_summaries()
+    
+    def bulk_prioritize(self, cases, priority_level):
+        request = APIRequestFactory().post('/api/cases/bulk_prioritize/', {
+            'case_ids': [str(case.pk) for case in cases], 'priority_level': priority_level
+        }, format='json')
+        force_authenticate(request, user=self.lawyer)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = CaseViewSet.as_view({'post': 'bulk_prioritize'})(request)
+        return response, queries
+    
+    def test_entries_are_written_when_the_block_exits(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with ActivityLog(performed_by=self.lawyer) as activity_log:
+                activity_log.add(self.cases[0], 'note_added', 'First')
+                activity_log.add(self.cases[1].pk, 'note_added', 'Second', metadata={'source': 'test'})
+                self.assertFalse(CaseActivity.objects.exists())
+        
+        self.assertEqual(callbacks, [])
+        activities = list(CaseActivity.objects.order_by('description'))
+        self.assertEqual([activity.case_id for activity in activities], [self.cases[0].pk, self.cases[1].pk])
+        self.assertEqual({activity.performed_by_id for activity in activities}, {self.lawyer.pk})
+        self.assertEqual(activities[1].metadata, {'source': 'test'})
+    
+    def test_nothing_is_written_when_the_block_fails(self):
+        with self.assertRaises(ValueError), ActivityLog() as activity_log:
+            activity_log.add(self.cases[0], 'note_added', 'Lost')
+            raise ValueError
+        self.assertFalse(CaseActivity.objects.exists())
+    
+    def test_failed_audit_insert_rolls_back_bulk_prioritize(self):
+        with patch.object(CaseActivity.objects, 'bulk_create', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                self.bulk_prioritize(self.cases[:3], 5)
+        self.assertEqual([Case.objects.get(pk=case.pk).priority_level for case in self.cases[:3]],
+                         [case.priority_level for case in self.cases[:3]])
+    
+    def test_bulk_prioritize_query_count_is_constant(self):
+        _, small = self.bulk_prioritize(self.cases[:10], 1)
+        response, large = self.bulk_prioritize(self.cases[10:], 2)
+        self.assertEqual(response.data['updated_cases'], 30)
+        self.assertEqual(len(small), len(large))
+        
+        activity_inserts = [query for query in large if query['sql'].startswith('INSERT INTO "cases_caseactivity"')]
+        self.assertEqual(len(activity_inserts), 1)
+        self.assertEqual(CaseActivity.objects.filter(activity_type='priority_changed').count(), 40)
+    
+    def test_bulk_prioritize_rescores_and_keeps_summaries_in_step(self):
+        response, _ = self.bulk_prioritize(self.cases[:25], 1)
+        self.assertEqual(response.status_code, 200)
+        
+        calculator = CasePriorityCalculator()
+        for case in Case.objects.filter(pk__in=[case.pk for case in self.cases[:25]]):
+            self.assertEqual(case.priority_level, 1)
+            self.assertFalse(case.priority_dirty)
+            self.assertAlmostEqual(case.urgency_score, calculator.calculate_case_priority(case)[0], places=4)
+        
+        for user, cases in ((self.client_user, Case.objects.filter(client=self.client_user)),
+                            (self.lawyer, Case.objects.filter(assigned_lawyer=self.lawyer))):
+            expected = case_statistics(cases)
+            actual = summary_statistics(get_case_summary(user))
+            self.assertAlmostEqual(actual.pop('average_urgency_score'), expected.pop('average_urgency_score'))
+            self.assertEqual(actual, expected)
+    
+    def test_bulk_prioritize_rejects_unknown_levels(self):
+        response, _ = self.bulk_prioritize(self.cases[:2], 9)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CaseActivity.objects.exists())
+
+
+class CaseBroadcastTests(TestCase):
+    """Case updates are serialized once, coalesced per case and sent after commit"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.lawyer = User.objects.create_user(username='lawyer', password='x', user_type='lawyer')
+        self.case = create_case(self.client_user, 1, assigned_lawyer=self.lawyer)
+        self.channel_layer = get_channel_layer()
+        self.case_channel = self.subscribe(f'case_{self.case.pk}')
+        self.user_channel = self.subscribe(f'user_{self.client_user.pk}')
+    
+    def subscribe(self, group):
+        channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(group, channel)
+        return channel
+    
+    def receive(self, channel):
+        return async_to_sync(self.channel_layer.receive)(channel)
+    
+    def queued(self, channel):
+        queue = self.channel_layer.channels.get(channel)
+        return queue.qsize() if queue else 0
+    
+    def test_updates_within_the_window_are_merged_into_one_message(self):
+        broadcaster = CaseBroadcaster(window=60)
+        broadcaster.publish_now('case_created', self.case)
+        self.case.status = 'hearing'
+        broadcaster.publish_now('status_updated', self.case)
+        broadcaster.flush()
+        
+        message = self.receive(self.case_channel)
+        self.assertEqual(message['update_types'], ['case_created', 'status_updated'])
+        self.assertEqual(message['case_data']['status'], 'hearing')
+        self.assertEqual(self.receive(self.user_channel), message)
+        self.assertEqual(self.queued(self.case_channel), 0)
+        
+        # Messages always carry the whole case; connections diff them per client
+        self.case.description = 'Updated'
+        broadcaster.publish_now('case_updated', self.case)
+        broadcaster.flush()
+        message = self.receive(self.case_channel)
+        self.assertEqual(message['update_types'], ['case_updated'])
+        self.assertEqual(message['case_data']['description'], 'Updated')
+        self.assertEqual(message['case_data']['status'], 'hearing')
+    
+    def test_view_updates_are_broadcast_after_commit(self):
+        request = APIRequestFactory().post(f'/api/cases/{self.case.pk}/update_status/', {'status': 'trial'}, format='json')
+        force_authenticate(request, user=self.lawyer)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = CaseViewSet.as_view({'post': 'update_status'})(request, pk=str(self.case.pk))
+        self.assertEqual(response.status_code, 200)
+        
+        get_case_broadcaster().flush()
+        self.assertEqual(self.queued(self.case_channel), 0)
+        
+        for callback in callbacks:
+            callback()
+        get_case_broadcaster().flush()
+        message = self.receive(self.case_channel)
+        self.assertEqual(message['update_type'], 'status_updated')
+        self.assertEqual(message['case_id'], str(self.case.pk))
+        self.assertEqual(message['case_data']['status'], 'trial')
+
+
+class WebsocketClient(ApplicationCommunicator):
+    """Drives an ASGI app as one WebSocket client (channels.testing needs daphne)"""
+    
+    def __init__(self, application, path, headers=None):
+        path, _, query = path.partition('?')
+        super().__init__(application, {
+            'type': 'websocket', 'path': path, 'query_string': query.encode(),
+            'headers': headers or [], 'subprotocols': [],
+        })
+    
+    async def connect(self):
+        await self.send_input({'type': 'websocket.connect'})
+        return (await self.receive_output(1))['type'] == 'websocket.accept'
+    
+    async def send_json_to(self, data):
+        await self.send_input({'type': 'websocket.receive', 'text': json.dumps(data)})
+    
+    async def receive_json_from(self):
+        return json.loads((await self.receive_output(1))['text'])
+    
+    async def disconnect(self):
+        await self.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await self.wait(1)
+
+
+class WebSocketConsumerTests(TransactionTestCase):
+    """
+    Token-authenticated WebSocket connections relay their user and case groups.
+    A TransactionTestCase, since database_sync_to_async closes connections
+    left inside a transaction.
+    """
+    
+    def setUp(self):
+        from case_prioritization.asgi import application
+        
+        self.application = application
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.lawyer = User.objects.create_user(username='lawyer', password='x', user_type='lawyer')
+        self.stranger = User.objects.create_user(username='stranger', password='x', user_type='client')
+        self.case = create_case(self.client_user, 1, assigned_lawyer=self.lawyer)
+        self.token = Token.objects.create(user=self.client_user)
+        self.stranger_token = Token.objects.create(user=self.stranger)
+    
+    def test_rejects_missing_and_unknown_tokens(self):
+        async def connect(path):
+            communicator = WebsocketClient(self.application, path)
+            connected = await communicator.connect()
+            if connected:
+                await communicator.disconnect()
+            return connected
+        
+        self.assertFalse(async_to_sync(connect)('/ws/updates/'))
+        self.assertFalse(async_to_sync(connect)('/ws/updates/?token=nope'))
+        self.assertFalse(async_to_sync(connect)(f'/ws/cases/{self.case.pk}/?token={self.stranger_token.key}'))
+        self.assertTrue(async_to_sync(connect)(f'/ws/cases/{self.case.pk}/?token={self.token.key}'))
+    
+    def test_user_connection_relays_notifications_and_subscribed_cases_once(self):
+        async def scenario():
+            communicator = WebsocketClient(
+                self.application, '/ws/updates/',
+                headers=[(b'authorization', f'Token {self.token.key}'.encode())]
+            )
+            self.assertTrue(await communicator.connect())
+            
+            await communicator.send_json_to({'action': 'subscribe', 'case_id': str(self.case.pk)})
+            self.assertEqual(await communicator.receive_json_from(), {'type': 'subscribed', 'case_id': str(self.case.pk)})
+            
+            channel_layer = get_channel_layer()
+            update = {'type': 'case_update', 'update_type': 'status_updated', 'update_types': ['status_updated'],
+                      'case_id': str(self.case.pk), 'case_data': {'status': 'trial', 'title': 'Case 1'}}
+            await channel_layer.group_send(f'case_{self.case.pk}', update)
+            await channel_layer.group_send(f'user_{self.client_user.pk}', update)
+            await channel_layer.group_send(f'user_{self.client_user.pk}', {
+                'type': 'notifications', 'notifications': [{'title': 'Hello'}]
+            })
+            
+            # The first message about a case carries all of it
+            self.assertEqual(await communicator.receive_json_from(), {**update, 'seq': 1})
+            # The second copy of the update, through the user group, is dropped
+            self.assertEqual(await communicator.receive_json_from(),
+                             {'type': 'notifications', 'notifications': [{'title': 'Hello'}]})
+            
+            # Later messages carry what changed since this client's last one,
+            # whichever process broadcast them
+            await channel_layer.group_send(f'user_{self.client_user.pk}', {
+                **update, 'update_types': ['case_updated'], 'update_type': 'case_updated',
+                'case_data': {'status': 'trial', 'title': 'Renamed'}
+            })
+            self.assertEqual(await communicator.receive_json_from(), {
+                'type': 'case_update', 'update_type': 'case_updated', 'update_types': ['case_updated'],
+                'case_id': str(self.case.pk), 'changes': {'title': 'Renamed'}, 'seq': 2
+            })
+            
+            await communicator.send_json_to({'action': 'subscribe', 'case_id': 'not-a-uuid'})
+            self.assertEqual((await communicator.receive_json_from())['error'], 'Invalid case_id')
+            await communicator.disconnect()
+            self.assertEqual(channel_layer.groups.get(f'user_{self.client_user.pk}', {}), {})
+        
+        async_to_sync(scenario)()
+    
+    def test_case_subscriptions_stop_at_the_limit(self):
+        cases = [self.case] + [create_case(self.client_user, number) for number in range(2, 5)]
+        
+        async def scenario():
+            communicator = WebsocketClient(self.application, f'/ws/updates/?token={self.token.key}')
+            self.assertTrue(await communicator.connect())
+            replies = []
+            for case in cases:
+                await communicator.send_json_to({'action': 'subscribe', 'case_id': str(case.pk)})
+                replies.append(await communicator.receive_json_from())
+            # Resubscribing to a followed case is not a new subscription
+            await communicator.send_json_to({'action': 'subscribe', 'case_id': str(cases[0].pk)})
+            replies.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            return replies
+        
+        with patch.object(UserUpdatesConsumer, 'MAX_CASE_SUBSCRIPTIONS', 3):
+            replies = async_to_sync(scenario)()
+        self.assertEqual([reply['type'] for reply in replies], ['subscribed'] * 3 + ['error', 'subscribed'])
+        self.assertEqual(replies[3]['error'], 'Too many subscriptions')
+    
+    @override_settings(PRIORITY_FEED_DEBOUNCE=0)
+    def test_priority_feed_sends_a_snapshot_then_deltas(self):
+        other = create_case(self.client_user, 2, priority_level=5)
+        
+        async def scenario():
+            communicator = WebsocketClient(self.application, f'/ws/priorities/?token={self.token.key}&page_size=5')
+            self.assertTrue(await communicator.connect())
+            snapshot = await communicator.receive_json_from()
+            self.assertEqual(snapshot['type'], 'snapshot')
+            self.assertEqual([entry['id'] for entry in snapshot['cases']], [str(self.case.pk), str(other.pk)])
+            
+            await database_sync_to_async(Case.objects.filter(pk=other.pk).update)(priority_level=1)
+            channel_layer = get_channel_layer()
+            # Someone else's case can't move this window
+            await channel_layer.group_send(user_feed_group(self.stranger.pk), {
+                'type': 'priority_changes', 'cases': [[str(other.pk), 1, 0.0]]
+            })
+            await channel_layer.group_send(user_feed_group(self.client_user.pk), {
+                'type': 'priority_changes', 'cases': [[str(other.pk), 1, 0.0]]
+            })
+            delta = await communicator.receive_json_from()
+            self.assertEqual(delta['type'], 'delta')
+            self.assertEqual((delta['base_version'], delta['version']), (1, 2))
+            self.assertEqual([(entry['id'], entry['rank']) for entry in delta['changed']],
+                             [(str(other.pk), 1), (str(self.case.pk), 2)])
+            await communicator.disconnect()
+            
+            # Reconnecting from version 1 replays the same change
+            communicator = WebsocketClient(
+                self.application,
+                f'/ws/priorities/?token={self.token.key}&page_size=5&resume={snapshot["resume_token"]}&version=1'
+            )
+            self.assertTrue(await communicator.connect())
+            resumed = await communicator.receive_json_from()
+            self.assertEqual(resumed['type'], 'delta')
+            self.assertEqual(resumed['changed'], delta['changed'])
+            await communicator.disconnect()
+        
+        async_to_sync(scenario)()
+    
+    def test_stranger_cannot_subscribe_to_a_case(self):
+        async def scenario():
+            communicator = WebsocketClient(self.application, f'/ws/updates/?token={self.stranger_token.key}')
+            await communicator.connect()
+            await communicator.send_json_to({'action': 'subscribe', 'case_id': str(self.case.pk)})
+            self.assertEqual((await communicator.receive_json_from())['error'], 'Case not found')
+            await communicator.disconnect()
+        
+        async_to_sync(scenario)()
+
+
+class PriorityFeedTests(TestCase):
+    """Priority feeds send rank and score deltas for a window and resume from a token"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.lawyer = User.objects.create_user(username='lawyer', password='x', user_type='lawyer')
+        self.other_lawyer = User.objects.create_user(username='other_lawyer', password='x', user_type='lawyer')
+        self.cases = [
+            create_case(self.client_user, number, assigned_lawyer=self.lawyer, priority_level=number + 1)
+            for number in range(5)
+        ]
+        for case in self.cases:
+            case.calculate_priority_score()
+    
+    def ids(self, entries):
+        return [entry['id'] for entry in entries]
+    
+    def reprioritize(self, case, priority_level):
+        case.priority_level = priority_level
+        case.save()
+        case.calculate_priority_score()
+    
+    def test_snapshot_then_deltas(self):
+        feed = PriorityFeed(self.lawyer, limit=3)
+        snapshot = feed.start()
+        self.assertEqual(self.ids(snapshot['cases']), [str(case.pk) for case in self.cases[:3]])
+        self.assertEqual([entry['rank'] for entry in snapshot['cases']], [1, 2, 3])
+        self.assertIsNone(feed.refresh())
+        
+        self.reprioritize(self.cases[4], 1)
+        delta = feed.refresh()
+        self.assertEqual((delta['base_version'], delta['version']), (1, 2))
+        self.assertEqual(delta['removed'], [str(self.cases[2].pk)])
+        # Applying the delta to the snapshot gives the current window
+        window = {entry['id']: entry for entry in snapshot['cases']}
+        for case_id in delta['removed']:
+            del window[case_id]
+        window.update((entry['id'], entry) for entry in delta['changed'])
+        expected = Case.objects.filter(assigned_lawyer=self.lawyer).order_by(*PRIORITY_ORDERING)[:3]
+        self.assertEqual(
+            [(entry['id'], entry['urgency_score']) for entry in sorted(window.values(), key=lambda entry: entry['rank'])],
+            [(str(case.pk), case.urgency_score) for case in expected]
+        )
+    
+    def test_resume_replays_missed_changes(self):
+        feed = PriorityFeed(self.lawyer, limit=3)
+        snapshot = feed.start()
+        self.reprioritize(self.cases[3], 1)
+        missed = feed.refresh()
+        
+        resumed = PriorityFeed(self.lawyer, limit=3).start(snapshot['resume_token'], version=1)
+        self.assertEqual(resumed['type'], 'delta')
+        self.assertEqual((resumed['base_version'], resumed['version']), (1, 2))
+        self.assertEqual(resumed['changed'], missed['changed'])
+        
+        # Up to date: an empty delta
+        current = PriorityFeed(self.lawyer, limit=3).start(snapshot['resume_token'], version=2)
+        self.assertEqual((current['changed'], current['removed']), ([], []))
+        
+        # Another user, window or an unknown token start over
+        self.assertEqual(PriorityFeed(self.other_lawyer, limit=3).start(snapshot['resume_token'], 2)['type'], 'snapshot')
+        self.assertEqual(PriorityFeed(self.lawyer, limit=4).start(snapshot['resume_token'], 2)['type'], 'snapshot')
+        self.assertEqual(PriorityFeed(self.lawyer, limit=3).start('unknown', 2)['type'], 'snapshot')
+    
+    def test_only_changes_that_can_reach_the_window_are_relevant(self):
+        feed = PriorityFeed(self.lawyer, limit=3)
+        feed.start()
+        last = self.cases[2]
+        self.assertTrue(feed.is_relevant([[str(last.pk), 5, 0.0]]))
+        self.assertTrue(feed.is_relevant([[str(self.cases[4].pk), 1, 0.0]]))
+        self.assertFalse(feed.is_relevant([[str(self.cases[4].pk), 5, 99.0]]))
+        self.assertFalse(feed.is_relevant([[str(self.cases[4].pk), None, None]]))
+        self.assertTrue(PriorityFeed(self.lawyer, offset=3, limit=3).is_relevant([]))
+    
+    def test_case_saves_publish_to_the_parties_feeds(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(user_feed_group(self.lawyer.pk), channel)
+        
+        case = Case.objects.get(pk=self.cases[4].pk)
+        case.assigned_lawyer = self.other_lawyer
+        with self.captureOnCommitCallbacks(execute=True):
+            case.save()
+        get_case_broadcaster().flush()
+        
+        # The lawyer who lost the case hears about it too
+        message = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(message['type'], 'priority_changes')
+        self.assertEqual(message['cases'], [[str(case.pk), case.priority_level, case.urgency_score]])
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Token lookups are served from the local and shared caches and dropped on logout or user changes"""
+    
+    def setUp(self):
+        cache.clear()
+        local_tokens.clear()
+        self.user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.token = Token.objects.create(user=self.user)
+    
+    def authenticate(self, key=None, keyword='Token'):
+        request = APIRequestFactory().get('/api/cases/', HTTP_AUTHORIZATION=f'{keyword} {key or self.token.key}')
+        return CachedTokenAuthentication().authenticate(Request(request))
+    
+    def test_repeat_lookups_skip_the_database(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+        
+        # Another process: only the shared cache has it
+        local_tokens.clear()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate(keyword='Bearer')
+        self.assertEqual((user.pk, user.user_type, token.user_id), (self.user.pk, 'client', self.user.pk))
+        # The password hash isn't cached, so it's left deferred rather than blank
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertTrue(user.check_password('x'))
+    
+    def test_logout_invalidates_the_token(self):
+        self.authenticate()
+        request = APIRequestFactory().post('/api/auth/logout/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = AuthViewSet.as_view({'post': 'logout'})(request)
+        self.assertEqual(response.status_code, 200)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+    
+    def test_user_changes_invalidate_the_token(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(user_type='lawyer')
+            # update() sends no signal; a save does
+            user = User.objects.get(pk=self.user.pk)
+            user.is_active = False
+            user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        self.assertIsNone(self.authenticate(keyword='Basic'))
+    
+    @override_settings(TOKEN_AUTH_LOCAL_CACHE_SIZE=2)
+    def test_local_cache_is_bounded(self):
+        tokens = [Token.objects.create(user=User.objects.create_user(username=f'user{n}', password='x'))
+                  for n in range(3)]
+        for token in tokens:
+            self.authenticate(token.key)
+        self.assertEqual(list(local_tokens.entries), [token.key for token in tokens[1:]])
+        self.assertEqual(set(local_tokens.keys_by_user), {token.user_id for token in tokens[1:]})
+
+
+class AsyncAuthViewTests(TransactionTestCase):
+    """Async login/register hash on the bounded pool and shed load when it's full"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='client', password='secret-pass-123', user_type='client')
+    
+    def post(self, view, data):
+        request = RequestFactory().post('/api/auth/', data=json.dumps(data), content_type='application/json')
+        response = async_to_sync(view)(request)
+        return response, json.loads(response.content)
+    
+    def test_login_returns_the_users_token(self):
+        response, data = self.post(async_login, {'username': 'client', 'password': 'secret-pass-123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['token'], Token.objects.get(user=self.user).key)
+        self.assertEqual(data['user_type'], 'client')
+        
+        for credentials in ({'username': 'client', 'password': 'wrong'}, {'username': 'nobody', 'password': 'x'}):
+            response, data = self.post(async_login, credentials)
+            self.assertEqual(response.status_code, 401)
+        response, _ = self.post(async_login, {'username': 'client'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_login_goes_through_authenticate(self):
+        failures = []
+        receiver = lambda sender, credentials, **kwargs: failures.append(credentials['username'])
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        
+        response, _ = self.post(async_login, {'username': 'client', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(failures, ['client'])
+        
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response, _ = self.post(async_login, {'username': 'client', 'password': 'secret-pass-123'})
+        self.assertEqual(response.status_code, 401)
+    
+    def test_sync_viewset_uses_the_pool(self):
+        login = AuthViewSet.as_view({'post': 'login'})
+        request = APIRequestFactory().post('/api/auth/login/', {'username': 'client', 'password': 'secret-pass-123'},
+                                           format='json')
+        response = login(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token'], Token.objects.get(user=self.user).key)
+        
+        with override_settings(PASSWORD_HASHING_QUEUE_LIMIT=0):
+            request = APIRequestFactory().post('/api/auth/register/', {
+                'username': 'new_client', 'password': 'Str0ng-passw0rd!', 'confirm_password': 'Str0ng-passw0rd!',
+            }, format='json')
+            response = AuthViewSet.as_view({'post': 'register'})(request)
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(User.objects.filter(username='new_client').exists())
+    
+    @override_settings(PASSWORD_HASHING_QUEUE_LIMIT=0)
+    def test_full_pool_answers_503(self):
+        response, _ = self.post(async_login, {'username': 'client', 'password': 'secret-pass-123'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+    
+    def test_register_stores_the_pool_hash(self):
+        response, data = self.post(async_register, {
+            'username': 'new_client', 'password': 'Str0ng-passw0rd!', 'confirm_password': 'Str0ng-passw0rd!',
+            'user_type': 'client', 'email': 'new@example.com',
+        })
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(username='new_client')
+        self.assertTrue(user.check_password('Str0ng-passw0rd!'))
+        self.assertEqual(data['token'], Token.objects.get(user=user).key)
+        
+        response, data = self.post(async_register, {'username': 'weak', 'password': '1', 'confirm_password': '1'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', data)
+    
+    def test_pool_rejects_work_past_its_limit(self):
+        pool = PasswordHashingPool(workers=1, max_pending=1)
+        release = threading.Event()
+        
+        async def scenario():
+            blocked = asyncio.ensure_future(pool.run(release.wait))
+            await asyncio.sleep(0)
+            with self.assertRaises(HashingPoolBusy):
+                await pool.run(len, 'x')
+            release.set()
+            self.assertTrue(await blocked)
+            self.assertEqual(await pool.run(len, 'xyz'), 3)
+        
+        async_to_sync(scenario)()
+
+
+class CaseScopeTests(TestCase):
+    """Each user's case IDs are cached, scope child resources without a join and follow reassignments"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.lawyer = User.objects.create_user(username='lawyer', password='x', user_type='lawyer')
+        self.other_lawyer = User.objects.create_user(username='other', password='x', user_type='lawyer')
+        self.admin = User.objects.create_user(username='admin', password='x', user_type='admin')
+        self.cases = [create_case(self.client_user, n, assigned_lawyer=self.lawyer) for n in range(3)]
+        self.other_case = create_case(self.client_user, 3, assigned_lawyer=self.other_lawyer)
+        for case in self.cases + [self.other_case]:
+            CaseActivity.objects.create(case=case, activity_type='note_added', description='x', performed_by=self.lawyer)
+    
+    def list_activities(self, user):
+        request = APIRequestFactory().get('/api/activities/')
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = CaseActivityViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(response.status_code, 200)
+        return {activity['case'] for activity in response.data['results']}, queries
+    
+    def test_scope_is_a_sorted_id_array(self):
+        scope = CaseScope.from_ids([case.pk for case in self.cases])
+        self.assertEqual(scope.ids(), sorted(case.pk for case in self.cases))
+        self.assertIn(self.cases[1].pk, scope)
+        self.assertIn(str(self.cases[2].pk), scope)
+        self.assertNotIn(self.other_case.pk, scope)
+        self.assertNotIn('not-a-uuid', scope)
+    
+    def test_child_resources_filter_by_cached_case_ids(self):
+        case_ids, _ = self.list_activities(self.lawyer)
+        self.assertEqual(case_ids, {case.pk for case in self.cases})
+        
+        # The scope is cached now: one query for the activities, none joining cases
+        case_ids, queries = self.list_activities(self.lawyer)
+        self.assertEqual(case_ids, {case.pk for case in self.cases})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN "cases_case"', queries[0]['sql'])
+        
+        case_ids, _ = self.list_activities(self.admin)
+        self.assertEqual(len(case_ids), 4)
+    
+    @override_settings(CASE_SCOPE_MAX_IDS=2)
+    def test_large_scopes_join_through_cases(self):
+        case_ids, queries = self.list_activities(self.lawyer)
+        self.assertEqual(case_ids, {case.pk for case in self.cases})
+        self.assertIn('JOIN "cases_case"', queries[-1]['sql'])
+    
+    def test_reassignment_invalidates_both_lawyers(self):
+        self.assertEqual(len(get_case_scope(self.lawyer)), 3)
+        self.assertEqual(len(get_case_scope(self.other_lawyer)), 1)
+        
+        case = Case.objects.get(pk=self.cases[0].pk)
+        case.assigned_lawyer = self.other_lawyer
+        with self.captureOnCommitCallbacks(execute=True):
+            case.save()
+        self.assertFalse(can_see_case(self.lawyer, case.pk))
+        self.assertTrue(can_see_case(self.other_lawyer, case.pk))
+        case_ids, _ = self.list_activities(self.lawyer)
+        self.assertEqual(case_ids, {self.cases[1].pk, self.cases[2].pk})
+        
+        # Saves that keep the parties leave the cached scopes alone
+        with self.captureOnCommitCallbacks(execute=True):
+            Case.objects.get(pk=self.cases[1].pk).save()
+        with self.assertNumQueries(0):
+            get_case_scope(self.lawyer)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Case.objects.get(pk=self.cases[1].pk).delete()
+        self.assertEqual(set(get_case_scope(self.lawyer).ids()), {self.cases[2].pk})
+    
+    def test_scope_read_before_an_invalidation_is_not_served_after_it(self):
+        scope = get_case_scope(self.lawyer)
+        entry_key = f'case_scope:lawyer:{self.lawyer.pk}'
+        stale_entry = cache.get(entry_key)
+        
+        # A reader that loaded its IDs before the reassignment committed
+        # stores them after the invalidation
+        invalidate_case_scopes(self.lawyer.pk)
+        cache.set(entry_key, stale_entry)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_case_scope(self.lawyer).ids(), scope.ids())
+        with self.assertNumQueries(0):
+            get_case_scope(self.lawyer)
+
+
+class CaseSearchTests(TestCase):
+    """?search= goes through the full-text index: prefix matches, ranked, kept in step with case writes"""
+    
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='x', user_type='client')
+        self.other_client = User.objects.create_user(username='other', password='x', user_type='client')
+        self.title_match = create_case(self.client_user, 1, title='Contract dispute with supplier')
+        self.description_match = create_case(self.client_user, 2, title='Warehouse lease',
+                                             description='The lease contract was breached')
+        self.unrelated = create_case(self.client_user, 3, title='Custody hearing', description='Family matter')
+        self.other_clients = create_case(self.other_client, 4, title='Contract review')
+        self.view = CaseViewSet.as_view({'get': 'list'})
+    
+    def search(self, user=None, **params):
+        request = APIRequestFactory().get('/api/cases/', params)
+        force_authenticate(request, user=user or self.client_user)
+        response = self.view(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+    
+    def ids(self, **params):
+        return [case['id'] for case in self.search(**params)['results']]
+    
+    def test_prefix_words_ranked_within_scope(self):
+        # Title matches outrank description matches; other clients' cases stay hidden
+        self.assertEqual(self.ids(search='contr'), [str(self.title_match.pk), str(self.description_match.pk)])
+        self.assertEqual(self.ids(search='lease contract'), [str(self.description_match.pk)])
+        # Case numbers match by prefix too
+        self.assertEqual(len(self.ids(search='T00000')), 3)
+        self.assertEqual(self.ids(search='T000003'), [str(self.unrelated.pk)])
+        self.assertEqual(self.ids(search='arbitration'), [])
+        # Query syntax characters are dropped rather than interpreted
+        self.assertEqual(self.ids(search='"contr*) |'), self.ids(search='contr'))
+    
+    def test_writes_keep_the_index_in_step(self):
+        case = Case.objects.get(pk=self.unrelated.pk)
+        case.title = 'Arbitration clause'
+        case.save()
+        self.assertEqual(self.ids(search='arbitr'), [str(case.pk)])
+        self.assertEqual(self.ids(search='custody'), [])
+        
+        case.delete()
+        self.assertEqual(self.ids(search='arbitr'), [])
+    
+    def test_lawyer_search_follows_assignment(self):
+        lawyer = User.objects.create_user(username='counsel', password='x', user_type='lawyer')
+        self.assertEqual(self.ids(user=lawyer, search='contract'), [])
+        
+        for case in (self.description_match, self.other_clients):
+            case.assigned_lawyer = lawyer
+            case.save()
+        self.assertEqual(self.ids(user=lawyer, search='contract'),
+                         [str(self.other_clients.pk), str(self.description_match.pk)])
+        # Only the case text is searched, never who the parties are
+        self.assertEqual(self.ids(user=lawyer, search='lawyer'), [])
+        self.assertEqual(self.ids(search=self.client_user.pk.hex[:8]), [])
+        
+        self.other_clients.assigned_lawyer = None
+        self.other_clients.save(update_fields=['assigned_lawyer'])
+        self.assertEqual(self.ids(user=lawyer, search='contract'), [str(self.description_match.pk)])
+    
+    def test_ranked_results_page_by_cursor(self):
+        for number in range(5, 12):
+            create_case(self.client_user, number, title=f'Contract {"contract " * (number % 3)}matter')
+        first = self.search(search='contract', page_size=3)
+        pages = [first]
+        while pages[-1]['next']:
+            request = APIRequestFactory().get(pages[-1]['next'])
+            force_authenticate(request, user=self.client_user)
+            pages.append(self.view(request).data)
+        ids = [case['id'] for page in pages for case in page['results']]
+        
+        expected = get_case_search().search(Case.objects.filter(client=self.client_user), ['contract'])
+        expected = expected.order_by('-search_rank', 'priority_level', '-urgency_score', 'deadline', 'id')
+        self.assertEqual(ids, [str(pk) for pk in expected.values_list('pk', flat=True)])
+        self.assertEqual(len(ids), 9)
+    
+    def test_migration_indexes_existing_cases(self):
+        lawyer = User.objects.create_user(username='counsel', password='x', user_type='lawyer')
+        # update() sends no signal, so only the migration can index the assignment
+        Case.objects.filter(pk=self.description_match.pk).update(assigned_lawyer=lawyer)
+        migration = import_module('cases.migrations.0007_case_search')
+        statements = {
+            'sqlite': [*migration.SQLITE_UNINSTALL, *migration.SQLITE_INSTALL],
+            # setUp's deferred foreign key checks must run before the table can be altered
+            'postgresql': ['SET CONSTRAINTS ALL IMMEDIATE', *migration.POSTGRES_UNINSTALL, *migration.POSTGRES_INSTALL],
+        }[connection.vendor]
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        
+        self.assertEqual(self.ids(search='contr'), [str(self.title_match.pk), str(self.description_match.pk)])
+        self.assertEqual(self.ids(user=lawyer, search='contract'), [str(self.description_match.pk)])
+    
+    def test_fixtures_are_not_indexed_on_load(self):
+        with patch('cases.signals.index_cases') as index_cases:
+            post_save.send(sender=Case, instance=self.unrelated, created=True, raw=True, update_fields=None)
+        index_cases.assert_not_called()
+    
+    def test_backfill_command_indexes_bulk_created_cases(self):
+        Case.objects.bulk_create([
+            Case(client=self.client_user, case_number=f'BULK{n}', title=f'Imported probate file {n}',
+                 description='Imported', case_type='civil')
+            for n in range(3)
+        ])
+        out = StringIO()
+        call_command('rebuild_case_search', chunk_size=2, stdout=out)
+        self.assertIn('Indexed 7 cases', out.getvalue())
+        self.assertEqual(len(self.ids(search='probate')), 3)
+        self.assertEqual(self.ids(search='custody'), [str(self.unrelated.pk)])
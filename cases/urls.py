@@ -1,7 +1,10 @@
 from django.urls import path
+from . import views
 # from .views import get_case, create_case, get_case_id, update_case, delete_case, case_prioritization, RegisterView, LoginView, get_lawyer_details
 
 urlpatterns = [
+    path('auth/login/', views.async_login, name='login'),
+    path('auth/register/', views.async_register, name='register'),
     # Temporarily comment out all patterns until you fix your views
     # path('cases/', get_case, name='get_cases'),
     # path('cases/create/', create_case, name='create_case'),
@@ -0,0 +1,50 @@
+# utils/activity.py - Buffered CaseActivity logging
+
+
+class ActivityLog:
+    """
+    Buffers CaseActivity entries for a request or task and writes them with
+    one bulk_create when the block exits, so bulk operations cost one INSERT
+    however many cases they touch. Open it inside the transaction it audits,
+    so the entries commit or roll back with the changes and a failed insert
+    fails the whole operation:
+        
+        with transaction.atomic(), ActivityLog(performed_by=request.user) as activity_log:
+            activity_log.add(case, 'priority_changed', 'Priority set to 1')
+    """
+    
+    def __init__(self, performed_by=None, batch_size=1000):
+        self.performed_by = performed_by
+        self.batch_size = batch_size
+        self.pending = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.pending = []
+    
+    def add(self, case, activity_type, description, performed_by=None, metadata=None):
+        """Queue an entry; case and performed_by may be instances or IDs"""
+        from cases.models import CaseActivity
+        
+        performed_by = performed_by or self.performed_by
+        self.pending.append(CaseActivity(
+            case_id=getattr(case, 'pk', case),
+            activity_type=activity_type,
+            description=description,
+            performed_by_id=getattr(performed_by, 'pk', performed_by),
+            metadata=metadata or {},
+        ))
+    
+    def flush(self):
+        """Insert the queued entries now, in the current transaction"""
+        from cases.models import CaseActivity
+        
+        if not self.pending:
+            return
+        activities, self.pending = self.pending, []
+        CaseActivity.objects.bulk_create(activities, batch_size=self.batch_size)
@@ -0,0 +1,134 @@
+# utils/broadcast.py - Coalesced, after-commit case update broadcasts
+
+from django.conf import settings
+from django.db import transaction
+from channels.layers import get_channel_layer
+import asyncio
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class CaseBroadcaster:
+    """
+    Pushes case updates to the case_<id> and user_<id> groups off the
+    request path. Each update is serialized once, after the transaction
+    commits, then handed to an asyncio loop on a background thread. Updates
+    to the same case within REALTIME_COALESCE_WINDOW seconds go out as one
+    message. Messages carry the full case; each WebSocket connection turns
+    them into diffs against what it last sent its client (see
+    CaseUpdatesConsumer), so no process needs to know what another sent.
+    
+    Message ('case_update'): update_type (the latest), update_types, case_id
+    and case_data.
+    """
+    
+    def __init__(self, window=None):
+        self.window = window
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.loop = None
+        self.pid = None
+        self.send_handle = None
+        self.in_flight = set()
+    
+    def publish(self, update_type, case, serializer_class=None):
+        """Broadcast the case once the current transaction commits"""
+        transaction.on_commit(lambda: self.publish_now(update_type, case, serializer_class))
+    
+    def publish_now(self, update_type, case, serializer_class=None):
+        from cases.serializers import CaseSerializer
+        
+        try:
+            payload = dict((serializer_class or CaseSerializer)(case).data)
+        except Exception as e:
+            logger.error(f"Error serializing case {case.pk} for broadcast: {str(e)}")
+            return
+        
+        # Whoever the case belonged to when loaded hears about it leaving them
+        user_ids = {case.client_id, case.assigned_lawyer_id, *getattr(case, '_loaded_parties', ())}
+        groups = {f"case_{case.pk}"} | {f"user_{user_id}" for user_id in user_ids if user_id}
+        
+        case_id = str(case.pk)
+        with self.lock:
+            entry = self.pending.setdefault(case_id, {'update_types': [], 'groups': set()})
+            entry['update_types'].append(update_type)
+            entry['groups'] |= groups
+            entry['payload'] = payload
+        self.get_loop().call_soon_threadsafe(self.schedule_send)
+    
+    def schedule_send(self):
+        # Runs on the broadcast loop: the first update of a window starts the timer
+        if self.send_handle is None:
+            window = self.window if self.window is not None else settings.REALTIME_COALESCE_WINDOW
+            self.send_handle = self.loop.call_later(window, lambda: self.loop.create_task(self.send_pending()))
+    
+    async def send_pending(self):
+        if self.send_handle is not None:
+            self.send_handle.cancel()
+            self.send_handle = None
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        
+        messages = []
+        for case_id, entry in pending.items():
+            message = self.build_message(case_id, entry)
+            messages.extend((group, message) for group in sorted(entry['groups']))
+        await self.send_messages(messages)
+    
+    async def send_messages(self, messages):
+        channel_layer = get_channel_layer()
+        results = await asyncio.gather(
+            *[channel_layer.group_send(group, message) for group, message in messages], return_exceptions=True
+        )
+        for (group, _), result in zip(messages, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error broadcasting to {group}: {str(result)}")
+    
+    def send_soon(self, messages):
+        """Send (group, message) pairs from the broadcast loop as they are, without waiting"""
+        if not messages:
+            return
+        future = asyncio.run_coroutine_threadsafe(self.send_messages(messages), self.get_loop())
+        with self.lock:
+            self.in_flight.add(future)
+        future.add_done_callback(self.in_flight.discard)
+    
+    def build_message(self, case_id, entry):
+        """The coalesced message for a case"""
+        return {
+            'type': 'case_update',
+            'update_type': entry['update_types'][-1],
+            'update_types': entry['update_types'],
+            'case_id': case_id,
+            'case_data': entry['payload'],
+        }
+    
+    def get_loop(self):
+        """The broadcast event loop, started on first use in each process"""
+        with self.lock:
+            if self.loop is None or self.pid != os.getpid():
+                self.loop = asyncio.new_event_loop()
+                self.pid = os.getpid()
+                self.send_handle = None
+                threading.Thread(target=self.loop.run_forever, name='case-broadcast', daemon=True).start()
+            return self.loop
+    
+    def flush(self, timeout=5):
+        """Send everything pending now and wait for it (tests and shutdown)"""
+        asyncio.run_coroutine_threadsafe(self.send_pending(), self.get_loop()).result(timeout)
+        with self.lock:
+            in_flight = list(self.in_flight)
+        for future in in_flight:
+            future.result(timeout)
+
+
+_broadcaster = CaseBroadcaster()
+
+
+def get_case_broadcaster():
+    return _broadcaster
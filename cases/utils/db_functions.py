@@ -0,0 +1,42 @@
+# utils/db_functions.py - Database functions used by prioritization queries
+
+from django.db.models import Func, IntegerField
+
+MICROSECONDS_PER_DAY = 86400 * 10**6
+
+
+class DaysBetween(Func):
+    """
+    Whole days from `earlier` to `later`, rounded down like timedelta.days
+    Usage: DaysBetween(F('deadline'), Value(now, output_field=DateTimeField()))
+    """
+    arity = 2
+    output_field = IntegerField()
+    
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: timestamptz - timestamptz is an interval
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(FLOOR(EXTRACT(EPOCH FROM (%(expressions)s)) / 86400) AS integer)',
+            arg_joiner=' - ',
+            **extra_context
+        )
+    
+    def as_mysql(self, compiler, connection, **extra_context):
+        later, earlier = self.get_source_expressions()
+        later_sql, later_params = compiler.compile(later)
+        earlier_sql, earlier_params = compiler.compile(earlier)
+        sql = f'FLOOR(TIMESTAMPDIFF(MICROSECOND, {earlier_sql}, {later_sql}) / {MICROSECONDS_PER_DAY})'
+        return sql, (*earlier_params, *later_params)
+    
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # django_timestamp_diff returns integer microseconds. SQLite integer
+        # division truncates toward zero, so floor it explicitly to keep
+        # negative (overdue) values identical to timedelta.days.
+        later, earlier = self.get_source_expressions()
+        later_sql, later_params = compiler.compile(later)
+        earlier_sql, earlier_params = compiler.compile(earlier)
+        diff = f'django_timestamp_diff({later_sql}, {earlier_sql})'
+        day = MICROSECONDS_PER_DAY
+        sql = f'(({diff}) - ((({diff}) %% {day}) + {day}) %% {day}) / {day}'
+        return sql, (*later_params, *earlier_params) * 2
@@ -0,0 +1,85 @@
+# utils/hashing.py - Bounded worker pool for password hashing
+
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+import asyncio
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class HashingPoolBusy(Exception):
+    """More hashing work is queued than PASSWORD_HASHING_QUEUE_LIMIT allows"""
+
+
+class PasswordHashingPool:
+    """
+    Runs password hashing and checking on a fixed set of worker threads, so
+    async views don't block their event loop on PBKDF2. hashlib releases
+    the GIL while hashing, so the workers use separate cores. At most
+    max_pending jobs are queued or running; past that run() raises
+    HashingPoolBusy at once, letting a login burst get 503s with Retry-After
+    instead of queueing for longer than clients wait.
+    
+    Jobs may query the database (authenticate() loads the user), so each
+    job releases the worker's stale connections as a request would.
+    """
+    
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = self.workers * 4 if max_pending is None else max_pending
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hashing')
+        self.lock = threading.Lock()
+        self.pending = 0
+    
+    def acquire(self):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise HashingPoolBusy()
+            self.pending += 1
+    
+    def release(self):
+        with self.lock:
+            self.pending -= 1
+    
+    def submit(self, fn, *args, **kwargs):
+        return self.executor.submit(self.call, fn, args, kwargs)
+    
+    @staticmethod
+    def call(fn, args, kwargs):
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+    
+    async def run(self, fn, *args, **kwargs):
+        self.acquire()
+        try:
+            return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+        finally:
+            self.release()
+    
+    def run_sync(self, fn, *args, **kwargs):
+        """run() for sync views: the calling thread waits, under the same limit"""
+        self.acquire()
+        try:
+            return self.submit(fn, *args, **kwargs).result()
+        finally:
+            self.release()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """The process-wide pool for the current PASSWORD_HASHING_* settings"""
+    config = (settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE_LIMIT)
+    with _pools_lock:
+        if config not in _pools:
+            _pools[config] = PasswordHashingPool(*config)
+        return _pools[config]
@@ -0,0 +1,110 @@
+# utils/notifications.py - Batched notification fan-out
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    Collects notifications and inserts them with one bulk_create per flush,
+    so fanning out to many recipients costs a constant number of INSERTs.
+    Delivery to the recipients' WebSocket groups waits for the transaction
+    to commit, so nobody is told about a write that rolled back.
+        
+        with NotificationDispatcher(exclude=request.user) as notifications:
+            notifications.add([case.client, case.assigned_lawyer], 'case_update',
+                              'Case Status Update', message, related_case=case)
+    """
+    
+    def __init__(self, exclude=None, batch_size=500):
+        # Usually the acting user, who doesn't need telling what they just did
+        self.exclude_id = getattr(exclude, 'pk', exclude)
+        self.batch_size = batch_size
+        self.pending = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.pending = []
+    
+    def add(self, recipients, notification_type, title, message, related_case=None):
+        """Queue one notification per recipient (users or user IDs; None and duplicates are skipped); related_case may be a case or its ID"""
+        from cases.models import Notification
+        
+        if recipients is None or not isinstance(recipients, (list, tuple, set)):
+            recipients = [recipients]
+        seen = set()
+        for recipient in recipients:
+            recipient_id = getattr(recipient, 'pk', recipient)
+            if recipient_id is None or recipient_id == self.exclude_id or recipient_id in seen:
+                continue
+            seen.add(recipient_id)
+            self.pending.append(Notification(
+                recipient_id=recipient_id,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                related_case_id=getattr(related_case, 'pk', related_case),
+            ))
+    
+    def flush(self):
+        """Insert the queued notifications and schedule their delivery; returns them"""
+        from cases.models import Notification
+        
+        if not self.pending:
+            return []
+        notifications, self.pending = self.pending, []
+        Notification.objects.bulk_create(notifications, batch_size=self.batch_size)
+        transaction.on_commit(lambda: deliver_notifications(notifications))
+        return notifications
+
+
+def notification_payload(notification):
+    return {
+        'id': str(notification.id),
+        'notification_type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'related_case': str(notification.related_case_id) if notification.related_case_id else None,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def deliver_notifications(notifications):
+    """Push new notifications to each recipient's user_<id> group, one message per recipient"""
+    by_recipient = {}
+    for notification in notifications:
+        by_recipient.setdefault(notification.recipient_id, []).append(notification_payload(notification))
+    
+    channel_layer = get_channel_layer()
+    for recipient_id, payloads in by_recipient.items():
+        try:
+            async_to_sync(channel_layer.group_send)(
+                f"user_{recipient_id}",
+                {'type': 'notifications', 'notifications': payloads}
+            )
+        except Exception as e:
+            logger.error(f"Error delivering notifications to user {recipient_id}: {str(e)}")
+
+
+def send_email_notification(notification):
+    """Email a notification to its recipient, if they have an address"""
+    recipient = notification.recipient
+    if not recipient.email:
+        return False
+    try:
+        send_mail(notification.title, notification.message, settings.DEFAULT_FROM_EMAIL, [recipient.email])
+        return True
+    except Exception as e:
+        logger.error(f"Error emailing notification {notification.id}: {str(e)}")
+        return False
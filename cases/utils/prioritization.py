@@ -1,29 +1,48 @@
 # utils/prioritization.py - Case Prioritization System
 
 from django.utils import timezone
-from django.db.models import Q, F, Count, Avg, Case as DBCase, When
-from datetime import timedelta, datetime
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
 import logging
+import multiprocessing
+import threading
+import time
+import uuid
+import numpy as np
+
+from .scoring import (
+    DEFAULT_SCORER, DEFAULT_SCORING_MODEL, FACTORS, SCORING_FIELDS, SCORING_OUTPUT_FIELDS,
+    from_epoch_microsecond, to_epoch_microseconds
+)
+from .priority_feed import publish_priority_changes, publish_priority_refresh
+from .ranking import GLOBAL_SCOPE, UNASSIGNED_SCOPE, get_priority_index
+from .scoping import scope_cases
+from .stats import case_statistics
+from .summaries import apply_score_changes, get_case_summary, rebuild_case_summaries, summary_statistics
 
 logger = logging.getLogger(__name__)
 
+# Rows scored and written per transaction by the chunked update path
+PRIORITY_UPDATE_CHUNK_SIZE = 2000
+
 class CasePriorityCalculator:
-    """Advanced case prioritization system"""
+    """
+    Advanced case prioritization system
+    Evaluates a compiled ScoringModel (see utils/scoring.py) at a fixed
+    current time; Case.calculate_priority_score uses the same scorer.
+    """
     
     # Priority weights for different factors
-    PRIORITY_WEIGHTS = {
-        'deadline_urgency': 40,
-        'case_priority_level': 30,
-        'client_importance': 15,
-        'case_type_urgency': 10,
-        'activity_recency': 5
-    }
+    PRIORITY_WEIGHTS = DEFAULT_SCORING_MODEL.weights
     
-    URGENT_CASE_TYPES = [
-        'criminal', 'personal_injury', 'immigration'
-    ]
+    # Columns needed by calculate_batch_priorities, in argument order
+    BATCH_FIELDS = SCORING_FIELDS
     
-    def __init__(self):
+    def __init__(self, scorer=DEFAULT_SCORER):
+        self.scorer = scorer
         self.current_time = timezone.now()
     
     def calculate_case_priority(self, case):
@@ -31,132 +50,47 @@ class CasePriorityCalculator:
         Calculate comprehensive priority score for a case
         Returns score between 0-100 (higher = more urgent)
         """
-        score = 0
-        factors = {}
-        
-        # 1. Deadline Urgency (40% weight)
-        deadline_score = self._calculate_deadline_score(case)
-        score += deadline_score * (self.PRIORITY_WEIGHTS['deadline_urgency'] / 100)
-        factors['deadline_urgency'] = deadline_score
-        
-        # 2. Case Priority Level (30% weight)
-        priority_score = self._calculate_priority_level_score(case.priority_level)
-        score += priority_score * (self.PRIORITY_WEIGHTS['case_priority_level'] / 100)
-        factors['case_priority_level'] = priority_score
-        
-        # 3. Client Importance (15% weight)
-        client_score = self._calculate_client_importance_score(case.client_importance)
-        score += client_score * (self.PRIORITY_WEIGHTS['client_importance'] / 100)
-        factors['client_importance'] = client_score
-        
-        # 4. Case Type Urgency (10% weight)
-        type_score = self._calculate_case_type_score(case.case_type)
-        score += type_score * (self.PRIORITY_WEIGHTS['case_type_urgency'] / 100)
-        factors['case_type_urgency'] = type_score
-        
-        # 5. Activity Recency (5% weight)
-        activity_score = self._calculate_activity_score(case.last_activity)
-        score += activity_score * (self.PRIORITY_WEIGHTS['activity_recency'] / 100)
-        factors['activity_recency'] = activity_score
-        
-        # Apply status-based modifiers
-        score = self._apply_status_modifiers(score, case.status)
+        score, factor_scores = self.scorer.score_case(case, self.current_time)
         
         logger.info(f"Priority calculated for case {case.case_number}: {score:.2f}")
-        return min(100, max(0, score)), factors
+        return score, dict(zip(FACTORS, factor_scores))
     
-    def _calculate_deadline_score(self, case):
-        """Calculate score based on deadline urgency (0-100)"""
-        if not case.deadline:
-            return 20  # No deadline = medium urgency
-        
-        time_diff = case.deadline - self.current_time
-        days_remaining = time_diff.days
-        hours_remaining = time_diff.total_seconds() / 3600
-        
-        if days_remaining < 0:
-            # Overdue cases get maximum urgency
-            overdue_days = abs(days_remaining)
-            return min(100, 95 + overdue_days)  # Cap at 100
-        elif hours_remaining <= 24:
-            # Due within 24 hours
-            return 90
-        elif days_remaining <= 3:
-            # Due within 3 days
-            return 80 - (days_remaining * 5)
-        elif days_remaining <= 7:
-            # Due within a week
-            return 65 - (days_remaining * 3)
-        elif days_remaining <= 30:
-            # Due within a month
-            return 40 - (days_remaining * 1)
-        else:
-            # More than a month away
-            return max(10, 30 - (days_remaining / 10))
-    
-    def _calculate_priority_level_score(self, priority_level):
-        """Convert priority level to score (0-100)"""
-        priority_scores = {
-            1: 100,  # Critical
-            2: 80,   # High
-            3: 60,   # Medium
-            4: 40,   # Low
-            5: 20    # Routine
-        }
-        return priority_scores.get(priority_level, 60)
+    def calculate_next_recheck(self, case):
+        """
+        Next time the case's score changes without any edit to the case:
+        the earliest deadline or last_activity band crossing (None if never)
+        """
+        return self.scorer.next_recheck(case.deadline, case.last_activity, self.current_time)
     
-    def _calculate_client_importance_score(self, client_importance):
-        """Calculate score based on client importance (0-100)"""
-        if not client_importance:
-            return 50
-        
-        # Convert 1-5 scale to 0-100 scale
-        return (client_importance - 1) * 25
-    
-    def _calculate_case_type_score(self, case_type):
-        """Calculate score based on case type urgency (0-100)"""
-        if case_type in self.URGENT_CASE_TYPES:
-            return 80
-        elif case_type in ['family', 'property']:
-            return 60
-        elif case_type in ['civil', 'corporate']:
-            return 40
-        else:
-            return 30
-    
-    def _calculate_activity_score(self, last_activity):
-        """Calculate score based on recent activity (0-100)"""
-        if not last_activity:
-            return 0
-        
-        days_since_activity = (self.current_time - last_activity).days
-        
-        if days_since_activity == 0:
-            return 100
-        elif days_since_activity <= 3:
-            return 80
-        elif days_since_activity <= 7:
-            return 60
-        elif days_since_activity <= 14:
-            return 40
-        elif days_since_activity <= 30:
-            return 20
-        else:
-            return 0  # Stale cases get lower priority
-    
-    def _apply_status_modifiers(self, base_score, status):
-        """Apply status-based score modifiers"""
-        status_modifiers = {
-            'filed': 1.1,        # New cases get slight boost
-            'investigation': 1.0,  # Normal priority
-            'hearing': 1.2,       # Hearing cases are more urgent
-            'trial': 1.3,         # Trial cases are most urgent
-            'on_hold': 0.5,       # On hold cases get reduced priority
-            'closed': 0.1         # Closed cases get minimal priority
-        }
+    def priority_score_expression(self):
+        """
+        calculate_case_priority as a Django ORM expression over cases_case
+        columns, so scores can be computed by annotate() or written by update()
+        without loading rows into Python
+        """
+        return self.scorer.score_expression(self.current_time)
+    
+    def calculate_batch_priorities(self, deadlines, priority_levels, client_importances,
+                                   case_types, last_activities, statuses):
+        """
+        Vectorized calculate_case_priority for many cases at once.
+        Each argument is a sequence with one entry per case (see BATCH_FIELDS).
+        Returns (scores, factors) as NumPy arrays; scores match the per-case path exactly.
+        """
+        scores, factors = self.scorer.score_arrays(
+            deadlines, priority_levels, client_importances,
+            case_types, last_activities, statuses, self.current_time
+        )
         
-        modifier = status_modifiers.get(status, 1.0)
-        return base_score * modifier
+        logger.info(f"Batch priority calculated for {len(scores)} cases")
+        return scores, factors
+    
+    def calculate_batch_rechecks(self, deadlines, last_activities):
+        """
+        Vectorized calculate_next_recheck
+        Returns int64 epoch microseconds and a mask of cases that have a crossing
+        """
+        return self.scorer.next_recheck_arrays(deadlines, last_activities, self.current_time)
 
 class CasePriorityManager:
     """Manage case prioritization across the system"""
@@ -169,7 +103,9 @@ class CasePriorityManager:
         try:
             score, factors = self.calculator.calculate_case_priority(case)
             case.urgency_score = score
-            case.save(update_fields=['urgency_score'])
+            case.priority_dirty = False
+            case.priority_recheck_at = self.calculator.calculate_next_recheck(case)
+            case.save(update_fields=SCORING_OUTPUT_FIELDS)
             
             logger.info(f"Updated priority for case {case.case_number}: {score}")
             return score, factors
@@ -178,15 +114,23 @@ class CasePriorityManager:
             logger.error(f"Error updating priority for case {case.case_number}: {e}")
             return None, {}
     
-    def bulk_update_priorities(self, cases_queryset):
-        """Update priorities for multiple cases efficiently"""
+    def bulk_update_priorities(self, cases_queryset, chunk_size=None):
+        """
+        Update priorities for multiple cases efficiently
+        Pass chunk_size to use the chunked batch path (see stream_update_priorities)
+        """
+        if chunk_size:
+            return self.stream_update_priorities(cases_queryset, chunk_size)['written']
+        
         updated_count = 0
         
         for case in cases_queryset.select_related('client'):
             try:
                 score, _ = self.calculator.calculate_case_priority(case)
                 case.urgency_score = score
-                case.save(update_fields=['urgency_score'])
+                case.priority_dirty = False
+                case.priority_recheck_at = self.calculator.calculate_next_recheck(case)
+                case.save(update_fields=SCORING_OUTPUT_FIELDS)
                 updated_count += 1
                 
             except Exception as e:
@@ -196,22 +140,133 @@ class CasePriorityManager:
         logger.info(f"Updated priorities for {updated_count} cases")
         return updated_count
     
-    def get_prioritized_cases(self, user, limit=None):
-        """Get cases ordered by priority for a specific user"""
-        from cases.models import Case  # Import here to avoid circular import
+    def stream_update_priorities(self, cases_queryset, chunk_size=PRIORITY_UPDATE_CHUNK_SIZE, chunk_lock=None):
+        """
+        Rescore a queryset in primary-key ordered chunks using the batch scorer.
+        Each chunk is read and written back with one bulk_update inside one
+        transaction. Only rows whose score changed, or whose dirty flag or
+        recheck time needs updating, are written.
+        chunk_lock, if given, is held around each chunk's transaction.
+        Returns counts of rows scanned, changed (score) and written.
+        """
+        from cases.models import Case
+        
+        stats = {'scanned': 0, 'changed': 0, 'written': 0}
+        columns = (
+            'pk', 'urgency_score', 'priority_dirty', 'priority_recheck_at', 'client_id', 'assigned_lawyer_id'
+        ) + self.calculator.BATCH_FIELDS
+        rows_queryset = cases_queryset.order_by('pk').values_list(*columns)
+        last_pk = None
+        
+        while True:
+            chunk_queryset = rows_queryset if last_pk is None else rows_queryset.filter(pk__gt=last_pk)
+            
+            # Lock the chunk so an edit that lands mid-chunk re-marks the row
+            # dirty after this transaction instead of being cleared by it
+            with chunk_lock or nullcontext(), transaction.atomic():
+                chunk = list(chunk_queryset.select_for_update()[:chunk_size])
+                if not chunk:
+                    break
+                last_pk = chunk[-1][0]
+                
+                pks, current_scores, dirty, current_rechecks, client_ids, lawyer_ids, *scoring_columns = zip(*chunk)
+                scoring = dict(zip(self.calculator.BATCH_FIELDS, scoring_columns))
+                scores, _ = self.calculator.calculate_batch_priorities(*scoring_columns)
+                rechecks, has_recheck = self.calculator.calculate_batch_rechecks(
+                    scoring['deadline'], scoring['last_activity']
+                )
+                current_rechecks_us, has_current_recheck = to_epoch_microseconds(current_rechecks)
+                
+                score_changed = scores != np.asarray(current_scores, dtype=float)
+                recheck_changed = (has_recheck != has_current_recheck) | (
+                    has_recheck & (rechecks != current_rechecks_us)
+                )
+                to_write = np.flatnonzero(score_changed | recheck_changed | np.asarray(dirty, dtype=bool))
+                
+                stats['scanned'] += len(chunk)
+                stats['changed'] += int(score_changed.sum())
+                
+                if len(to_write):
+                    updates = [
+                        Case(
+                            pk=pks[i],
+                            urgency_score=float(scores[i]),
+                            priority_dirty=False,
+                            priority_recheck_at=(
+                                from_epoch_microsecond(rechecks[i]) if has_recheck[i] else None
+                            ),
+                        )
+                        for i in to_write
+                    ]
+                    stats['written'] += Case.objects.bulk_update(updates, SCORING_OUTPUT_FIELDS)
+                
+                index_entries = [
+                    {
+                        'id': pks[i],
+                        'urgency_score': float(scores[i]),
+                        'status': scoring['status'][i],
+                        'deadline': scoring['deadline'][i],
+                        'client_id': client_ids[i],
+                        'assigned_lawyer_id': lawyer_ids[i],
+                        'priority_level': scoring['priority_level'][i],
+                    }
+                    for i in np.flatnonzero(score_changed)
+                ]
+                if index_entries:
+                    transaction.on_commit(lambda entries=index_entries: self._update_index(entries))
+                    # bulk_update skips the Case signals, so move the summaries' urgency here
+                    apply_score_changes(
+                        (client_ids[i], lawyer_ids[i], current_scores[i], float(scores[i]))
+                        for i in np.flatnonzero(score_changed)
+                    )
+        
+        logger.info(
+            f"Chunked priority update: {stats['scanned']} scanned, "
+            f"{stats['changed']} changed, {stats['written']} written"
+        )
+        return stats
+    
+    def _update_index(self, entries):
+        try:
+            get_priority_index().update_cases(entries)
+        except Exception as e:
+            logger.error(f"Error updating priority index: {str(e)}")
+        publish_priority_changes(
+            (entry['id'], entry['priority_level'], entry['urgency_score'],
+             (entry['client_id'], entry['assigned_lawyer_id']))
+            for entry in entries
+        )
+    
+    def update_priorities_in_database(self, cases_queryset):
+        """
+        Rescore a queryset with a single UPDATE using priority_score_expression
+        Dirty flags and recheck times are left alone for the incremental path
+        """
+        updated_count = cases_queryset.order_by().update(
+            urgency_score=self.calculator.priority_score_expression()
+        )
         
+        logger.info(f"Updated priorities in database for {updated_count} cases")
+        return updated_count
+    
+    def get_prioritized_cases(self, user, limit=None, live_score=False):
+        """
+        Get cases ordered by priority for a specific user
+        With live_score, sort by a score computed in the query instead of
+        the stored urgency_score (annotated as live_urgency_score)
+        """
         # Get user's cases
-        if user.user_type == 'lawyer':
-            cases = Case.objects.filter(assigned_lawyer=user)
-        elif user.user_type == 'client':
-            cases = Case.objects.filter(client=user)
-        else:  # admin
-            cases = Case.objects.all()
+        cases = scope_cases(user)
         
         # Order by priority
+        score_field = 'urgency_score'
+        if live_score:
+            cases = cases.annotate(live_urgency_score=self.calculator.priority_score_expression())
+            score_field = 'live_urgency_score'
+        
         prioritized_cases = cases.order_by(
             'priority_level',
-            '-urgency_score',
+            f'-{score_field}',
             'deadline'
         ).select_related('client', 'assigned_lawyer')
         
@@ -234,62 +289,251 @@ class CasePriorityManager:
         """Get all overdue cases"""
         from cases.models import Case
         
+        # The redundant closed exclusion lets planners use the partial
+        # case_active_deadline_idx (SQLite can't infer it from the IN list)
         return Case.objects.filter(
             deadline__lt=timezone.now(),
             status__in=['filed', 'investigation', 'hearing', 'trial']
-        ).order_by('deadline')
+        ).exclude(status='closed').order_by('deadline')
+    
+    def _load_in_order(self, case_ids):
+        from cases.models import Case
+        
+        # Index members are string IDs; cases deleted since they were read drop out
+        cases = {str(pk): case for pk, case in Case.objects.in_bulk(case_ids).items()}
+        return [cases[case_id] for case_id in case_ids if case_id in cases]
+    
+    def get_top_urgent_cases(self, limit=10, urgency_threshold=70, scope=GLOBAL_SCOPE):
+        """
+        Most urgent non-closed cases in a scope (see utils/ranking.py), read
+        from the priority index; falls back to get_urgent_cases while the
+        index isn't built or on index errors
+        """
+        try:
+            index = get_priority_index()
+            if index.is_built():
+                return self._load_in_order(index.top_urgent(scope, limit, urgency_threshold))
+        except Exception as e:
+            logger.error(f"Priority index unavailable, querying urgent cases: {str(e)}")
+        return list(self._scope_queryset(self.get_urgent_cases(urgency_threshold), scope)[:limit])
+    
+    def get_next_overdue_cases(self, limit=10, scope=GLOBAL_SCOPE):
+        """Earliest overdue cases in a scope, read from the priority index once it's built"""
+        try:
+            index = get_priority_index()
+            if index.is_built():
+                return self._load_in_order(index.next_deadlines(scope, limit, before=timezone.now()))
+        except Exception as e:
+            logger.error(f"Priority index unavailable, querying overdue cases: {str(e)}")
+        return list(self._scope_queryset(self.get_overdue_cases(), scope)[:limit])
+    
+    def _scope_queryset(self, cases_queryset, scope):
+        if scope == GLOBAL_SCOPE:
+            return cases_queryset
+        if scope == UNASSIGNED_SCOPE:
+            return cases_queryset.filter(assigned_lawyer__isnull=True)
+        kind, owner_id = scope.split(':', 1)
+        if kind == 'lawyer':
+            return cases_queryset.filter(assigned_lawyer_id=owner_id)
+        return cases_queryset.filter(client_id=owner_id)
     
     def get_priority_statistics(self, user=None):
         """Get priority-related statistics"""
         from cases.models import Case
         
         # Filter cases based on user
-        if user:
-            if user.user_type == 'lawyer':
-                cases = Case.objects.filter(assigned_lawyer=user)
-            elif user.user_type == 'client':
-                cases = Case.objects.filter(client=user)
-            else:
-                cases = Case.objects.all()
-        else:
-            cases = Case.objects.all()
+        cases = scope_cases(user) if user else Case.objects.all()
         
-        # Calculate statistics
+        # Lawyers and clients have a case summary (utils/summaries.py);
+        # everything else is one conditional aggregate query (utils/stats.py)
+        summary = get_case_summary(user) if user else None
+        counts = summary_statistics(summary) if summary is not None else case_statistics(cases)
         stats = {
-            'total_cases': cases.count(),
-            'critical_cases': cases.filter(priority_level=1).count(),
-            'high_priority_cases': cases.filter(priority_level=2).count(),
-            'overdue_cases': cases.filter(deadline__lt=timezone.now()).count(),
-            'due_this_week': cases.filter(
-                deadline__gte=timezone.now(),
-                deadline__lte=timezone.now() + timedelta(days=7)
-            ).count(),
-            'urgent_cases': cases.filter(urgency_score__gte=70).count(),
-            'average_urgency_score': cases.aggregate(
-                avg_score=Avg('urgency_score')
-            )['avg_score'] or 0,
-            'cases_by_status': dict(
-                cases.values('status').annotate(
-                    count=Count('status')
-                ).values_list('status', 'count')
-            )
+            'total_cases': counts['total_cases'],
+            'critical_cases': counts['cases_by_priority']['priority_1'],
+            'high_priority_cases': counts['cases_by_priority']['priority_2'],
+            'overdue_cases': counts['overdue_cases'],
+            'due_this_week': counts['due_this_week'],
+            'urgent_cases': counts['urgent_cases'],
+            'average_urgency_score': counts['average_urgency_score'],
+            'cases_by_status': {
+                status: count for status, count in counts['cases_by_status'].items() if count
+            }
         }
         
         return stats
 
-def schedule_priority_updates():
+def stale_case_filter(now=None):
+    """Q matching active cases that were edited since scoring or crossed a score threshold"""
+    now = now or timezone.now()
+    return ~Q(status='closed') & (Q(priority_dirty=True) | Q(priority_recheck_at__lte=now))
+
+def get_stale_cases(cases_queryset, now=None):
+    """Active cases that were edited since scoring or crossed a score threshold"""
+    return cases_queryset.filter(stale_case_filter(now))
+
+# Background rescoring for read endpoints that must not write inline
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='priority-refresh')
+_pending_refreshes = set()
+_pending_lock = threading.Lock()
+
+def queue_priority_refresh(cases_queryset, key=None):
+    """
+    Rescore the stale cases of a queryset on a background thread after the
+    current transaction commits. Requests with a key that is already queued
+    are coalesced. Returns False if the refresh was coalesced.
+    """
+    if key is not None:
+        with _pending_lock:
+            if key in _pending_refreshes:
+                return False
+            _pending_refreshes.add(key)
+    
+    def refresh():
+        try:
+            CasePriorityManager().stream_update_priorities(get_stale_cases(cases_queryset))
+        except Exception as e:
+            logger.error(f"Error in background priority refresh {key}: {e}")
+        finally:
+            with _pending_lock:
+                _pending_refreshes.discard(key)
+            connection.close()
+    
+    transaction.on_commit(lambda: _refresh_executor.submit(refresh))
+    return True
+
+def mark_cases_dirty(cases_queryset):
+    """Flag cases for rescoring after changes made without Case.save()"""
+    return cases_queryset.update(priority_dirty=True)
+
+def shard_bounds(shards):
+    """
+    Split the UUID primary-key space into equal [low, high) ranges; uuid4
+    keys are uniform, so each shard gets about the same number of cases.
+    The first low and last high are None (unbounded).
+    """
+    edges = [uuid.UUID(int=(2 ** 128) * n // shards) for n in range(1, shards)]
+    return list(zip([None] + edges, edges + [None]))
+
+# Held by parallel rescoring workers around each chunk when the database
+# (SQLite) allows only one writer at a time
+_shard_write_lock = None
+
+def _init_shard_worker(write_lock):
+    global _shard_write_lock
+    _shard_write_lock = write_lock
+
+def _rescore_shard(shard, low, high, now, full_sweep, chunk_size, in_pool=True):
+    """Rescore the active cases with low <= pk < high; runs in a pool worker"""
+    from cases.models import Case
+    
+    started = time.perf_counter()
+    try:
+        manager = CasePriorityManager()
+        manager.calculator.current_time = now
+        
+        cases = Case.objects.exclude(status='closed')
+        if not full_sweep:
+            cases = get_stale_cases(cases, now)
+        if low is not None:
+            cases = cases.filter(pk__gte=low)
+        if high is not None:
+            cases = cases.filter(pk__lt=high)
+        
+        stats = manager.stream_update_priorities(cases, chunk_size, chunk_lock=_shard_write_lock)
+    finally:
+        if in_pool:
+            # Pool workers outlive the task; don't leave their connection idle
+            connections.close_all()
+    
+    return {
+        'shard': shard,
+        'low': str(low) if low else None,
+        'high': str(high) if high else None,
+        **stats,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+def parallel_update_priorities(workers, full_sweep=False, chunk_size=PRIORITY_UPDATE_CHUNK_SIZE, now=None):
+    """
+    Rescore active cases in `workers` PK-range shards on a process pool.
+    Every worker scores at the same `now` and writes through its own
+    connection. On SQLite the workers share a lock so one chunk is written
+    at a time; PostgreSQL takes the writes in parallel.
+    
+    Shards run in-process, one after another, when child processes couldn't
+    see the data: inside an open transaction or on an in-memory SQLite DB.
+    
+    Returns the summed counts plus per-shard results ordered by shard.
+    """
+    now = now or timezone.now()
+    tasks = [
+        (shard, low, high, now, full_sweep, chunk_size)
+        for shard, (low, high) in enumerate(shard_bounds(workers))
+    ]
+    
+    if connection.in_atomic_block or (connection.vendor == 'sqlite' and connection.is_in_memory_db()):
+        logger.info("Rescoring shards in-process (open transaction or in-memory database)")
+        shards = [_rescore_shard(*task, in_pool=False) for task in tasks]
+    else:
+        context = multiprocessing.get_context('fork')
+        write_lock = context.Lock() if connection.vendor == 'sqlite' else None
+        # Forked workers must open their own connections, not share ours
+        connections.close_all()
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_shard_worker,
+                                 initargs=(write_lock,)) as pool:
+            shards = list(pool.map(_rescore_shard, *zip(*tasks)))
+    
+    shards.sort(key=lambda result: result['shard'])
+    totals = {key: sum(result[key] for result in shards) for key in ('scanned', 'changed', 'written')}
+    for result in shards:
+        logger.info(
+            f"Shard {result['shard']}: {result['scanned']} scanned, "
+            f"{result['written']} written in {result['seconds']}s"
+        )
+    return {**totals, 'shards': shards}
+
+def schedule_priority_updates(strategy='batch', full_sweep=False, workers=None):
     """
     Function to be called by Celery task scheduler
-    Updates priorities for all active cases
+    Updates priorities for active cases
+    strategy: 'batch' scores chunks in Python, 'database' runs one UPDATE
+    The batch strategy only rescores stale cases (see get_stale_cases)
+    unless full_sweep is set; the database strategy always sweeps.
+    workers > 1 spreads the batch strategy over a process pool
+    (see parallel_update_priorities).
     """
     from cases.models import Case
     
     manager = CasePriorityManager()
     
+    if strategy != 'database' and workers and workers > 1:
+        result = parallel_update_priorities(workers, full_sweep, now=manager.calculator.current_time)
+        logger.info(
+            f"Scheduled priority update completed: {result['written']} cases updated "
+            f"by {workers} workers"
+        )
+        return result['written']
+    
     # Only update active cases (not closed)
     active_cases = Case.objects.exclude(status='closed')
+    if strategy != 'database' and not full_sweep:
+        active_cases = get_stale_cases(active_cases, manager.calculator.current_time)
     
-    updated_count = manager.bulk_update_priorities(active_cases)
+    if strategy == 'database':
+        updated_count = manager.update_priorities_in_database(active_cases)
+        # A bare UPDATE bypasses the index hooks, so repopulate it
+        try:
+            get_priority_index().rebuild()
+        except Exception as e:
+            logger.error(f"Error rebuilding priority index: {str(e)}")
+        # and the case summaries' urgency totals, and have open priority feeds recheck
+        rebuild_case_summaries()
+        publish_priority_refresh()
+    else:
+        updated_count = manager.bulk_update_priorities(
+            active_cases, chunk_size=PRIORITY_UPDATE_CHUNK_SIZE
+        )
     
     logger.info(f"Scheduled priority update completed: {updated_count} cases updated")
     return updated_count
@@ -303,7 +547,7 @@ def identify_urgent_actions():
     actions = []
     
     # Overdue cases
-    overdue_cases = manager.get_overdue_cases()[:10]  # Limit to top 10
+    overdue_cases = manager.get_next_overdue_cases(limit=10)  # Limit to top 10
     for case in overdue_cases:
         actions.append({
             'type': 'overdue',
@@ -314,7 +558,7 @@ def identify_urgent_actions():
         })
     
     # High urgency cases without lawyers
-    unassigned_urgent = manager.get_urgent_cases().filter(assigned_lawyer__isnull=True)[:5]
+    unassigned_urgent = manager.get_top_urgent_cases(limit=5, scope=UNASSIGNED_SCOPE)
     for case in unassigned_urgent:
         actions.append({
             'type': 'unassigned_urgent',
@@ -329,7 +573,7 @@ def identify_urgent_actions():
     stale_cases = Case.objects.filter(
         last_activity__lt=timezone.now() - timedelta(days=14),
         status__in=['filed', 'investigation']
-    ).order_by('-urgency_score')[:5]
+    ).exclude(status='closed').order_by('-urgency_score')[:5]  # walks case_active_urgency_idx
     
     for case in stale_cases:
         actions.append({
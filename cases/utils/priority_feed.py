@@ -0,0 +1,198 @@
+# utils/priority_feed.py - Rank and score deltas for a user's prioritized case window
+
+from django.conf import settings
+from django.core.cache import cache
+import logging
+import secrets
+
+from .scoping import scope_cases
+
+logger = logging.getLogger(__name__)
+
+FEED_CACHE_PREFIX = 'priority_feed:'
+# Admins watch every case; everyone else the group of each user a case belongs to
+ALL_CASES_GROUP = 'priorities_all'
+# Sweeps that rescore without saying which cases moved ask every feed to recheck
+REFRESH_GROUP = 'priorities_refresh'
+MAX_WINDOW = 100
+
+# prioritized_cases order, with the pk so equal keys keep a stable rank
+PRIORITY_ORDERING = ('priority_level', '-urgency_score', 'deadline', 'id')
+
+
+def user_feed_group(user_id):
+    return f'priorities_user_{user_id}'
+
+
+def feed_group_for(user):
+    if user.user_type in ('lawyer', 'client'):
+        return user_feed_group(user.pk)
+    return ALL_CASES_GROUP
+
+
+def publish_priority_changes(changes):
+    """
+    Tell the feeds watching these cases that they moved, after commit.
+    changes are (case_id, priority_level, urgency_score, user_ids) with
+    priority_level None for a deleted case; user_ids are everyone the case
+    belongs or belonged to.
+    """
+    from .broadcast import get_case_broadcaster
+    
+    by_group = {}
+    for case_id, priority_level, urgency_score, user_ids in changes:
+        change = [str(case_id), priority_level, None if urgency_score is None else float(urgency_score)]
+        for group in [ALL_CASES_GROUP] + [user_feed_group(user_id) for user_id in set(user_ids) if user_id]:
+            by_group.setdefault(group, []).append(change)
+    try:
+        get_case_broadcaster().send_soon([
+            (group, {'type': 'priority_changes', 'cases': cases}) for group, cases in by_group.items()
+        ])
+    except Exception as e:
+        logger.error(f"Error publishing priority changes: {str(e)}")
+
+
+def publish_priority_refresh():
+    """Have every feed recompute its window (after a sweep that doesn't track moves)"""
+    from .broadcast import get_case_broadcaster
+    
+    try:
+        get_case_broadcaster().send_soon([(REFRESH_GROUP, {'type': 'priority_changes', 'cases': [], 'refresh': True})])
+    except Exception as e:
+        logger.error(f"Error publishing priority refresh: {str(e)}")
+
+
+def window_delta(old_rows, new_rows, offset):
+    """Entries whose rank, level or score changed, and IDs that left the window"""
+    old_positions = {row[0]: (rank, row) for rank, row in enumerate(old_rows, offset + 1)}
+    changed = [
+        {'id': row[0], 'rank': rank, 'priority_level': row[1], 'urgency_score': row[2]}
+        for rank, row in enumerate(new_rows, offset + 1)
+        if old_positions.get(row[0]) != (rank, row)
+    ]
+    new_ids = {row[0] for row in new_rows}
+    removed = [row[0] for row in old_rows if row[0] not in new_ids]
+    return changed, removed
+
+
+class PriorityFeed:
+    """
+    One subscriber's window (offset, limit) of the prioritized case list.
+    start() sends a snapshot, refresh() a delta of ranks and scores when the
+    window changed. The rows behind the last two versions are cached under
+    the resume token for PRIORITY_FEED_RESUME_TTL seconds, so a client that
+    reconnects with its token and last applied version gets a delta instead
+    of a reload, even if the final message before the drop never arrived.
+    """
+    
+    def __init__(self, user, offset=0, limit=25):
+        self.user = user
+        self.offset = offset
+        self.limit = min(max(limit, 1), MAX_WINDOW)
+        self.token = None
+        self.version = 0
+        self.rows = []
+        self.previous_rows = None
+    
+    def load_rows(self):
+        rows = scope_cases(self.user).order_by(*PRIORITY_ORDERING).values_list(
+            'id', 'priority_level', 'urgency_score'
+        )[self.offset:self.offset + self.limit]
+        return [[str(case_id), priority_level, urgency_score] for case_id, priority_level, urgency_score in rows]
+    
+    def cache_key(self, token):
+        return f'{FEED_CACHE_PREFIX}{token}'
+    
+    def save_state(self):
+        state = {
+            'user': str(self.user.pk),
+            'window': [self.offset, self.limit],
+            'version': self.version,
+            'rows': {self.version: self.rows},
+        }
+        if self.previous_rows is not None:
+            state['rows'][self.version - 1] = self.previous_rows
+        try:
+            cache.set(self.cache_key(self.token), state, settings.PRIORITY_FEED_RESUME_TTL)
+        except Exception as e:
+            logger.error(f"Error saving priority feed state: {str(e)}")
+    
+    def load_state(self, token):
+        try:
+            state = cache.get(self.cache_key(token))
+        except Exception as e:
+            logger.error(f"Error reading priority feed state: {str(e)}")
+            return None
+        if not state or state['user'] != str(self.user.pk) or state['window'] != [self.offset, self.limit]:
+            return None
+        return state
+    
+    def start(self, resume_token=None, version=None):
+        """The first message: a delta from the client's version when resumable, else a snapshot"""
+        state = self.load_state(resume_token) if resume_token else None
+        if state is not None and version in state['rows']:
+            self.token = resume_token
+            self.version = state['version']
+            self.rows = state['rows'][self.version]
+            self.previous_rows = state['rows'].get(self.version - 1)
+            base_rows = state['rows'][version]
+            self.update_rows()
+            # Resuming restarts the token's lifetime
+            self.save_state()
+            changed, removed = window_delta(base_rows, self.rows, self.offset)
+            return self.delta_message(changed, removed, base_version=version)
+        
+        self.token = secrets.token_urlsafe(16)
+        self.version = 1
+        self.rows = self.load_rows()
+        self.previous_rows = None
+        self.save_state()
+        return {
+            'type': 'snapshot',
+            'resume_token': self.token,
+            'version': self.version,
+            'offset': self.offset,
+            'cases': window_delta([], self.rows, self.offset)[0],
+        }
+    
+    def update_rows(self):
+        """Reload the window; returns the delta from the previous rows, saving a new version if any"""
+        rows = self.load_rows()
+        changed, removed = window_delta(self.rows, rows, self.offset)
+        if changed or removed:
+            self.previous_rows, self.rows = self.rows, rows
+            self.version += 1
+            self.save_state()
+        return changed, removed
+    
+    def refresh(self):
+        """A delta message if the window changed, else None"""
+        changed, removed = self.update_rows()
+        if not changed and not removed:
+            return None
+        return self.delta_message(changed, removed, base_version=self.version - 1)
+    
+    def delta_message(self, changed, removed, base_version):
+        return {
+            'type': 'delta',
+            'resume_token': self.token,
+            'version': self.version,
+            'base_version': base_version,
+            'changed': changed,
+            'removed': removed,
+        }
+    
+    def is_relevant(self, changes):
+        """Whether a priority_changes event could move this window"""
+        if self.offset or len(self.rows) < self.limit:
+            # Cases moving anywhere above an offset window shift it; a short
+            # window takes any case
+            return True
+        ids = {row[0] for row in self.rows}
+        _, last_level, last_score = self.rows[-1]
+        for case_id, priority_level, urgency_score in changes:
+            if case_id in ids:
+                return True
+            if priority_level is not None and (priority_level, -urgency_score) <= (last_level, -last_score):
+                return True
+        return False
@@ -0,0 +1,304 @@
+# utils/ranking.py - Maintained top-K priority index for urgent case queries
+
+from django.conf import settings
+from bisect import bisect_left, insort
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Statuses whose deadlines count as "overdue" (matches get_overdue_cases)
+DEADLINE_STATUSES = ['filed', 'investigation', 'hearing', 'trial']
+
+GLOBAL_SCOPE = 'global'
+UNASSIGNED_SCOPE = 'unassigned'
+
+# Case columns the index needs, see PriorityIndex.update_cases
+INDEX_FIELDS = ('id', 'urgency_score', 'status', 'deadline', 'client_id', 'assigned_lawyer_id')
+
+# Written by PriorityIndex.rebuild; bump it when entry_keys changes so
+# readers ignore an index built with the old layout until it's rebuilt
+INDEX_VERSION = '1'
+
+
+def lawyer_scope(lawyer_id):
+    return f'lawyer:{lawyer_id}'
+
+
+def client_scope(client_id):
+    return f'client:{client_id}'
+
+
+class MemorySortedSetBackend:
+    """
+    In-process sorted sets (a dict plus a bisect-sorted list per key)
+    For tests and single-process development servers
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+    
+    def clear(self):
+        self.sets = {}
+        self.memberships = {}
+        self.version = None
+    
+    def get_version(self):
+        return self.version
+    
+    def set_version(self, version):
+        self.version = version
+    
+    def get_memberships(self, members):
+        return [self.memberships.get(member) for member in members]
+    
+    def apply(self, removals, additions, memberships):
+        with self.lock:
+            for key, member in removals:
+                self._remove(key, member)
+            for key, member, score in additions:
+                self._remove(key, member)
+                scores, order = self.sets.setdefault(key, ({}, []))
+                scores[member] = score
+                insort(order, (score, member))
+            for member, keys in memberships.items():
+                if keys:
+                    self.memberships[member] = keys
+                else:
+                    self.memberships.pop(member, None)
+    
+    def _remove(self, key, member):
+        if key not in self.sets:
+            return
+        scores, order = self.sets[key]
+        if member in scores:
+            score = scores.pop(member)
+            del order[bisect_left(order, (score, member))]
+    
+    def range_desc(self, key, min_score, limit):
+        result = []
+        with self.lock:
+            for score, member in reversed(self.sets.get(key, ({}, []))[1]):
+                if len(result) >= limit or score < min_score:
+                    break
+                result.append(member)
+        return result
+    
+    def range_asc(self, key, max_score, limit):
+        result = []
+        with self.lock:
+            for score, member in self.sets.get(key, ({}, []))[1]:
+                if len(result) >= limit or score > max_score:
+                    break
+                result.append(member)
+        return result
+    
+    def members(self, key):
+        return dict(self.sets.get(key, ({}, []))[0])
+    
+    def keys(self):
+        return [key for key, (scores, _) in self.sets.items() if scores]
+
+
+class RedisSortedSetBackend:
+    """Redis sorted sets (skip lists) shared by every web and worker process"""
+    PREFIX = 'priority_index:'
+    MEMBERSHIP_KEY = PREFIX + 'memberships'
+    VERSION_KEY = PREFIX + 'version'
+    
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.redis = get_redis_connection('default')
+    
+    def clear(self):
+        keys = list(self.redis.scan_iter(match=self.PREFIX + '*'))
+        if keys:
+            self.redis.delete(*keys)
+    
+    def get_version(self):
+        version = self.redis.get(self.VERSION_KEY)
+        return version.decode() if version else None
+    
+    def set_version(self, version):
+        self.redis.set(self.VERSION_KEY, version)
+    
+    def get_memberships(self, members):
+        if not members:
+            return []
+        return [
+            value.decode() if value else None
+            for value in self.redis.hmget(self.MEMBERSHIP_KEY, members)
+        ]
+    
+    def apply(self, removals, additions, memberships):
+        pipe = self.redis.pipeline(transaction=True)
+        for key, member in removals:
+            pipe.zrem(self.PREFIX + key, member)
+        for key, member, score in additions:
+            pipe.zadd(self.PREFIX + key, {member: score})
+        for member, keys in memberships.items():
+            if keys:
+                pipe.hset(self.MEMBERSHIP_KEY, member, keys)
+            else:
+                pipe.hdel(self.MEMBERSHIP_KEY, member)
+        pipe.execute()
+    
+    def range_desc(self, key, min_score, limit):
+        members = self.redis.zrevrangebyscore(self.PREFIX + key, '+inf', min_score, start=0, num=limit)
+        return [member.decode() for member in members]
+    
+    def range_asc(self, key, max_score, limit):
+        members = self.redis.zrangebyscore(self.PREFIX + key, '-inf', max_score, start=0, num=limit)
+        return [member.decode() for member in members]
+    
+    def members(self, key):
+        return {
+            member.decode(): score
+            for member, score in self.redis.zrange(self.PREFIX + key, 0, -1, withscores=True)
+        }
+    
+    def keys(self):
+        return [
+            key.decode()[len(self.PREFIX):]
+            for key in self.redis.scan_iter(match=self.PREFIX + '*')
+            if key.decode() not in (self.MEMBERSHIP_KEY, self.VERSION_KEY)
+        ]
+
+
+class PriorityIndex:
+    """
+    Sorted sets of active cases per scope (global, per lawyer, per client and
+    unassigned) so "top K urgent" and "next K overdue" are O(log N + K) reads
+    instead of filtered sorts over cases_case.
+    
+    urgency:<scope>  non-closed cases scored by urgency_score
+    deadline:<scope> cases in DEADLINE_STATUSES scored by deadline timestamp
+    
+    Kept current by Case signals and the batch rescoring path; rebuild() and
+    check() back the rebuild_priority_index management command. rebuild()
+    marks the index with INDEX_VERSION once it's full; readers check
+    is_built() and query cases_case instead when the mark is missing (never
+    built, a flushed Redis, a fresh process on the memory backend).
+    """
+    
+    def __init__(self, backend):
+        self.backend = backend
+    
+    def entry_keys(self, entry):
+        """The (key, score) pairs a case belongs to"""
+        if entry['status'] == 'closed':
+            return []
+        
+        scopes = [GLOBAL_SCOPE, client_scope(entry['client_id'])]
+        if entry['assigned_lawyer_id']:
+            scopes.append(lawyer_scope(entry['assigned_lawyer_id']))
+        else:
+            scopes.append(UNASSIGNED_SCOPE)
+        
+        keys = [(f'urgency:{scope}', float(entry['urgency_score'])) for scope in scopes]
+        if entry['deadline'] and entry['status'] in DEADLINE_STATUSES:
+            keys += [(f'deadline:{scope}', entry['deadline'].timestamp()) for scope in scopes]
+        return keys
+    
+    def update_cases(self, entries):
+        """Insert, move or drop cases; entries are dicts with INDEX_FIELDS"""
+        entries = list(entries)
+        members = [str(entry['id']) for entry in entries]
+        current = self.backend.get_memberships(members)
+        
+        removals, additions, memberships = [], [], {}
+        for member, entry, current_keys in zip(members, entries, current):
+            keys = self.entry_keys(entry)
+            key_names = {key for key, _ in keys}
+            removals += [(key, member) for key in (current_keys or '').split(',') if key and key not in key_names]
+            additions += [(key, member, score) for key, score in keys]
+            memberships[member] = ','.join(sorted(key_names))
+        
+        self.backend.apply(removals, additions, memberships)
+    
+    def update_case(self, case):
+        self.update_cases([{field: getattr(case, field) for field in INDEX_FIELDS}])
+    
+    def remove_case(self, case_id):
+        member = str(case_id)
+        current_keys = self.backend.get_memberships([member])[0] or ''
+        removals = [(key, member) for key in current_keys.split(',') if key]
+        self.backend.apply(removals, [], {member: None})
+    
+    def is_built(self):
+        return self.backend.get_version() == INDEX_VERSION
+    
+    def top_urgent(self, scope=GLOBAL_SCOPE, limit=10, min_score=0):
+        """IDs of the most urgent non-closed cases in a scope, highest first"""
+        return self.backend.range_desc(f'urgency:{scope}', min_score, limit)
+    
+    def next_deadlines(self, scope=GLOBAL_SCOPE, limit=10, before=None):
+        """IDs of the earliest deadlines in a scope, optionally only those before a time"""
+        max_score = before.timestamp() if before else float('inf')
+        return self.backend.range_asc(f'deadline:{scope}', max_score, limit)
+    
+    def rebuild(self, chunk_size=2000):
+        """Repopulate the index from cases_case; returns the number of cases indexed"""
+        from cases.models import Case
+        
+        self.backend.clear()
+        indexed = 0
+        chunk = []
+        for entry in Case.objects.exclude(status='closed').values(*INDEX_FIELDS).iterator(chunk_size=chunk_size):
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                self.update_cases(chunk)
+                indexed += len(chunk)
+                chunk = []
+        if chunk:
+            self.update_cases(chunk)
+            indexed += len(chunk)
+        self.backend.set_version(INDEX_VERSION)
+        
+        logger.info(f"Rebuilt priority index with {indexed} cases")
+        return indexed
+    
+    def check(self):
+        """
+        Compare the index with cases_case
+        Returns a list of (key, case_id, problem) for missing, extra or stale entries
+        """
+        from cases.models import Case
+        
+        expected = {}
+        for entry in Case.objects.exclude(status='closed').values(*INDEX_FIELDS).iterator():
+            for key, score in self.entry_keys(entry):
+                expected.setdefault(key, {})[str(entry['id'])] = score
+        
+        problems = []
+        for key in sorted(set(expected) | set(self.backend.keys())):
+            wanted = expected.get(key, {})
+            actual = self.backend.members(key)
+            for member in wanted.keys() - actual.keys():
+                problems.append((key, member, 'missing'))
+            for member in actual.keys() - wanted.keys():
+                problems.append((key, member, 'extra'))
+            for member in wanted.keys() & actual.keys():
+                if abs(wanted[member] - actual[member]) > 1e-6:
+                    problems.append((key, member, f'score {actual[member]} != {wanted[member]}'))
+        return problems
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_priority_index():
+    """The process-wide PriorityIndex for settings.PRIORITY_INDEX_BACKEND"""
+    backend_name = settings.PRIORITY_INDEX_BACKEND
+    with _indexes_lock:
+        if backend_name not in _indexes:
+            if backend_name == 'memory':
+                backend = MemorySortedSetBackend()
+            elif backend_name == 'redis':
+                backend = RedisSortedSetBackend()
+            else:
+                raise ValueError(f"Unknown PRIORITY_INDEX_BACKEND: {backend_name}")
+            _indexes[backend_name] = PriorityIndex(backend)
+        return _indexes[backend_name]
@@ -0,0 +1,138 @@
+# utils/scoping.py - Which cases a user can see, with each user's case IDs cached
+
+from bisect import bisect_left
+from django.conf import settings
+from django.core.cache import cache
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SCOPE_CACHE_PREFIX = 'case_scope:'
+SCOPE_GENERATION_PREFIX = 'case_scope_gen:'
+
+# The Case field that ties each role to its cases; other roles see every case
+ROLE_CASE_FIELDS = {'lawyer': 'assigned_lawyer', 'client': 'client'}
+
+
+class CaseScope:
+    """A user's case IDs as one sorted bytes string of 16-byte UUIDs"""
+    
+    def __init__(self, packed):
+        self.packed = packed
+    
+    @classmethod
+    def from_ids(cls, case_ids):
+        return cls(b''.join(sorted(case_id.bytes for case_id in case_ids)))
+    
+    def __len__(self):
+        return len(self.packed) // 16
+    
+    def __contains__(self, case_id):
+        try:
+            target = uuid.UUID(str(case_id)).bytes
+        except ValueError:
+            return False
+        position = bisect_left(range(len(self)), target, key=lambda i: self.packed[i * 16:i * 16 + 16])
+        return position < len(self) and self.packed[position * 16:position * 16 + 16] == target
+    
+    def ids(self):
+        return [uuid.UUID(bytes=self.packed[i:i + 16]) for i in range(0, len(self.packed), 16)]
+
+
+def role_case_field(user):
+    return ROLE_CASE_FIELDS.get(user.user_type)
+
+
+def scope_cases(user, queryset=None):
+    """The cases (or a Case queryset narrowed to those) the user can see"""
+    from cases.models import Case
+    
+    if queryset is None:
+        queryset = Case.objects.all()
+    field = role_case_field(user)
+    if field is None:
+        return queryset
+    return queryset.filter(**{field: user})
+
+
+def _load_scope(user):
+    return CaseScope.from_ids(scope_cases(user).order_by().values_list('pk', flat=True))
+
+
+def get_case_scope(user):
+    """
+    The user's case IDs, or None when the user sees every case. Entries are
+    cached for CASE_SCOPE_CACHE_TIMEOUT seconds and tagged with the user's
+    scope generation, which invalidate_case_scopes replaces after any change
+    to who a case belongs to. An entry computed from data read before such a
+    commit carries the old generation, so it is never served afterwards.
+    """
+    if role_case_field(user) is None:
+        return None
+    entry_key = f'{SCOPE_CACHE_PREFIX}{user.user_type}:{user.pk}'
+    generation_key = f'{SCOPE_GENERATION_PREFIX}{user.pk}'
+    try:
+        cached = cache.get_many([entry_key, generation_key])
+    except Exception as e:
+        logger.error(f"Error reading case scope cache: {str(e)}")
+        return _load_scope(user)
+    
+    generation = cached.get(generation_key)
+    entry = cached.get(entry_key)
+    if generation is not None and entry is not None and entry[0] == generation:
+        return CaseScope(entry[1])
+    
+    try:
+        if generation is None:
+            cache.add(generation_key, uuid.uuid4().hex, None)
+            generation = cache.get(generation_key)
+    except Exception as e:
+        logger.error(f"Error reading case scope generation: {str(e)}")
+        generation = None
+    scope = _load_scope(user)
+    if generation is not None:
+        try:
+            cache.set(entry_key, (generation, scope.packed), settings.CASE_SCOPE_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error caching case scope: {str(e)}")
+    return scope
+
+
+def scope_case_children(user, queryset, case_field='case'):
+    """
+    Narrow a queryset of case-owned rows (documents, activities) to the
+    user's cases with case_id IN the cached scope, so the query needn't join
+    cases. Scopes larger than CASE_SCOPE_MAX_IDS filter through the join
+    instead, keeping the IN list within database parameter limits.
+    """
+    field = role_case_field(user)
+    if field is None:
+        return queryset
+    scope = get_case_scope(user)
+    if not len(scope):
+        return queryset.none()
+    if len(scope) > settings.CASE_SCOPE_MAX_IDS:
+        return queryset.filter(**{f'{case_field}__{field}': user})
+    return queryset.filter(**{f'{case_field}_id__in': scope.ids()})
+
+
+def can_see_case(user, case_id):
+    """Whether the case is in the user's scope (a cache hit costs no query)"""
+    from cases.models import Case
+    
+    scope = get_case_scope(user)
+    if scope is None:
+        return Case.objects.filter(pk=case_id).exists()
+    return case_id in scope
+
+
+def invalidate_case_scopes(*user_ids):
+    """Make the next scope lookup of these users reload their case IDs"""
+    generations = {f'{SCOPE_GENERATION_PREFIX}{user_id}': uuid.uuid4().hex for user_id in set(user_ids) if user_id}
+    if not generations:
+        return
+    try:
+        cache.set_many(generations, None)
+    except Exception as e:
+        logger.error(f"Error invalidating case scopes: {str(e)}")
@@ -0,0 +1,432 @@
+# utils/scoring.py - Declarative case urgency scoring model
+
+from django.db.models import Q, F, Case as DBCase, When, Value, DateTimeField, FloatField
+from django.db.models.functions import Cast, Greatest, Least
+from datetime import timedelta, datetime, timezone as dt_timezone
+import math
+import numpy as np
+
+from .db_functions import DaysBetween
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECONDS_PER_DAY = 86400 * 10**6
+
+# Factor names in the order their weighted scores are summed
+FACTORS = (
+    'deadline_urgency', 'case_priority_level', 'client_importance',
+    'case_type_urgency', 'activity_recency'
+)
+
+# Case columns a scorer reads, in the argument order of the batch scorer
+SCORING_FIELDS = (
+    'deadline', 'priority_level', 'client_importance',
+    'case_type', 'last_activity', 'status'
+)
+
+# Case columns written by rescoring; saves touching only these do not mark a case dirty
+SCORING_OUTPUT_FIELDS = ['urgency_score', 'priority_dirty', 'priority_recheck_at']
+
+
+class ScoringModel:
+    """
+    Case urgency formula stored as data: factor weights (percent), factor
+    score bands (each 0-100) and status modifiers. The final score is the
+    weighted sum times the status modifier, clamped to 0-100.
+    Build a CompiledScorer once with compile() and reuse it.
+    """
+    
+    def __init__(self, weights, deadline, priority_levels, client_importance,
+                 case_types, activity, status_modifiers):
+        if set(weights) != set(FACTORS):
+            raise ValueError(f"Weights must cover exactly these factors: {', '.join(FACTORS)}")
+        
+        self.weights = weights
+        self.deadline = deadline
+        self.priority_levels = priority_levels
+        self.client_importance = client_importance
+        self.case_types = case_types
+        self.activity = activity
+        self.status_modifiers = status_modifiers
+    
+    def compile(self):
+        return CompiledScorer(self)
+
+
+DEFAULT_SCORING_MODEL = ScoringModel(
+    weights={
+        'deadline_urgency': 40,
+        'case_priority_level': 30,
+        'client_importance': 15,
+        'case_type_urgency': 10,
+        'activity_recency': 5
+    },
+    deadline={
+        'missing': 20,  # No deadline = medium urgency
+        # Overdue: base + per_day for each day overdue, capped
+        'overdue': {'base': 95, 'per_day': 1, 'max': 100},
+        # Due within this many hours
+        'due_within': {'hours': 24, 'score': 90},
+        # (max days remaining, base, per_day): base - days * per_day
+        'bands': [(3, 80, 5), (7, 65, 3), (30, 40, 1)],
+        # Further out: base - days / divisor, floored at min
+        'distant': {'base': 30, 'divisor': 10, 'min': 10},
+    },
+    priority_levels={
+        'scores': {
+            1: 100,  # Critical
+            2: 80,   # High
+            3: 60,   # Medium
+            4: 40,   # Low
+            5: 20    # Routine
+        },
+        'default': 60,
+    },
+    # 1-5 scale: (importance - 1) * per_level
+    client_importance={'missing': 50, 'per_level': 25},
+    case_types={
+        'scores': {
+            'criminal': 80, 'personal_injury': 80, 'immigration': 80,
+            'family': 60, 'property': 60,
+            'civil': 40, 'corporate': 40,
+        },
+        'default': 30,
+    },
+    activity={
+        'missing': 0,
+        # (max days since activity, score); future timestamps count as today
+        'bands': [(0, 100), (3, 80), (7, 60), (14, 40), (30, 20)],
+        'stale': 0,  # Stale cases get lower priority
+    },
+    status_modifiers={
+        'scores': {
+            'filed': 1.1,          # New cases get slight boost
+            'investigation': 1.0,  # Normal priority
+            'hearing': 1.2,        # Hearing cases are more urgent
+            'trial': 1.3,          # Trial cases are most urgent
+            'on_hold': 0.5,        # On hold cases get reduced priority
+            'closed': 0.1          # Closed cases get minimal priority
+        },
+        'default': 1.0,
+    },
+)
+
+
+class CompiledScorer:
+    """
+    A ScoringModel flattened into plain attributes for fast evaluation.
+    Offers the same formula three ways: per case (score), as NumPy arrays
+    (score_arrays) and as a Django ORM expression (score_expression).
+    """
+    
+    def __init__(self, model):
+        self.model = model
+        self.weights = tuple(model.weights[factor] / 100 for factor in FACTORS)
+        
+        deadline = model.deadline
+        self.deadline_missing = deadline['missing']
+        self.overdue_base = deadline['overdue']['base']
+        self.overdue_per_day = deadline['overdue']['per_day']
+        self.overdue_max = deadline['overdue']['max']
+        self.due_within_hours = deadline['due_within']['hours']
+        self.due_within_score = deadline['due_within']['score']
+        self.deadline_bands = tuple(deadline['bands'])
+        self.distant_base = deadline['distant']['base']
+        self.distant_divisor = deadline['distant']['divisor']
+        self.distant_min = deadline['distant']['min']
+        
+        self.priority_level_scores = dict(model.priority_levels['scores'])
+        self.priority_level_default = model.priority_levels['default']
+        self.client_missing = model.client_importance['missing']
+        self.client_per_level = model.client_importance['per_level']
+        self.case_type_scores = dict(model.case_types['scores'])
+        self.case_type_default = model.case_types['default']
+        self.activity_missing = model.activity['missing']
+        self.activity_bands = tuple(model.activity['bands'])
+        self.activity_stale = model.activity['stale']
+        self.status_modifiers = dict(model.status_modifiers['scores'])
+        self.status_default = model.status_modifiers['default']
+        
+        # Incremental rescoring: the deadline score moves with every whole day
+        # remaining until it reaches its floor far out or its cap when overdue
+        self.deadline_floor_days = math.ceil(
+            (self.distant_base - self.distant_min) * self.distant_divisor
+        )
+        self.deadline_cap_days = -math.ceil(
+            (self.overdue_max - self.overdue_base) / self.overdue_per_day
+        )
+        # Days since activity at which the activity score changes band
+        self.activity_edges = tuple(max_days + 1 for max_days, _ in self.activity_bands)
+    
+    # Per-case scoring
+    
+    def score(self, deadline, priority_level, client_importance, case_type,
+              last_activity, status, now):
+        """Return (score 0-100, factor scores in FACTORS order)"""
+        factors = (
+            self.deadline_score(deadline, now),
+            self.priority_level_scores.get(priority_level, self.priority_level_default),
+            self.client_importance_score(client_importance),
+            self.case_type_scores.get(case_type, self.case_type_default),
+            self.activity_score(last_activity, now),
+        )
+        
+        score = 0
+        for factor_score, weight in zip(factors, self.weights):
+            score += factor_score * weight
+        
+        score *= self.status_modifiers.get(status, self.status_default)
+        return min(100, max(0, score)), factors
+    
+    def score_case(self, case, now):
+        """Score a Case instance; returns (score, factor scores)"""
+        return self.score(
+            case.deadline, case.priority_level, case.client_importance,
+            case.case_type, case.last_activity, case.status, now
+        )
+    
+    def deadline_score(self, deadline, now):
+        if not deadline:
+            return self.deadline_missing
+        
+        time_diff = deadline - now
+        days_remaining = time_diff.days
+        
+        if days_remaining < 0:
+            return min(self.overdue_max, self.overdue_base + self.overdue_per_day * abs(days_remaining))
+        elif time_diff.total_seconds() / 3600 <= self.due_within_hours:
+            return self.due_within_score
+        
+        for max_days, base, per_day in self.deadline_bands:
+            if days_remaining <= max_days:
+                return base - (days_remaining * per_day)
+        return max(self.distant_min, self.distant_base - (days_remaining / self.distant_divisor))
+    
+    def client_importance_score(self, client_importance):
+        if not client_importance:
+            return self.client_missing
+        return (client_importance - 1) * self.client_per_level
+    
+    def activity_score(self, last_activity, now):
+        if not last_activity:
+            return self.activity_missing
+        
+        days_since_activity = max(0, (now - last_activity).days)
+        for max_days, score in self.activity_bands:
+            if days_since_activity <= max_days:
+                return score
+        return self.activity_stale
+    
+    def next_recheck(self, deadline, last_activity, now):
+        """
+        Next time the score changes without any edit to the case: the earliest
+        deadline or last_activity band crossing (None if it never changes)
+        """
+        crossings = []
+        
+        if deadline:
+            days_remaining = (deadline - now).days
+            if days_remaining >= self.deadline_floor_days:
+                crossings.append(deadline - timedelta(days=self.deadline_floor_days))
+            elif days_remaining > self.deadline_cap_days:
+                crossings.append(deadline - timedelta(days=days_remaining))
+        
+        if last_activity:
+            days_since_activity = (now - last_activity).days
+            for edge in self.activity_edges:
+                if edge > days_since_activity:
+                    crossings.append(last_activity + timedelta(days=edge))
+                    break
+        
+        return min(crossings) if crossings else None
+    
+    # Vectorized scoring
+    
+    def score_arrays(self, deadlines, priority_levels, client_importances,
+                     case_types, last_activities, statuses, now):
+        """
+        Score many cases at once; each argument is a sequence with one entry
+        per case (see SCORING_FIELDS). Returns (scores, factor arrays by name)
+        and matches score() exactly.
+        """
+        deadline_us, has_deadline = to_epoch_microseconds(deadlines)
+        activity_us, has_activity = to_epoch_microseconds(last_activities)
+        now_us = to_epoch_microsecond(now)
+        
+        factors = {
+            'deadline_urgency': self._deadline_array(deadline_us - now_us, has_deadline),
+            'case_priority_level': self._lookup_array(
+                priority_levels, self.priority_level_scores, self.priority_level_default
+            ),
+            'client_importance': self._client_importance_array(client_importances),
+            'case_type_urgency': self._lookup_array(case_types, self.case_type_scores, self.case_type_default),
+            'activity_recency': self._activity_array(now_us - activity_us, has_activity),
+        }
+        
+        # Accumulate in FACTORS order so results are bit-for-bit identical to score()
+        score = np.zeros(len(deadline_us))
+        for factor, weight in zip(FACTORS, self.weights):
+            score += factors[factor] * weight
+        
+        score *= self._lookup_array(statuses, self.status_modifiers, self.status_default)
+        return np.minimum(100, np.maximum(0, score)), factors
+    
+    def next_recheck_arrays(self, deadlines, last_activities, now):
+        """
+        Vectorized next_recheck
+        Returns int64 epoch microseconds and a mask of cases that have a crossing
+        """
+        deadline_us, has_deadline = to_epoch_microseconds(deadlines)
+        activity_us, has_activity = to_epoch_microseconds(last_activities)
+        now_us = to_epoch_microsecond(now)
+        never = np.iinfo(np.int64).max
+        
+        days_remaining = np.floor_divide(deadline_us - now_us, MICROSECONDS_PER_DAY)
+        deadline_crossing = np.where(
+            days_remaining >= self.deadline_floor_days,
+            deadline_us - self.deadline_floor_days * MICROSECONDS_PER_DAY,
+            deadline_us - days_remaining * MICROSECONDS_PER_DAY
+        )
+        deadline_crossing[~has_deadline | (days_remaining <= self.deadline_cap_days)] = never
+        
+        edges = np.asarray(self.activity_edges, dtype=np.int64)
+        days_since_activity = np.floor_divide(now_us - activity_us, MICROSECONDS_PER_DAY)
+        next_edge = np.searchsorted(edges, days_since_activity, side='right')
+        activity_crossing = activity_us + edges[np.minimum(next_edge, len(edges) - 1)] * MICROSECONDS_PER_DAY
+        activity_crossing[~has_activity | (next_edge == len(edges))] = never
+        
+        rechecks = np.minimum(deadline_crossing, activity_crossing)
+        return rechecks, rechecks != never
+    
+    def _lookup_array(self, values, table, default):
+        """Map categorical values through a score table"""
+        return np.fromiter((table.get(value, default) for value in values), dtype=float)
+    
+    def _deadline_array(self, remaining_us, has_deadline):
+        days_remaining = np.floor_divide(remaining_us, MICROSECONDS_PER_DAY)
+        hours_remaining = remaining_us / 10**6 / 3600
+        
+        conditions = [~has_deadline, days_remaining < 0, hours_remaining <= self.due_within_hours]
+        choices = [
+            self.deadline_missing,
+            np.minimum(self.overdue_max, self.overdue_base + self.overdue_per_day * np.abs(days_remaining)),
+            self.due_within_score,
+        ]
+        for max_days, base, per_day in self.deadline_bands:
+            conditions.append(days_remaining <= max_days)
+            choices.append(base - (days_remaining * per_day))
+        
+        distant = np.maximum(self.distant_min, self.distant_base - (days_remaining / self.distant_divisor))
+        return np.select(conditions, choices, default=distant).astype(float)
+    
+    def _client_importance_array(self, client_importances):
+        importance = np.fromiter((value or 0 for value in client_importances), dtype=float)
+        return np.where(importance == 0, self.client_missing, (importance - 1) * self.client_per_level)
+    
+    def _activity_array(self, elapsed_us, has_activity):
+        days_since_activity = np.maximum(0, np.floor_divide(elapsed_us, MICROSECONDS_PER_DAY))
+        conditions = [~has_activity]
+        choices = [self.activity_missing]
+        for max_days, score in self.activity_bands:
+            conditions.append(days_since_activity <= max_days)
+            choices.append(score)
+        return np.select(conditions, choices, default=self.activity_stale).astype(float)
+    
+    # Database scoring
+    
+    def score_expression(self, now):
+        """
+        The same formula as a Django ORM expression over cases_case columns,
+        for annotate() and update() without loading rows into Python
+        """
+        days_remaining = Cast(
+            DaysBetween(F('deadline'), Value(now, output_field=DateTimeField())),
+            FloatField()
+        )
+        
+        # Band edges expressed as timestamps relative to now, matching the
+        # day/hour comparisons in deadline_score
+        deadline_whens = [
+            When(deadline__isnull=True, then=Value(float(self.deadline_missing))),
+            When(deadline__lt=now, then=Least(
+                Value(float(self.overdue_max)),
+                self.overdue_base - (days_remaining * self.overdue_per_day)
+            )),
+            When(deadline__lte=now + timedelta(hours=self.due_within_hours),
+                 then=Value(float(self.due_within_score))),
+        ]
+        for max_days, base, per_day in self.deadline_bands:
+            deadline_whens.append(When(
+                deadline__lt=now + timedelta(days=max_days + 1),
+                then=base - (days_remaining * per_day)
+            ))
+        deadline_score = DBCase(
+            *deadline_whens,
+            default=Greatest(
+                Value(float(self.distant_min)),
+                self.distant_base - (days_remaining / self.distant_divisor)
+            ),
+            output_field=FloatField()
+        )
+        
+        client_score = DBCase(
+            When(Q(client_importance__isnull=True) | Q(client_importance=0),
+                 then=Value(float(self.client_missing))),
+            default=(F('client_importance') - 1) * Value(float(self.client_per_level)),
+            output_field=FloatField()
+        )
+        
+        activity_whens = [When(last_activity__isnull=True, then=Value(float(self.activity_missing)))]
+        for max_days, score in self.activity_bands:
+            activity_whens.append(When(
+                last_activity__gt=now - timedelta(days=max_days + 1),
+                then=Value(float(score))
+            ))
+        activity_score = DBCase(
+            *activity_whens, default=Value(float(self.activity_stale)), output_field=FloatField()
+        )
+        
+        factors = (
+            deadline_score,
+            self._lookup_expression('priority_level', self.priority_level_scores, self.priority_level_default),
+            client_score,
+            self._lookup_expression('case_type', self.case_type_scores, self.case_type_default),
+            activity_score,
+        )
+        score = None
+        for factor_score, weight in zip(factors, self.weights):
+            weighted = factor_score * Value(weight)
+            score = weighted if score is None else score + weighted
+        
+        status_modifier = self._lookup_expression('status', self.status_modifiers, self.status_default)
+        return Greatest(Value(0.0), Least(Value(100.0), score * status_modifier))
+    
+    def _lookup_expression(self, field, table, default):
+        """CASE expression mapping a column through a score table"""
+        return DBCase(
+            *[When(**{field: value}, then=Value(float(score))) for value, score in table.items()],
+            default=Value(float(default)),
+            output_field=FloatField()
+        )
+
+
+DEFAULT_SCORER = DEFAULT_SCORING_MODEL.compile()
+
+
+def to_epoch_microsecond(value):
+    """Convert one datetime to integer microseconds since epoch"""
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_microsecond(value):
+    """Inverse of to_epoch_microsecond"""
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def to_epoch_microseconds(values):
+    """Convert datetimes to int64 microseconds since epoch plus a not-null mask"""
+    present = np.fromiter((value is not None for value in values), dtype=bool)
+    micros = np.fromiter(
+        (to_epoch_microsecond(value) if value is not None else 0 for value in values),
+        dtype=np.int64
+    )
+    return micros, present
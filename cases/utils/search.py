@@ -0,0 +1,197 @@
+# utils/search.py - Full-text case search: SQLite FTS5 or a PostgreSQL tsvector with a GIN index
+
+from django.db import connection as default_connection, transaction
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+import logging
+import re
+
+from .scoping import ROLE_CASE_FIELDS, role_case_field
+
+logger = logging.getLogger(__name__)
+
+# The CaseViewSet search_fields, in index column order
+SEARCH_FIELDS = ('title', 'description', 'case_number')
+# Annotation holding a result's relevance (higher is better); see KeysetPagination
+SEARCH_RANK = 'search_rank'
+
+# Case columns whose changes reindex a case: its text and, on SQLite, its parties
+INDEXED_FIELDS = (*SEARCH_FIELDS, *ROLE_CASE_FIELDS.values())
+
+WORD = re.compile(r'\w+')
+
+
+def search_words(terms):
+    """The words of SearchFilter's terms, dropping anything a query syntax could read as an operator"""
+    return [word.lower() for term in terms for word in WORD.findall(term)]
+
+
+def party_token(role, user_id):
+    return f'{role}{user_id.hex}'
+
+
+class SQLiteCaseSearch:
+    """
+    An FTS5 table with one row per case, kept in step by
+    the case signals rather than triggers: Django rebuilds SQLite tables to
+    alter them, which would drop triggers. Each case gets an integer key in
+    cases_case_search_key, used as its row's rowid, so a case's row can be
+    replaced or ranked without a scan.
+    
+    The parties column holds a token per client and lawyer of the case, so
+    a lawyer's search matches "their token AND the words" and FTS5 walks
+    the two posting lists together rather than ranking every case with a
+    common word and dropping most of them at the scope filter.
+    """
+    table = 'cases_case_search'
+    key_table = 'cases_case_search_key'
+    text_columns = '{title description case_number}'
+    # bm25 weights per column: case_id (unindexed), title, description, case_number, parties
+    weights = '0.0, 10.0, 1.0, 10.0, 0.0'
+    # Case values an entry is built from
+    value_fields = ('id', *SEARCH_FIELDS, *[f'{field}_id' for field in ROLE_CASE_FIELDS.values()])
+    
+    def row_id_sql(self, case_id_sql):
+        return f'(SELECT id FROM "{self.key_table}" WHERE case_id = {case_id_sql})'
+    
+    def search(self, queryset, terms, user=None):
+        words = search_words(terms)
+        if not words:
+            return queryset
+        prefixes = ' '.join(f'"{word}"*' for word in words)
+        match = f'{self.text_columns} : ({prefixes})'
+        if user is not None and role_case_field(user):
+            match = f'parties : "{party_token(user.user_type, user.pk)}" AND {match}'
+        case_id = f'"{queryset.model._meta.db_table}"."id"'
+        # SQLite drives the query from the MATCH and looks the cases up by pk;
+        # each result's rank is then read from its own row by rowid
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT case_id FROM "{self.table}" WHERE "{self.table}" MATCH %s', [match])
+        ).annotate(**{SEARCH_RANK: RawSQL(
+            f'(SELECT -bm25("{self.table}", {self.weights}) FROM "{self.table}" '
+            f'WHERE "{self.table}" MATCH %s AND rowid = {self.row_id_sql(case_id)})',
+            [match], output_field=FloatField()
+        )})
+    
+    def index_cases(self, cases):
+        """Add or replace the entries of these Case instances or value dicts"""
+        rows = []
+        for case in cases:
+            values = case if isinstance(case, dict) else {field: getattr(case, field) for field in self.value_fields}
+            parties = ' '.join(
+                party_token(role, values[f'{field}_id'])
+                for role, field in ROLE_CASE_FIELDS.items() if values[f'{field}_id'] is not None
+            )
+            rows.append((*[values[field] or '' for field in SEARCH_FIELDS], parties, values['id'].hex))
+        case_ids = [row[-1:] for row in rows]
+        with default_connection.cursor() as cursor:
+            cursor.executemany(f'INSERT OR IGNORE INTO "{self.key_table}" (case_id) VALUES (%s)', case_ids)
+            cursor.executemany(f'DELETE FROM "{self.table}" WHERE rowid = {self.row_id_sql("%s")}', case_ids)
+            cursor.executemany(
+                f'INSERT INTO "{self.table}" (rowid, case_id, {", ".join(SEARCH_FIELDS)}, parties) '
+                f'SELECT id, case_id, %s, %s, %s, %s FROM "{self.key_table}" WHERE case_id = %s',
+                rows
+            )
+    
+    def remove_cases(self, case_ids):
+        params = [(case_id.hex,) for case_id in case_ids]
+        with default_connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM "{self.table}" WHERE rowid = {self.row_id_sql("%s")}', params)
+            cursor.executemany(f'DELETE FROM "{self.key_table}" WHERE case_id = %s', params)
+    
+    def rebuild(self, chunk_size=2000):
+        """Reindex every case; returns the number indexed"""
+        from cases.models import Case
+        
+        indexed = 0
+        with transaction.atomic():
+            with default_connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM "{self.table}"')
+                cursor.execute(f'DELETE FROM "{self.key_table}"')
+            chunk = []
+            for values in Case.objects.order_by().values(*self.value_fields).iterator(chunk_size=chunk_size):
+                chunk.append(values)
+                if len(chunk) >= chunk_size:
+                    self.index_cases(chunk)
+                    indexed += len(chunk)
+                    chunk = []
+            self.index_cases(chunk)
+            indexed += len(chunk)
+            with default_connection.cursor() as cursor:
+                cursor.execute(f'INSERT INTO "{self.table}" ("{self.table}") VALUES (\'optimize\')')
+        return indexed
+
+
+class PostgresCaseSearch:
+    """
+    cases_case.search_vector, set by a trigger on insert and on updates of
+    the searched columns (so bulk writes are covered too) and searched
+    through a GIN index. Title and case number weigh more than description.
+    The migration that adds the column fills it in for existing cases.
+    """
+    config = 'simple'
+    
+    def search(self, queryset, terms, user=None):
+        words = search_words(terms)
+        if not words:
+            return queryset
+        query = ' & '.join(f"'{word}':*" for word in words)
+        vector = f'"{queryset.model._meta.db_table}"."search_vector"'
+        tsquery = f"to_tsquery('{self.config}', %s)"
+        return queryset.filter(
+            RawSQL(f'{vector} @@ {tsquery}', [query], output_field=BooleanField())
+        ).annotate(**{
+            # float8 so the rank survives a keyset cursor round trip exactly
+            SEARCH_RANK: RawSQL(f'ts_rank({vector}, {tsquery})::float8', [query], output_field=FloatField())
+        })
+    
+    def index_cases(self, cases):
+        """The trigger indexes cases as they're written"""
+    
+    def remove_cases(self, case_ids):
+        """Deleted rows take their vectors with them"""
+    
+    def rebuild(self, chunk_size=2000):
+        """Recompute every case's vector in pk order, one transaction per chunk; returns the number indexed"""
+        indexed = 0
+        after, params = '', []
+        while True:
+            with transaction.atomic(), default_connection.cursor() as cursor:
+                cursor.execute(
+                    'UPDATE cases_case SET search_vector = cases_case_search_vector(title, description, case_number) '
+                    f'WHERE id IN (SELECT id FROM cases_case {after} ORDER BY id LIMIT %s) RETURNING id',
+                    [*params, chunk_size]
+                )
+                ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                return indexed
+            indexed += len(ids)
+            after, params = 'WHERE id > %s', [max(ids)]
+
+
+_searches = {'sqlite': SQLiteCaseSearch(), 'postgresql': PostgresCaseSearch()}
+
+
+def get_case_search(connection=None):
+    """The full-text backend for this database, or None (SearchFilter's LIKE applies)"""
+    return _searches.get((connection or default_connection).vendor)
+
+
+def index_cases(cases):
+    search = get_case_search()
+    if search is None:
+        return
+    try:
+        search.index_cases(cases)
+    except Exception as e:
+        logger.error(f"Error indexing case text: {str(e)}")
+
+
+def remove_cases(case_ids):
+    search = get_case_search()
+    if search is None:
+        return
+    try:
+        search.remove_cases(case_ids)
+    except Exception as e:
+        logger.error(f"Error removing case text from the search index: {str(e)}")
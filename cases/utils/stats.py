@@ -0,0 +1,88 @@
+# utils/stats.py - Single-query case statistics and the cached dashboard stats
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_CACHE_PREFIX = 'dashboard_stats:'
+# Admins see every case, so they share one entry
+ALL_CASES_CACHE_KEY = DASHBOARD_CACHE_PREFIX + 'all'
+
+URGENT_SCORE_THRESHOLD = 70
+
+
+def case_statistics(cases, now=None):
+    """
+    Counts by status and priority, deadline and activity windows and the
+    average urgency for a case queryset, in one conditional aggregate query
+    """
+    from cases.models import Case
+    
+    now = now or timezone.now()
+    aggregates = {'total_cases': Count('pk')}
+    for value, _ in Case.STATUS_CHOICES:
+        aggregates[f'status_{value}'] = Count('pk', filter=Q(status=value))
+    for level, _ in Case.PRIORITY_LEVELS:
+        aggregates[f'priority_{level}'] = Count('pk', filter=Q(priority_level=level))
+    aggregates.update(
+        overdue_cases=Count('pk', filter=Q(deadline__lt=now)),
+        due_this_week=Count('pk', filter=Q(deadline__gte=now, deadline__lte=now + timedelta(days=7))),
+        recent_activity=Count('pk', filter=Q(last_activity__gte=now - timedelta(days=7))),
+        urgent_cases=Count('pk', filter=Q(urgency_score__gte=URGENT_SCORE_THRESHOLD)),
+        average_urgency_score=Avg('urgency_score'),
+    )
+    row = cases.order_by().aggregate(**aggregates)
+    
+    return {
+        'total_cases': row['total_cases'],
+        'cases_by_status': {value: row[f'status_{value}'] for value, _ in Case.STATUS_CHOICES},
+        'cases_by_priority': {f'priority_{level}': row[f'priority_{level}'] for level, _ in Case.PRIORITY_LEVELS},
+        'overdue_cases': row['overdue_cases'],
+        'due_this_week': row['due_this_week'],
+        'recent_activity': row['recent_activity'],
+        'urgent_cases': row['urgent_cases'],
+        'average_urgency_score': row['average_urgency_score'] or 0,
+    }
+
+
+def dashboard_cache_key(user):
+    if user.user_type in ('lawyer', 'client'):
+        return f'{DASHBOARD_CACHE_PREFIX}{user.pk}'
+    return ALL_CASES_CACHE_KEY
+
+
+def get_cached_dashboard_stats(user, compute):
+    """
+    The user's dashboard stats from the cache, or compute() stored for
+    DASHBOARD_STATS_CACHE_TIMEOUT seconds. Case writes drop the entries of
+    the users involved (see invalidate_dashboard_stats); the timeout bounds
+    how stale the time-based counts (overdue, due this week) can get.
+    """
+    key = dashboard_cache_key(user)
+    try:
+        stats = cache.get(key)
+    except Exception as e:
+        logger.error(f"Error reading dashboard stats cache: {str(e)}")
+        return compute()
+    
+    if stats is None:
+        stats = compute()
+        try:
+            cache.set(key, stats, settings.DASHBOARD_STATS_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error writing dashboard stats cache: {str(e)}")
+    return stats
+
+
+def invalidate_dashboard_stats(*user_ids):
+    """Drop the cached stats of these users and the shared admin entry"""
+    keys = [f'{DASHBOARD_CACHE_PREFIX}{user_id}' for user_id in set(user_ids) if user_id]
+    try:
+        cache.delete_many(keys + [ALL_CASES_CACHE_KEY])
+    except Exception as e:
+        logger.error(f"Error invalidating dashboard stats: {str(e)}")
@@ -0,0 +1,380 @@
+# utils/summaries.py - Per-lawyer and per-client case summary tables
+
+from django.db import transaction
+from django.db.models import (
+    Avg, Case as DBCase, Count, DateTimeField, DurationField, ExpressionWrapper, F, Min, OuterRef, Q, Subquery,
+    Sum, Value, When
+)
+from django.utils import timezone
+from datetime import timedelta
+import logging
+
+from .stats import URGENT_SCORE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('filed', 'investigation', 'hearing', 'trial', 'closed', 'on_hold')
+PRIORITY_LEVELS = (1, 2, 3, 4, 5)
+
+# Case columns a summary is derived from
+SUMMARY_FIELDS = (
+    'client_id', 'assigned_lawyer_id', 'status', 'priority_level', 'urgency_score',
+    'deadline', 'last_activity', 'created_at'
+)
+
+# Counters adjusted with F() deltas as cases change
+COUNTER_FIELDS = (
+    ('total_cases',)
+    + tuple(f'status_{status}' for status in STATUSES)
+    + tuple(f'priority_{level}' for level in PRIORITY_LEVELS)
+    + ('urgency_total', 'urgent_cases', 'closed_created_total',
+       'overdue_cases', 'due_this_week', 'recent_activity')
+)
+
+WEEK = timedelta(days=7)
+
+
+def summary_models():
+    """(summary model, Case column naming its owner) for each kind of summary"""
+    from cases.models import LawyerCaseSummary, ClientCaseSummary
+    return ((LawyerCaseSummary, 'assigned_lawyer_id'), (ClientCaseSummary, 'client_id'))
+
+
+def summary_model_for(user):
+    from cases.models import LawyerCaseSummary, ClientCaseSummary
+    return {'lawyer': LawyerCaseSummary, 'client': ClientCaseSummary}.get(user.user_type)
+
+
+def owner_column(model):
+    return dict(summary_models())[model]
+
+
+def case_contribution(values, now):
+    """What one case (a dict of SUMMARY_FIELDS) adds to its owners' counters at `now`"""
+    score = values['urgency_score'] or 0
+    deadline = values['deadline']
+    last_activity = values['last_activity']
+    contribution = {
+        'total_cases': 1,
+        f"status_{values['status']}": 1,
+        f"priority_{values['priority_level']}": 1,
+        'urgency_total': score,
+        'urgent_cases': int(score >= URGENT_SCORE_THRESHOLD),
+        'closed_created_total': values['created_at'].timestamp() if values['status'] == 'closed' else 0,
+        'overdue_cases': int(deadline is not None and deadline < now),
+        'due_this_week': int(deadline is not None and now <= deadline <= now + WEEK),
+        'recent_activity': int(last_activity is not None and last_activity >= now - WEEK),
+    }
+    return {field: value for field, value in contribution.items() if field in COUNTER_FIELDS}
+
+
+def next_crossing(values, now):
+    """When the case's time-based contribution next changes, or None"""
+    deadline = values['deadline']
+    last_activity = values['last_activity']
+    candidates = []
+    if deadline is not None:
+        # Enters the week window, then becomes overdue
+        candidates += [moment for moment in (deadline - WEEK, deadline) if moment >= now]
+    if last_activity is not None and last_activity + WEEK >= now:
+        candidates.append(last_activity + WEEK)
+    return min(candidates, default=None)
+
+
+def snapshot_case(case):
+    """The SUMMARY_FIELDS of a case as stored, or None if some weren't loaded"""
+    try:
+        return {field: case.__dict__[field] for field in SUMMARY_FIELDS}
+    except KeyError:
+        return None
+
+
+def apply_case_change(old, new, now=None):
+    """
+    Move a case's contribution from its old owners' summaries to its new
+    ones. old/new are SUMMARY_FIELDS dicts, or None for a created/deleted
+    case. Must run in the transaction that writes the case.
+    """
+    apply_case_changes([(old, new)], now)
+
+
+def apply_case_changes(changes, now=None):
+    """apply_case_change for many (old, new) pairs, with one bulk UPDATE per summary table"""
+    now = now or timezone.now()
+    deltas = {}
+    crossings = {}
+    for old, new in changes:
+        for values, sign in ((old, -1), (new, 1)):
+            if values is None:
+                continue
+            contribution = case_contribution(values, now)
+            crossing = next_crossing(values, now) if sign > 0 else None
+            for model, column in summary_models():
+                owner = values[column]
+                if owner is None:
+                    continue
+                counters = deltas.setdefault((model, owner), {})
+                for field, value in contribution.items():
+                    counters[field] = counters.get(field, 0) + sign * value
+                if crossing is not None:
+                    earliest = crossings.get((model, owner))
+                    crossings[(model, owner)] = crossing if earliest is None else min(earliest, crossing)
+    
+    for model, _ in summary_models():
+        owners = {owner: counters for (owner_model, owner), counters in deltas.items() if owner_model is model}
+        update_summaries(model, owners, {owner: crossings.get((model, owner)) for owner in owners})
+
+
+def update_summaries(model, deltas, crossings):
+    """
+    Add counter deltas ({owner: {field: delta}}) to summaries with a single
+    bulk UPDATE, pulling counts_valid_until back to any earlier crossing.
+    Missing summaries are left alone; get_case_summary builds them from
+    scratch when read.
+    """
+    fields = sorted({field for counters in deltas.values() for field, delta in counters.items() if delta})
+    if any(crossings.values()):
+        fields.append('counts_valid_until')
+    if not fields:
+        return
+    
+    summaries = []
+    for owner, counters in deltas.items():
+        summary = model(pk=owner)
+        for field in fields:
+            setattr(summary, field, F(field) + counters.get(field, 0))
+        if crossings.get(owner) is not None:
+            # counts_valid_until = min(counts_valid_until, crossing), NULL meaning never
+            summary.counts_valid_until = DBCase(
+                When(Q(counts_valid_until__isnull=True) | Q(counts_valid_until__gt=crossings[owner]),
+                     then=Value(crossings[owner])),
+                default=F('counts_valid_until'),
+            )
+        elif 'counts_valid_until' in fields:
+            summary.counts_valid_until = F('counts_valid_until')
+        summaries.append(summary)
+    model.objects.bulk_update(summaries, fields, batch_size=500)
+    
+    if 'total_cases' in fields and owner_column(model) == 'assigned_lawyer_id':
+        sync_lawyer_profiles([owner for owner, counters in deltas.items() if counters.get('total_cases')])
+
+
+def sync_lawyer_profiles(lawyer_ids=None):
+    """Copy total_cases from the lawyer summaries onto LawyerProfile.total_cases"""
+    from cases.models import LawyerProfile, LawyerCaseSummary
+    
+    profiles = LawyerProfile.objects.filter(user__lawyer_case_summary__isnull=False)
+    if lawyer_ids is not None:
+        profiles = profiles.filter(user_id__in=lawyer_ids)
+    profiles.update(total_cases=Subquery(
+        LawyerCaseSummary.objects.filter(lawyer_id=OuterRef('user_id')).values('total_cases')[:1]
+    ))
+
+
+def recount_summaries(owner_ids):
+    """Recompute the existing summaries of these users from scratch"""
+    for model, _ in summary_models():
+        existing = list(model.objects.filter(pk__in=owner_ids).values_list('pk', flat=True))
+        if existing:
+            rebuild_summaries(model, owner_ids=existing)
+
+
+def apply_score_changes(rows):
+    """
+    Batch version of apply_case_change for rescoring, where only the score
+    moves: rows are (client_id, assigned_lawyer_id, old_score, new_score).
+    One bulk UPDATE per summary table.
+    """
+    deltas = {}
+    for client_id, lawyer_id, old_score, new_score in rows:
+        urgent = int(new_score >= URGENT_SCORE_THRESHOLD) - int((old_score or 0) >= URGENT_SCORE_THRESHOLD)
+        for model, owner in summary_owners(client_id, lawyer_id):
+            total, urgent_total = deltas.get((model, owner), (0.0, 0))
+            deltas[(model, owner)] = (total + new_score - (old_score or 0), urgent_total + urgent)
+    
+    for model, _ in summary_models():
+        updates = [
+            model(pk=owner, urgency_total=F('urgency_total') + total, urgent_cases=F('urgent_cases') + urgent)
+            for (owner_model, owner), (total, urgent) in deltas.items() if owner_model is model
+        ]
+        if updates:
+            model.objects.bulk_update(updates, ['urgency_total', 'urgent_cases'], batch_size=500)
+
+
+def summary_owners(client_id, lawyer_id):
+    from cases.models import LawyerCaseSummary, ClientCaseSummary
+    owners = [(ClientCaseSummary, client_id)]
+    if lawyer_id:
+        owners.append((LawyerCaseSummary, lawyer_id))
+    return owners
+
+
+def summary_aggregates(now):
+    """Aggregates that compute a summary's counters from its cases"""
+    closed = Q(status='closed')
+    aggregates = {'total_cases': Count('pk')}
+    for status in STATUSES:
+        aggregates[f'status_{status}'] = Count('pk', filter=Q(status=status))
+    for level in PRIORITY_LEVELS:
+        aggregates[f'priority_{level}'] = Count('pk', filter=Q(priority_level=level))
+    aggregates.update(
+        urgency_total=Sum('urgency_score'),
+        urgent_cases=Count('pk', filter=Q(urgency_score__gte=URGENT_SCORE_THRESHOLD)),
+        avg_closed_case_age=Avg(
+            ExpressionWrapper(Value(now, output_field=DateTimeField()) - F('created_at'), output_field=DurationField()),
+            filter=closed,
+        ),
+        **time_count_aggregates(now),
+    )
+    return aggregates
+
+
+def time_count_aggregates(now):
+    """The clock-dependent counts plus what's needed to find their next change"""
+    return {
+        'overdue_cases': Count('pk', filter=Q(deadline__lt=now)),
+        'due_this_week': Count('pk', filter=Q(deadline__gte=now, deadline__lte=now + WEEK)),
+        'recent_activity': Count('pk', filter=Q(last_activity__gte=now - WEEK)),
+        # Earliest upcoming deadline, deadline entering the week window and activity leaving it
+        'next_deadline': Min('deadline', filter=Q(deadline__gte=now)),
+        'next_week_entry': Min('deadline', filter=Q(deadline__gt=now + WEEK)),
+        'next_activity_expiry': Min('last_activity', filter=Q(last_activity__gte=now - WEEK)),
+    }
+
+
+def time_counts(row):
+    """The time-based summary fields from a time_count_aggregates row"""
+    crossings = [
+        row['next_deadline'],
+        row['next_week_entry'] - WEEK if row['next_week_entry'] else None,
+        row['next_activity_expiry'] + WEEK if row['next_activity_expiry'] else None,
+    ]
+    return {
+        'overdue_cases': row['overdue_cases'] or 0,
+        'due_this_week': row['due_this_week'] or 0,
+        'recent_activity': row['recent_activity'] or 0,
+        'counts_valid_until': min([moment for moment in crossings if moment], default=None),
+    }
+
+
+def summary_from_row(model, owner_id, row, now):
+    closed = row['status_closed']
+    # Mean created_at = now - mean age, kept as a sum so closing cases can adjust it
+    closed_created_total = (
+        closed * (now.timestamp() - row['avg_closed_case_age'].total_seconds())
+        if closed and row['avg_closed_case_age'] is not None else 0.0
+    )
+    fields = {field: row[field] or 0 for field in COUNTER_FIELDS if field in row}
+    fields.update(time_counts(row))
+    fields.update(closed_created_total=closed_created_total, refreshed_at=now)
+    return model(pk=owner_id, **fields)
+
+
+def rebuild_summaries(model, owner_ids=None, now=None, batch_size=1000):
+    """
+    Recompute the summaries of one table from grouped aggregates and upsert
+    them (all owners, or just owner_ids). Summaries of owners that no longer
+    have cases are reset to zero. Returns the number of summaries written.
+    """
+    from cases.models import Case
+    
+    now = now or timezone.now()
+    column = owner_column(model)
+    cases = Case.objects.filter(**{f'{column}__isnull': False})
+    if owner_ids is not None:
+        cases = cases.filter(**{f'{column}__in': owner_ids})
+    rows = {
+        row[column]: row
+        for row in cases.order_by().values(column).annotate(**summary_aggregates(now))
+    }
+    
+    owners = set(rows) | set(owner_ids or [])
+    if owner_ids is None:
+        owners |= set(model.objects.values_list('pk', flat=True))
+    empty = {field: None for field in summary_aggregates(now)}
+    summaries = [summary_from_row(model, owner, rows.get(owner, empty), now) for owner in owners]
+    
+    model.objects.bulk_create(
+        summaries, batch_size=batch_size, update_conflicts=True, unique_fields=[model._meta.pk.name],
+        update_fields=[*COUNTER_FIELDS, 'counts_valid_until', 'refreshed_at']
+    )
+    if column == 'assigned_lawyer_id':
+        sync_lawyer_profiles(owner_ids)
+    return len(summaries)
+
+
+def rebuild_case_summaries(now=None):
+    """Recompute every lawyer and client summary; returns the number written"""
+    now = now or timezone.now()
+    written = 0
+    with transaction.atomic():
+        for model, _ in summary_models():
+            written += rebuild_summaries(model, now=now)
+    logger.info(f"Rebuilt {written} case summaries")
+    return written
+
+
+def get_case_summary(user, now=None):
+    """
+    The user's summary with current time-based counts, or None for users
+    without one (admins). Built on first use, and its time-based counts are
+    recounted once counts_valid_until has passed.
+    """
+    from cases.models import Case
+    
+    model = summary_model_for(user)
+    if model is None:
+        return None
+    now = now or timezone.now()
+    
+    summary = model.objects.filter(pk=user.pk).first()
+    if summary is None:
+        with transaction.atomic():
+            rebuild_summaries(model, owner_ids=[user.pk], now=now)
+        return model.objects.get(pk=user.pk)
+    
+    if summary.counts_valid_until is not None and now >= summary.counts_valid_until:
+        with transaction.atomic():
+            summary = model.objects.select_for_update().get(pk=user.pk)
+            row = Case.objects.filter(**{owner_column(model): user.pk}).order_by().aggregate(
+                **time_count_aggregates(now)
+            )
+            counts = time_counts(row)
+            model.objects.filter(pk=user.pk).update(**counts)
+            for field, value in counts.items():
+                setattr(summary, field, value)
+    return summary
+
+
+def summary_statistics(summary):
+    """A summary in the shape of stats.case_statistics"""
+    return {
+        'total_cases': summary.total_cases,
+        'cases_by_status': {status: getattr(summary, f'status_{status}') for status in STATUSES},
+        'cases_by_priority': {f'priority_{level}': getattr(summary, f'priority_{level}') for level in PRIORITY_LEVELS},
+        'overdue_cases': summary.overdue_cases,
+        'due_this_week': summary.due_this_week,
+        'recent_activity': summary.recent_activity,
+        'urgent_cases': summary.urgent_cases,
+        'average_urgency_score': summary.urgency_total / summary.total_cases if summary.total_cases else 0,
+    }
+
+
+def summary_lawyer_metrics(summary, now=None):
+    """
+    avg_case_duration and completion_rate from a lawyer summary. As with
+    the per-case loop these replaced, avg_case_duration is the mean number
+    of days since the lawyer's closed cases were created: open cases count
+    in neither the sum (closed_created_total) nor the divisor (status_closed).
+    """
+    now = now or timezone.now()
+    closed = summary.status_closed
+    if closed:
+        mean_closed_created = summary.closed_created_total / closed
+        avg_case_duration = (now.timestamp() - mean_closed_created) / 86400
+    else:
+        avg_case_duration = 0
+    return {
+        'avg_case_duration': avg_case_duration,
+        'completion_rate': closed / summary.total_cases * 100 if summary.total_cases else 0,
+    }
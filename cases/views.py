@@ -3,28 +3,47 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, F, Count, Avg
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Count
 from django.utils import timezone
 from django.contrib.auth import authenticate, login
+from django.contrib.auth.hashers import make_password
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from channels.db import database_sync_to_async
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 import json
-from datetime import timedelta
 
 from .models import (
     User, LawyerProfile, Case, CaseDocument, 
     CaseActivity, CaseNote, LegalNews, Notification
 )
 from .serializers import (
-    UserSerializer, LawyerProfileSerializer, CaseSerializer,
+    UserSerializer, LawyerProfileSerializer, CaseSerializer, CaseListSerializer,
     CaseDocumentSerializer, CaseActivitySerializer, CaseNoteSerializer,
     NotificationSerializer, CasePrioritySerializer
 )
+from .filters import CaseSearchFilter
+from .pagination import (
+    PrioritizedCasePagination, CaseKeysetPagination, NotificationKeysetPagination, ActivityKeysetPagination
+)
+from .utils.prioritization import CasePriorityManager, queue_priority_refresh, stale_case_filter
+from .utils.activity import ActivityLog
+from .utils.broadcast import get_case_broadcaster
+from .utils.hashing import HashingPoolBusy, get_hashing_pool
+from .utils.notifications import NotificationDispatcher
+from .utils.priority_feed import publish_priority_changes
+from .utils.scoping import scope_case_children, scope_cases
+from .utils.stats import case_statistics, get_cached_dashboard_stats, invalidate_dashboard_stats
+from .utils.summaries import (
+    SUMMARY_FIELDS, apply_case_changes, get_case_summary, summary_lawyer_metrics, summary_statistics
+)
 
 
 class AuthViewSet(viewsets.ViewSet):
@@ -37,7 +56,10 @@ class AuthViewSet(viewsets.ViewSet):
         password = request.data.get('password')
         
         if username and password:
-            user = authenticate(username=username, password=password)
+            try:
+                user = get_hashing_pool().run_sync(authenticate, request, username=username, password=password)
+            except HashingPoolBusy:
+                return busy_response()
             if user:
                 token, created = Token.objects.get_or_create(user=user)
                 return Response({
@@ -55,7 +77,11 @@ class AuthViewSet(viewsets.ViewSet):
     def register(self, request):
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
+            try:
+                password_hash = get_hashing_pool().run_sync(make_password, serializer.validated_data['password'])
+            except HashingPoolBusy:
+                return busy_response()
+            user = serializer.save(password_hash=password_hash)
             token, created = Token.objects.get_or_create(user=user)
             return Response({
                 'token': token.key,
@@ -70,24 +96,98 @@ class AuthViewSet(viewsets.ViewSet):
             request.user.auth_token.delete()
         return Response({'message': 'Logged out successfully'})
 
+
+def json_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def busy_response():
+    response = JsonResponse({'error': 'Too many sign-ins in progress, try again shortly'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = str(settings.PASSWORD_HASHING_RETRY_AFTER)
+    return response
+
+
+@database_sync_to_async
+def token_response_data(user, **extra):
+    token, created = Token.objects.get_or_create(user=user)
+    return {'token': token.key, 'user': UserSerializer(user).data, **extra}
+
+
+@csrf_exempt
+@require_POST
+async def async_login(request):
+    """
+    AuthViewSet.login for ASGI: authenticate() runs on the bounded hashing
+    pool (503 when it's full), so backends, signals and hasher upgrades apply
+    """
+    data = json_body(request)
+    username = data.get('username') if data else None
+    password = data.get('password') if data else None
+    if not username or not password:
+        return JsonResponse({'error': 'Username and password required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        user = await get_hashing_pool().run(authenticate, request, username=username, password=password)
+    except HashingPoolBusy:
+        return busy_response()
+    
+    if user is None:
+        return JsonResponse({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+    return JsonResponse(await token_response_data(user, user_type=user.user_type))
+
+
+@csrf_exempt
+@require_POST
+async def async_register(request):
+    """AuthViewSet.register for ASGI, hashing the new password on the bounded hashing pool"""
+    data = json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = UserSerializer(data=data)
+    if not await database_sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        password_hash = await get_hashing_pool().run(make_password, serializer.validated_data['password'])
+    except HashingPoolBusy:
+        return busy_response()
+    
+    user = await database_sync_to_async(serializer.save)(password_hash=password_hash)
+    return JsonResponse(await token_response_data(user, message='User created successfully'),
+                        status=status.HTTP_201_CREATED)
+
+
 class CaseViewSet(viewsets.ModelViewSet):
     """Case management with advanced prioritization"""
     serializer_class = CaseSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    pagination_class = CaseKeysetPagination
+    filter_backends = [DjangoFilterBackend, CaseSearchFilter, OrderingFilter]
     filterset_fields = ['case_type', 'status', 'priority_level', 'assigned_lawyer']
     search_fields = ['title', 'description', 'case_number']
     ordering_fields = ['priority_level', 'urgency_score', 'deadline', 'created_at']
     ordering = ['priority_level', '-urgency_score']
     
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'lawyer':
-            return Case.objects.filter(assigned_lawyer=user)
-        elif user.user_type == 'client':
-            return Case.objects.filter(client=user)
-        else:  # admin
-            return Case.objects.all()
+        queryset = scope_cases(self.request.user)
+        
+        # List and retrieve load exactly what their serializer will read
+        if self.action in ('list', 'retrieve'):
+            serializer_class = self.get_serializer_class()
+            queryset = serializer_class.setup_eager_loading(
+                queryset, serializer_class.get_requested_fields(self.request)
+            )
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CaseListSerializer
+        return CaseSerializer
     
     def perform_create(self, serializer):
         case = serializer.save(client=self.request.user)
@@ -128,13 +228,11 @@ class CaseViewSet(viewsets.ModelViewSet):
             )
             
             # Create notification
-            Notification.objects.create(
-                recipient=lawyer,
-                notification_type='case_update',
-                title='New Case Assignment',
-                message=f'You have been assigned to case #{case.case_number}',
-                related_case=case
-            )
+            with NotificationDispatcher() as notifications:
+                notifications.add(
+                    lawyer, 'case_update', 'New Case Assignment',
+                    f'You have been assigned to case #{case.case_number}', related_case=case
+                )
             
             self.send_realtime_update('case_assigned', case)
             return Response({'message': 'Lawyer assigned successfully'})
@@ -166,22 +264,14 @@ class CaseViewSet(viewsets.ModelViewSet):
             )
             
             # Notify relevant users
-            if case.assigned_lawyer and case.assigned_lawyer != request.user:
-                Notification.objects.create(
-                    recipient=case.assigned_lawyer,
-                    notification_type='case_update',
-                    title='Case Status Update',
-                    message=f'Case #{case.case_number} status changed to {new_status}',
-                    related_case=case
+            with NotificationDispatcher(exclude=request.user) as notifications:
+                notifications.add(
+                    case.assigned_lawyer_id, 'case_update', 'Case Status Update',
+                    f'Case #{case.case_number} status changed to {new_status}', related_case=case
                 )
-            
-            if case.client != request.user:
-                Notification.objects.create(
-                    recipient=case.client,
-                    notification_type='case_update',
-                    title='Case Status Update',
-                    message=f'Your case #{case.case_number} status changed to {new_status}',
-                    related_case=case
+                notifications.add(
+                    case.client_id, 'case_update', 'Case Status Update',
+                    f'Your case #{case.case_number} status changed to {new_status}', related_case=case
                 )
             
             self.send_realtime_update('status_updated', case)
@@ -218,144 +308,131 @@ class CaseViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def prioritized_cases(self, request):
-        """Get cases ordered by priority with detailed scoring"""
+        """
+        Get cases ordered by priority with detailed scoring
+        Serves stored scores without writing. stale_count and scores_fresh say
+        how many cases in scope are dirty or past their recheck time; the
+        scheduled sweep rescores them, or ?refresh=true queues a background
+        rescore now, coalesced per user. Totals and the page count come from
+        one aggregate query.
+        """
         cases = self.get_queryset()
+        now = timezone.now()
         
-        # Recalculate priorities for all cases
-        for case in cases:
-            case.calculate_priority_score()
+        totals = cases.aggregate(
+            total_cases=Count('id'),
+            high_priority_count=Count('id', filter=Q(priority_level__lte=2)),
+            overdue_count=Count('id', filter=Q(deadline__lt=now)),
+            stale_count=Count('id', filter=stale_case_filter(now))
+        )
+        
+        refresh_queued = False
+        if totals['stale_count'] and request.query_params.get('refresh', '').lower() in ('1', 'true', 'yes'):
+            refresh_queued = queue_priority_refresh(cases, key=f'user_{request.user.id}')
         
         # Get prioritized list
-        prioritized = cases.order_by('priority_level', '-urgency_score', 'deadline')
-        serializer = CasePrioritySerializer(prioritized, many=True)
+        prioritized = cases.order_by(
+            'priority_level', '-urgency_score', 'deadline'
+        ).select_related('client', 'assigned_lawyer')
+        paginator = PrioritizedCasePagination()
+        page = paginator.paginate_queryset(prioritized, request, view=self, count=totals['total_cases'])
+        serializer = CasePrioritySerializer(page, many=True)
         
         return Response({
             'cases': serializer.data,
-            'total_cases': cases.count(),
-            'high_priority_count': cases.filter(priority_level__lte=2).count(),
-            'overdue_count': cases.filter(deadline__lt=timezone.now()).count()
+            'total_cases': totals['total_cases'],
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'high_priority_count': totals['high_priority_count'],
+            'overdue_count': totals['overdue_count'],
+            'scores_fresh': not totals['stale_count'],
+            'stale_count': totals['stale_count'],
+            'refresh_queued': refresh_queued
         })
     
     @action(detail=False, methods=['get'])
     def dashboard_stats(self, request):
-        """Get dashboard statistics"""
-        cases = self.get_queryset()
-        
-        stats = {
-            'total_cases': cases.count(),
-            'cases_by_status': {
-                status[0]: cases.filter(status=status[0]).count() 
-                for status in Case.STATUS_CHOICES
-            },
-            'cases_by_priority': {
-                f'priority_{level}': cases.filter(priority_level=level).count()
-                for level in range(1, 6)
-            },
-            'overdue_cases': cases.filter(deadline__lt=timezone.now()).count(),
-            'due_this_week': cases.filter(
-                deadline__gte=timezone.now(),
-                deadline__lte=timezone.now() + timedelta(days=7)
-            ).count(),
-            'recent_activity': cases.filter(
-                last_activity__gte=timezone.now() - timedelta(days=7)
-            ).count()
-        }
+        """Get dashboard statistics (cached per user for DASHBOARD_STATS_CACHE_TIMEOUT)"""
+        return Response(get_cached_dashboard_stats(request.user, self.compute_dashboard_stats))
+    
+    def compute_dashboard_stats(self):
+        # Lawyers and clients read their case summary, admins aggregate every case
+        summary = get_case_summary(self.request.user)
+        if summary is not None:
+            stats = summary_statistics(summary)
+        else:
+            stats = case_statistics(self.get_queryset())
+        stats.pop('urgent_cases')
+        stats.pop('average_urgency_score')
         
-        # Lawyer-specific stats
-        if request.user.user_type == 'lawyer':
-            stats.update({
-                'assigned_cases': cases.filter(assigned_lawyer=request.user).count(),
-                'avg_case_duration': self.calculate_avg_duration(),
-                'completion_rate': self.calculate_completion_rate()
-            })
+        # Lawyer-specific stats (lawyers only see their assigned cases)
+        if self.request.user.user_type == 'lawyer':
+            stats['assigned_cases'] = stats['total_cases']
+            stats.update(summary_lawyer_metrics(summary))
         
-        return Response(stats)
+        return stats
     
     @action(detail=False, methods=['post'])
     def bulk_prioritize(self, request):
-        """Bulk update priorities for multiple cases"""
+        """
+        Bulk update priorities for multiple cases: one UPDATE for the level,
+        one chunked rescoring pass and one INSERT for the activities, however
+        many cases are selected
+        """
         case_ids = request.data.get('case_ids', [])
         priority_level = request.data.get('priority_level')
         
         if not case_ids or not priority_level:
             return Response({'error': 'case_ids and priority_level required'}, 
                           status=status.HTTP_400_BAD_REQUEST)
-        
-        cases = self.get_queryset().filter(id__in=case_ids)
-        updated_count = 0
-        
-        for case in cases:
-            case.priority_level = priority_level
-            case.save()
-            case.calculate_priority_score()
+        try:
+            priority_level = int(priority_level)
+        except (TypeError, ValueError):
+            priority_level = None
+        if priority_level not in dict(Case.PRIORITY_LEVELS):
+            return Response({'error': 'Invalid priority level'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        now = timezone.now()
+        with transaction.atomic(), ActivityLog(performed_by=request.user) as activity_log:
+            cases = self.get_queryset().filter(id__in=case_ids)
+            rows = list(cases.select_for_update().values('id', *SUMMARY_FIELDS))
+            if not rows:
+                return Response({'message': 'Updated 0 cases', 'updated_cases': 0})
             
-            # Log activity
-            CaseActivity.objects.create(
-                case=case,
-                activity_type='priority_changed',
-                description=f'Bulk priority update to level {priority_level}',
-                performed_by=request.user
+            ids = [row['id'] for row in rows]
+            # The saves this replaces bumped last_activity too (auto_now)
+            Case.objects.filter(pk__in=ids).update(
+                priority_level=priority_level, priority_dirty=True, updated_at=now, last_activity=now
+            )
+            # update() skips the Case signals, so move the summaries and the
+            # cached dashboards along by hand
+            apply_case_changes(
+                [(row, {**row, 'priority_level': priority_level, 'last_activity': now}) for row in rows], now
             )
-            updated_count += 1
+            parties = {user_id for row in rows for user_id in (row['client_id'], row['assigned_lawyer_id'])}
+            transaction.on_commit(lambda: invalidate_dashboard_stats(*parties))
+            
+            # Rescore the new levels in chunks; this also moves the priority index
+            # and tells the priority feeds about cases whose score changed,
+            # while the level change alone is published here
+            CasePriorityManager().stream_update_priorities(Case.objects.filter(pk__in=ids))
+            level_changes = [
+                (row['id'], priority_level, row['urgency_score'], (row['client_id'], row['assigned_lawyer_id']))
+                for row in rows if row['priority_level'] != priority_level
+            ]
+            transaction.on_commit(lambda: publish_priority_changes(level_changes))
+            
+            for row in rows:
+                activity_log.add(row['id'], 'priority_changed', f'Bulk priority update to level {priority_level}')
         
         return Response({
-            'message': f'Updated {updated_count} cases',
-            'updated_cases': updated_count
+            'message': f'Updated {len(rows)} cases',
+            'updated_cases': len(rows)
         })
     
     def send_realtime_update(self, update_type, case):
-        """Send real-time updates via WebSocket"""
-        channel_layer = get_channel_layer()
-        
-        # Send to case-specific channel
-        async_to_sync(channel_layer.group_send)(
-            f"case_{case.id}",
-            {
-                'type': 'case_update',
-                'update_type': update_type,
-                'case_data': CaseSerializer(case).data
-            }
-        )
-        
-        # Send to user-specific channels
-        users_to_notify = [case.client]
-        if case.assigned_lawyer:
-            users_to_notify.append(case.assigned_lawyer)
-        
-        for user in users_to_notify:
-            async_to_sync(channel_layer.group_send)(
-                f"user_{user.id}",
-                {
-                    'type': 'case_update',
-                    'update_type': update_type,
-                    'case_data': CaseSerializer(case).data
-                }
-            )
-    
-    def calculate_avg_duration(self):
-        """Calculate average case duration for lawyer"""
-        closed_cases = self.get_queryset().filter(
-            status='closed',
-            assigned_lawyer=self.request.user
-        )
-        
-        durations = []
-        for case in closed_cases:
-            if case.created_at:
-                duration = (timezone.now() - case.created_at).days
-                durations.append(duration)
-        
-        return sum(durations) / len(durations) if durations else 0
-    
-    def calculate_completion_rate(self):
-        """Calculate case completion rate for lawyer"""
-        total_cases = self.get_queryset().filter(assigned_lawyer=self.request.user).count()
-        closed_cases = self.get_queryset().filter(
-            assigned_lawyer=self.request.user,
-            status='closed'
-        ).count()
-        
-        return (closed_cases / total_cases * 100) if total_cases > 0 else 0
+        """Send real-time updates via WebSocket once the request's transaction commits"""
+        get_case_broadcaster().publish(update_type, case)
 
 class CaseDocumentViewSet(viewsets.ModelViewSet):
     """Document management for cases"""
@@ -363,13 +440,7 @@ class CaseDocumentViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'lawyer':
-            return CaseDocument.objects.filter(case__assigned_lawyer=user)
-        elif user.user_type == 'client':
-            return CaseDocument.objects.filter(case__client=user)
-        else:
-            return CaseDocument.objects.all()
+        return scope_case_children(self.request.user, CaseDocument.objects.all())
     
     def perform_create(self, serializer):
         document = serializer.save(uploaded_by=self.request.user)
@@ -383,38 +454,29 @@ class CaseDocumentViewSet(viewsets.ModelViewSet):
         )
         
         # Notify relevant users
-        users_to_notify = [document.case.client]
-        if document.case.assigned_lawyer and document.case.assigned_lawyer != self.request.user:
-            users_to_notify.append(document.case.assigned_lawyer)
-        
-        for user in users_to_notify:
-            if user != self.request.user:
-                Notification.objects.create(
-                    recipient=user,
-                    notification_type='document_shared',
-                    title='New Document Added',
-                    message=f'Document "{document.title}" added to case #{document.case.case_number}',
-                    related_case=document.case
-                )
+        with NotificationDispatcher(exclude=self.request.user) as notifications:
+            notifications.add(
+                [document.case.client_id, document.case.assigned_lawyer_id], 'document_shared',
+                'New Document Added',
+                f'Document "{document.title}" added to case #{document.case.case_number}',
+                related_case=document.case
+            )
 
 class CaseActivityViewSet(viewsets.ReadOnlyModelViewSet):
     """Case activity tracking"""
     serializer_class = CaseActivitySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ActivityKeysetPagination
     
     def get_queryset(self):
         case_id = self.request.query_params.get('case_id')
-        queryset = CaseActivity.objects.all()
+        queryset = CaseActivity.objects.select_related('performed_by')
         
         if case_id:
             queryset = queryset.filter(case_id=case_id)
         
         # Filter based on user permissions
-        user = self.request.user
-        if user.user_type == 'lawyer':
-            queryset = queryset.filter(case__assigned_lawyer=user)
-        elif user.user_type == 'client':
-            queryset = queryset.filter(case__client=user)
+        queryset = scope_case_children(self.request.user, queryset)
         
         return queryset.order_by('-timestamp')
 
@@ -422,6 +484,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
     """User notifications management"""
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationKeysetPagination
     
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user)
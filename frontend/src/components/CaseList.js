@@ -12,8 +12,8 @@ function CaseList() {
 
   const fetchCases = async () => {
     try {
-      const response = await getCases();
-      setCases(response.data);
+      const data = await getCases();
+      setCases(data || []);
     } catch (error) {
       console.error('Error fetching cases:', error);
     }
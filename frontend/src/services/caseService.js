@@ -4,11 +4,18 @@ import axios from 'axios';
 
 const API_URL = 'http://localhost:8000/api/cases/';
 
-// Fetch all cases
+// Fetch all cases. The list endpoint is cursor-paginated
+// ({ next, previous, results }), so follow `next` until the last page.
 export const getCases = async () => {
   try {
-    const response = await axios.get(API_URL);
-    return response.data;
+    const cases = [];
+    let url = `${API_URL}?page_size=100`;
+    while (url) {
+      const response = await axios.get(url);
+      cases.push(...response.data.results);
+      url = response.data.next;
+    }
+    return cases;
   } catch (error) {
     console.error('Error fetching cases:', error);
   }
@@ -410,7 +410,8 @@ from django.utils import timezone
 from django.contrib.auth import get_user_model
 from .models import Case, Notification
 from .utils.prioritization import CasePriorityManager, schedule_priority_updates
-from .utils.notifications import send_email_notification
+from .utils.summaries import rebuild_case_summaries
+from .utils.notifications import NotificationDispatcher, send_email_notification
 import logging
 
 logger = logging.getLogger(__name__)
@@ -430,6 +431,20 @@ def recalculate_all_case_priorities():
         logger.error(f"Error in priority recalculation task: {e}")
         raise
 
+@shared_task
+def rebuild_all_case_summaries():
+    """
+    Scheduled task to recompute the lawyer and client case summaries
+    They are maintained incrementally; this corrects any drift
+    Should run daily
+    """
+    try:
+        written = rebuild_case_summaries()
+        return f"Rebuilt {written} case summaries"
+    except Exception as e:
+        logger.error(f"Error rebuilding case summaries: {e}")
+        raise
+
 @shared_task
 def send_deadline_reminders():
     """
@@ -444,42 +459,31 @@ def send_deadline_reminders():
         urgent_cases = Case.objects.filter(
             deadline__date=tomorrow.date(),
             status__in=['filed', 'investigation', 'hearing']
-        ).select_related('client', 'assigned_lawyer')
+        )
         
         # Cases due next week
         upcoming_cases = Case.objects.filter(
             deadline__gte=next_week,
             deadline__lte=next_week + timezone.timedelta(days=1),
             status__in=['filed', 'investigation', 'hearing']
-        ).select_related('client', 'assigned_lawyer')
+        )
         
-        reminder_count = 0
+        # All reminders go out with one bulk INSERT
+        notifications = NotificationDispatcher()
         
         for case in urgent_cases:
-            # Create notification
-            for user in [case.client, case.assigned_lawyer]:
-                if user:
-                    Notification.objects.create(
-                        recipient=user,
-                        notification_type='hearing_reminder',
-                        title='Urgent: Case Due Tomorrow',
-                        message=f'Case #{case.case_number} is due tomorrow. Please review immediately.',
-                        related_case=case
-                    )
-                    reminder_count += 1
+            notifications.add(
+                [case.client_id, case.assigned_lawyer_id], 'hearing_reminder', 'Urgent: Case Due Tomorrow',
+                f'Case #{case.case_number} is due tomorrow. Please review immediately.', related_case=case
+            )
         
         for case in upcoming_cases:
-            # Create notification
-            for user in [case.client, case.assigned_lawyer]:
-                if user:
-                    Notification.objects.create(
-                        recipient=user,
-                        notification_type='hearing_reminder',
-                        title='Reminder: Case Due Next Week',
-                        message=f'Case #{case.case_number} is due next week. Please prepare accordingly.',
-                        related_case=case
-                    )
-                    reminder_count += 1
+            notifications.add(
+                [case.client_id, case.assigned_lawyer_id], 'hearing_reminder', 'Reminder: Case Due Next Week',
+                f'Case #{case.case_number} is due next week. Please prepare accordingly.', related_case=case
+            )
+        
+        reminder_count = len(notifications.flush())
         
         logger.info(f"Sent {reminder_count} deadline reminders")
         return f"Sent {reminder_count} deadline reminders"
@@ -533,13 +537,8 @@ def generate_priority_report():
         for case in urgent_cases:
             report_content += f"- #{case.case_number}: {case.title} (Score: {case.urgency_score})\n"
         
-        for admin in admins:
-            Notification.objects.create(
-                recipient=admin,
-                notification_type='system',
-                title='Daily Priority Report',
-                message=report_content
-            )
+        with NotificationDispatcher() as notifications:
+            notifications.add(list(admins), 'system', 'Daily Priority Report', report_content)
         
         logger.info("Generated daily priority report")
         return "Priority report generated"